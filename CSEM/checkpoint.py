@@ -0,0 +1,97 @@
+import os
+import pickle
+import zlib
+from .nodes import *
+from .memo import MemoTable
+from .csemachine import CSEMachine
+
+# Snapshots of a machine between two steps: control, stack, environments, closures and tuples,
+# pickled and zlib-compressed. Pickle keeps each shared object once, so closures sharing an
+# environment or tuples sharing elements are not duplicated. Snapshots are pickles: only
+# restore files you wrote yourself.
+
+MAGIC = b"RPALCSE5"
+
+def get_objects(roots):
+    # Every symbol and memo table reachable from the roots, each after the objects it refers
+    # to (except along cycles). Pickling them in this order keeps pickle's recursion shallow
+    # however deep the environment chains or nested tuples are.
+    order = []
+    seen = set()
+    stack = [(root, False) for root in reversed(roots)]
+    while stack:
+        value, expanded = stack.pop()
+        if expanded:
+            order.append(value)
+            continue
+        if isinstance(value, (list, tuple)):
+            stack.extend((element, False) for element in reversed(value))
+            continue
+        if isinstance(value, dict):
+            stack.extend((element, False) for item in value.items() for element in item)
+            continue
+        if not isinstance(value, (Symbol, MemoTable)) or id(value) in seen:
+            continue
+        seen.add(id(value))
+        if isinstance(value, Lambda) and value.delta is None:
+            # Compile the body now: the compiler's tables are keyed on node ids, which do not
+            # survive a restore, and the snapshot then holds no syntax trees
+            value.get_delta()
+        stack.append((value, True))
+        stack.extend((element, False) for element in reversed(get_fields(value)))
+    return order
+
+def get_fields(value):
+    # Field values of a symbol (slotted) or a memo table
+    if hasattr(value, "__dict__"):
+        return list(vars(value).values())
+    return [getattr(value, name, None) for cls in type(value).__mro__ for name in getattr(cls, "__slots__", ())]
+
+def save_checkpoint(machine, file_name):
+    state = {
+        "control": machine.control,
+        "stack": machine.stack,
+        "environment": machine.environment,
+        "current_environment": machine.current_environment,
+        "j": machine.j,
+        "tuple_elements": machine.tuple_elements,
+    }
+    objects = get_objects([machine.control, machine.stack, machine.environment, machine.current_environment])
+    data = MAGIC + zlib.compress(pickle.dumps((objects, state), pickle.HIGHEST_PROTOCOL))
+    # Write and rename, so a crash while writing leaves the previous snapshot intact
+    with open(file_name + ".tmp", "wb") as file:
+        file.write(data)
+    os.replace(file_name + ".tmp", file_name)
+    return len(data)
+
+def load_checkpoint(file_name):
+    with open(file_name, "rb") as file:
+        data = file.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"{file_name} is not a machine snapshot")
+    _, state = pickle.loads(zlib.decompress(data[len(MAGIC):]))
+    machine = CSEMachine(state["control"], state["stack"], state["environment"])
+    machine.current_environment = state["current_environment"]
+    machine.j = state["j"]
+    machine.tuple_elements = state["tuple_elements"]
+    return machine
+
+# Checkpointer runs a machine in slices and saves a snapshot every `every` steps, and at the
+# next slice boundary after request() (which is safe to call from a signal handler).
+class Checkpointer:
+    def __init__(self, file_name, every=None, slice_steps=10000):
+        self.file_name = file_name
+        self.every = every
+        self.slice_steps = every or slice_steps
+        self.requested = False
+        self.saved = 0
+
+    def request(self):
+        self.requested = True
+
+    def execute(self, machine):
+        while not machine.resume(self.slice_steps):
+            if self.every or self.requested:
+                self.requested = False
+                save_checkpoint(machine, self.file_name)
+                self.saved += 1
@@ -0,0 +1,88 @@
+import os
+import subprocess
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_programs, report, finish
+from CSEM.checkpoint import save_checkpoint, load_checkpoint, get_objects
+from CSEM.quicken import Quickened, unquicken
+from Pipeline.program import compile, RPALSyntaxError
+
+# Saves snapshots of runs part way through, restores them and checks that the restored run prints
+# the same result as the uninterrupted one: from Python after several step counts, and through
+# myrpal.py --checkpoint / --restore with the options a restored run must honor.
+
+test_cases = {
+    "tail_loop": "let rec f (n, a) = n eq 0 -> a | f (n - 1, a + n) in f (2000, 0)",
+    "recursion": "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in fib 16",
+    "shared_environment": """
+        let make n = (fn x. x + n), (fn x. x * n) in
+        let rec sum (fs, k) = k eq 0 -> 0 | (fs 1) k + (fs 2) k + sum (fs, k - 1) in
+        sum (make 3, 200)
+    """,
+    "tuples": "let rec build n = n eq 0 -> nil | (build (n - 1)) aug (n, n * n) in build 300",
+    "strings": "let rec walk (s, n) = n eq 0 -> (s, Stem s) | walk (Stern s, n - 1) in walk ('abcdefgh', 5)",
+}
+
+def check_round_trip(test_name, source, file_name):
+    # Restore after 1, 100 and 1000 steps; the last one with quickening off
+    try:
+        program = compile(source)
+    except RPALSyntaxError:
+        print(f"- {test_name}: syntax error, skipped")
+        return
+    uninterrupted = program.get_cse_machine()
+    uninterrupted.execute()
+    expected = uninterrupted.get_result()
+    restores = 0
+    ok = True
+    for steps, quicken in ((1, True), (100, True), (1000, False)):
+        cse_machine = program.get_cse_machine()
+        if cse_machine.resume(steps):
+            continue
+        save_checkpoint(cse_machine, file_name)
+        restored = load_checkpoint(file_name)
+        restored.quicken = quicken
+        if not quicken:
+            unquicken(get_objects([restored.control, restored.stack, restored.environment]))
+        restored.execute()
+        restores += 1
+        ok = ok and restored.get_result() == expected
+        if not quicken:
+            objects = get_objects([restored.control, restored.stack, restored.environment])
+            ok = ok and not any(isinstance(symbol, Quickened) for symbol in objects)
+    report(ok, f"{test_name}: {restores} restores, {expected[:50]}")
+
+def myrpal(*args):
+    script = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "myrpal.py")
+    completed = subprocess.run([sys.executable, script] + list(args), capture_output=True, text=True)
+    return completed.returncode, completed.stdout
+
+def check_command_line(directory):
+    # Stop a checkpointed run with a step limit, then continue it with different options
+    source_file = os.path.join(directory, "fib.rpal")
+    with open(source_file, "w") as file:
+        file.write("let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in Print (fib 18)")
+    _, expected = myrpal(source_file)
+    snapshot = os.path.join(directory, "run.ckpt")
+    code, _ = myrpal(source_file, "--checkpoint", snapshot, "--checkpoint-every", "1000", "--max-steps", "20000")
+    report(code == 2 and os.path.exists(snapshot), f"stopped: exit code {code}")
+    for options in ([], ["--no-jit"], ["--no-quicken"], ["--checkpoint", snapshot + ".next", "--checkpoint-every", "1000"]):
+        code, output = myrpal("--restore", snapshot, *options)
+        ok = code == 0 and output == expected
+        if "--checkpoint" in options:
+            ok = ok and os.path.exists(snapshot + ".next")
+        report(ok, f"restore {' '.join(options) or '(no options)'}: {output.splitlines()[-1] if output else code}")
+
+def run_checkpoint_tests():
+    directory = tempfile.mkdtemp()
+    file_name = os.path.join(directory, "test.ckpt")
+    for test_name, source in get_programs(test_cases).items():
+        check_round_trip(test_name, source, file_name)
+    check_command_line(directory)
+
+if __name__ == "__main__":
+    run_checkpoint_tests()
+    finish()
@@ -0,0 +1,83 @@
+import contextlib
+import glob
+import io
+import os
+import sys
+
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.cse_factory import CSEMachineFactory
+
+# Shared by the *_test.py scripts, which run each program on the plain interpreter and with one
+# optimization turned on and compare the results. A script reports every check with report() or
+# compare() and calls finish() at the end, which exits with status 1 if any check failed.
+
+TEST_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Test_Cases")
+
+# Options of the plain interpreter: every optimization off. A test turns on the one it checks.
+PLAIN_FACTORY = {"tail_loops": False, "lazy": False, "fuse": False}
+PLAIN_MACHINE = {"quicken": False, "jit": None}
+
+failures = []
+
+def get_standardized_ast(source):
+    # None if the program does not parse. Front-end messages are discarded.
+    with contextlib.redirect_stdout(io.StringIO()):
+        parser = Parser(tokenize(source))
+        if parser.parse() is None:
+            return None
+        ast = ASTFactory().get_abstract_syntax_tree(parser.convert_ast_to_string_ast())
+    ast.standardize()
+    return ast
+
+def get_factory(factory_class=CSEMachineFactory, **options):
+    # A factory for the plain interpreter with the given options changed
+    return factory_class(**dict(PLAIN_FACTORY, **options))
+
+def get_machine(source, factory=None, **options):
+    # A machine running source, or None if it does not parse. Options name machine attributes
+    # or, when no factory is given, factory options.
+    ast = get_standardized_ast(source)
+    if ast is None:
+        return None
+    if factory is None:
+        factory = get_factory(**{name: value for name, value in options.items() if name not in PLAIN_MACHINE})
+    cse_machine = factory.get_cse_machine(ast)
+    for name, value in PLAIN_MACHINE.items():
+        setattr(cse_machine, name, options.get(name, value))
+    return cse_machine
+
+def get_answer(cse_machine):
+    # The answer of a run, or the error it raised. Anything the program prints is discarded.
+    if cse_machine is None:
+        return "syntax error"
+    try:
+        with contextlib.redirect_stdout(io.StringIO()):
+            return cse_machine.get_answer()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+def get_programs(test_cases):
+    # The test cases followed by every program in Test_Cases
+    programs = dict(test_cases)
+    for file_name in sorted(glob.glob(os.path.join(TEST_DIR, "*.txt"))):
+        with open(file_name) as file:
+            programs[os.path.basename(file_name)] = file.read()
+    return programs
+
+def report(ok, message, *details):
+    print(f"{'✓' if ok else '✗'} {message}")
+    if not ok:
+        failures.append(message)
+        for detail in details:
+            print(f"    {detail}")
+
+def compare(test_name, expected, actual, label="plain interpreter"):
+    # actual comes from the optimized run, expected from the reference one
+    report(expected == actual, f"{test_name}: {actual[:60]}", f"{label}: {expected[:60]}")
+
+def finish():
+    if failures:
+        print(f"{len(failures)} checks failed")
+        sys.exit(1)
@@ -1,20 +1,56 @@
+import hashlib
 from .nodes import *
 from .csemachine import CSEMachine
+from .memo import MemoTable, PURE_BUILTINS
+from .fusion import LEAVES, Fused, Operation, Conditional
+
+BINARY_OPERATORS = ("+", "-", "*", "/", "**", "&", "or", "eq", "ne", "ls", "le", "gr", "ge", "aug")
 
 class CSEMachineFactory:
-    def __init__(self):
+    def __init__(self, tail_loops=True, memoize=None, memo_size=4096, lazy=True, fuse=True):
         self.e0 = E(0)
         self.i = 1
         self.j = 0
+        self.lazy = lazy              # Compile lambda bodies on first application
+        self.fuse = fuse              # Emit superinstructions for common sequences (fusion.py)
+        self.tail_loops = tail_loops  # Compile self-tail-recursive rec functions into loops
+        self.loop_bodies = {}         # id(lambda node) -> tail call gamma nodes in its body
+        self.tail_calls = {}          # id(gamma node) -> Lambda whose parameters it rebinds
+        self.memoize = memoize        # Names of rec functions to memoize ("auto" selects pure ones)
+        self.memo_size = memo_size    # LRU capacity of each memo table
+        self.memo_functions = {}      # id(lambda node) -> name of the memoized rec function
+        self.memo_tables = []         # Memo tables created, for reporting
+        self.lambda_names = {}        # id(lambda node) -> name the lambda is bound to
+        self.symbols = {}             # Interned immutable symbols, keyed on node data
+        self.structures = {}          # Hash-consed Deltas and Bs, keyed on the subtree's Merkle hash
+        self.subtree_hashes = {}      # id(node) -> Merkle hash, or None if the subtree can't be shared
 
     def get_symbol(self, node):
+        # Immutable symbols are shared: one instance per distinct node data. Gamma and Bop sites
+        # are not, since the machine specializes each site for what it sees there (quicken.py).
+        data = node.get_data()
+        if data == "gamma":
+            # The machine can recycle the operand tuple of  f (a, b)  once f has bound its parameters
+            pack = node.get_children()[1].get_data() == "tau"
+            if id(node) in self.tail_calls:
+                return TailGamma(self.tail_calls[id(node)], pack)  # Self tail call symbol
+            return Gamma(pack)  # Gamma symbol
+        elif data in BINARY_OPERATORS:
+            return Bop(data)  # Binary operator symbol
+        elif data == "tau":
+            key = (data, len(node.get_children()))
+        else:
+            key = data
+        symbol = self.symbols.get(key)
+        if symbol is None:
+            symbol = self.make_symbol(node)
+            self.symbols[key] = symbol
+        return symbol
+
+    def make_symbol(self, node):
         data = node.get_data()
         if data in ("not", "neg"):
             return Uop(data)  # Unary operator symbol
-        elif data in ("+", "-", "*", "/", "**", "&", "or", "eq", "ne", "ls", "le", "gr", "ge", "aug"):
-            return Bop(data)  # Binary operator symbol
-        elif data == "gamma":
-            return Gamma()  # Gamma symbol
         elif data == "tau":
             return Tau(len(node.get_children()))  # Tau symbol with the number of children
         elif data == "<Y*>":
@@ -30,23 +66,58 @@ class CSEMachineFactory:
                 return Tup()  # Tuple symbol
             elif data.startswith("<TRUE_VALUE:t"):
                 return Bool("true")  # Boolean true symbol
-            elif data.startswith("<TRUE_VALUE:f"):
+            elif data.startswith("<TRUE_VALUE:f") or data.startswith("<FALSE_VALUE:"):
                 return Bool("false")  # Boolean false symbol
-            elif data.startswith("<dummy>"):
+            elif data.startswith("<dummy>") or data.startswith("<DUMMY:"):
                 return Dummy()  # Dummy symbol
             else:
                 print("Err node:", data)
                 return Err()  # Error symbol
 
     def get_b(self, node):
+        key = self.get_subtree_hash(node)
+        if key is not None and ("b", key) in self.structures:
+            return self.structures[("b", key)]
         b = B()
         b.symbols = self.get_pre_order_traverse(node)
+        b.captures = self.captures(b.symbols)
+        if key is not None:
+            self.structures[("b", key)] = b
         return b
 
+    def get_subtree_hash(self, node):
+        # Merkle hash of a subtree. Subtrees holding lambdas (whose closures are set on
+        # the Lambda symbol) or self tail calls are never shared and hash to None. Gamma and
+        # Bop sites are shared with their subtree; quicken.py explains why that is safe.
+        if id(node) in self.subtree_hashes:
+            return self.subtree_hashes[id(node)]
+        key = None
+        if node.get_data() != "lambda" and id(node) not in self.tail_calls:
+            child_keys = [self.get_subtree_hash(child) for child in node.get_children()]
+            if None not in child_keys:
+                key = hashlib.blake2b(node.get_data().encode() + b"\0" + b"".join(child_keys),
+                                      digest_size=16).digest()
+        self.subtree_hashes[id(node)] = key
+        return key
+
+    def get_beta(self):
+        if "beta" not in self.symbols:
+            self.symbols["beta"] = Beta()
+        return self.symbols["beta"]
+
     def get_lambda(self, node):
         lambda_expr = Lambda(self.i)
         self.i += 1
-        lambda_expr.set_delta(self.get_delta(node.get_children()[1]))
+        lambda_expr.name = self.lambda_names.pop(id(node), None)
+        for gamma in self.loop_bodies.pop(id(node), []):
+            self.tail_calls[id(gamma)] = lambda_expr
+        if id(node) in self.memo_functions:
+            lambda_expr.memo = MemoTable(self.memo_functions.pop(id(node)), self.memo_size)
+            self.memo_tables.append(lambda_expr.memo)
+        if self.lazy:
+            lambda_expr.set_body(node.get_children()[1], self)
+        else:
+            lambda_expr.set_delta(self.get_delta(node.get_children()[1]))
         if node.get_children()[0].get_data() == ",":
             for identifier in node.get_children()[0].get_children():
                 lambda_expr.identifiers.append(Id(identifier.get_data()[4:-1]))
@@ -54,27 +125,156 @@ class CSEMachineFactory:
             lambda_expr.identifiers.append(Id(node.get_children()[0].get_data()[4:-1]))
         return lambda_expr
 
-    def get_pre_order_traverse(self, node):
-        symbols = []
+    def find_lambda_names(self, node):
+        # Name the lambdas bound by  gamma(lambda(X, P), E)  and  gamma(<Y*>, lambda(f, lambda(V, E))),
+        # and the scope  lambda(X, P)  of a let
+        if len(node.get_children()) != 2:
+            return
+        rator, rand = node.get_children()
+        if rator.get_data() == "<Y*>" and rand.get_data() == "lambda":
+            name, inner = rand.get_children()
+            self.lambda_names[id(rand)] = "rec " + name.get_data()[4:-1]
+            self.lambda_names[id(inner)] = name.get_data()[4:-1]
+        elif rator.get_data() == "lambda":
+            identifiers = self.get_parameters(rator)
+            self.lambda_names[id(rator)] = "let " + ",".join(i.get_data()[4:-1] for i in identifiers)
+            values = rand.get_children() if rand.get_data() == "tau" else [rand]
+            if len(identifiers) == len(values):
+                for identifier, value in zip(identifiers, values):
+                    if value.get_data() == "lambda" and identifier.get_data().startswith("<ID:"):
+                        self.lambda_names[id(value)] = identifier.get_data()[4:-1]
+
+    def get_rec_function(self, node):
+        # Recognize  gamma(<Y*>, lambda(f, lambda(V, E)))  and return f and the inner lambda
+        children = node.get_children()
+        if len(children) != 2 or children[0].get_data() != "<Y*>" or children[1].get_data() != "lambda":
+            return None
+        name, inner = children[1].get_children()
+        if not name.get_data().startswith("<ID:") or inner.get_data() != "lambda":
+            return None
+        for identifier in self.get_parameters(inner):
+            if not identifier.get_data().startswith("<ID:") or identifier.get_data() == name.get_data():
+                return None
+        return name.get_data(), inner
+
+    def get_parameters(self, lambda_node):
+        params = lambda_node.get_children()[0]
+        return params.get_children() if params.get_data() == "," else [params]
+
+    def find_rec_function(self, node):
+        rec_function = self.get_rec_function(node)
+        if rec_function is None:
+            return
+        name, inner = rec_function
+        body = inner.get_children()[1]
+        if self.tail_loops:
+            # Remember the tail calls if every use of f in E is a call in tail position
+            tail_calls = []
+            if self.collect_tail_calls(body, name, True, tail_calls) and tail_calls:
+                self.loop_bodies[id(inner)] = tail_calls
+        if self.memoize is not None:
+            if name[4:-1] in self.memoize or ("auto" in self.memoize and self.is_pure_body(body, name, inner)):
+                self.memo_functions[id(inner)] = name[4:-1]
+
+    def is_pure_body(self, node, name, lambda_node):
+        # A rec body is considered pure if it creates no closures, never uses aug or a
+        # side-effecting builtin, and only refers to itself, its parameters and pure builtins.
+        data = node.get_data()
+        if data in ("lambda", "aug"):
+            return False
+        if data.startswith("<ID:"):
+            return (data == name or data[4:-1] in PURE_BUILTINS
+                    or any(data == p.get_data() for p in self.get_parameters(lambda_node)))
+        for child in node.get_children():
+            if not self.is_pure_body(child, name, lambda_node):
+                return False
+        return True
+
+    def collect_tail_calls(self, node, name, is_tail, tail_calls):
+        # Returns False if the function name is used anywhere except as a tail call,
+        # or if the body creates closures that could capture the rebound environment.
+        data = node.get_data()
+        children = node.get_children()
+        if data == "lambda" or data == name:
+            return False
+        if data == "gamma" and children[0].get_data() == name:
+            if not is_tail:
+                return False
+            tail_calls.append(node)
+            return self.collect_tail_calls(children[1], name, False, tail_calls)
+        if data == "->":
+            return (self.collect_tail_calls(children[0], name, False, tail_calls)
+                    and self.collect_tail_calls(children[1], name, is_tail, tail_calls)
+                    and self.collect_tail_calls(children[2], name, is_tail, tail_calls))
+        for child in children:
+            if not self.collect_tail_calls(child, name, False, tail_calls):
+                return False
+        return True
+
+    def get_pre_order_traverse(self, node, symbols=None):
+        # Symbols are appended to one list for the whole delta rather than concatenated per level
+        if symbols is None:
+            symbols = []
+        if node.get_data() == "gamma":
+            self.find_rec_function(node)
+            self.find_lambda_names(node)
         if node.get_data() == "lambda":
             symbols.append(self.get_lambda(node))  # Lambda expression symbol
         elif node.get_data() == "->":
-            symbols.append(self.get_delta(node.get_children()[1]))  # Delta symbol
-            symbols.append(self.get_delta(node.get_children()[2]))  # Delta symbol
-            symbols.append(Beta())  # Beta symbol
-            symbols.append(self.get_b(node.get_children()[0]))  # B symbol
+            then_delta = self.get_delta(node.get_children()[1])
+            else_delta = self.get_delta(node.get_children()[2])
+            b = self.get_b(node.get_children()[0])
+            if self.fuse:
+                symbols.append(Conditional(then_delta, else_delta, self.get_beta(), b))  # Fused conditional
+            else:
+                symbols.append(then_delta)  # Delta symbol
+                symbols.append(else_delta)  # Delta symbol
+                symbols.append(self.get_beta())  # Beta symbol
+                symbols.append(b)  # B symbol
         else:
-            symbols.append(self.get_symbol(node))
+            symbol = self.get_symbol(node)
+            operands = self.get_leaf_operands(symbol, node) if self.fuse else None
+            if operands is not None:
+                symbols.append(Operation(symbol, operands))  # Fused operator and operands
+                return symbols
+            symbols.append(symbol)
             for child in node.get_children():
-                symbols.extend(self.get_pre_order_traverse(child))
+                self.get_pre_order_traverse(child, symbols)
         return symbols
 
+    def get_leaf_operands(self, symbol, node):
+        # The symbols of the operands of an operator node if they are all identifiers or constants
+        if not isinstance(symbol, (Gamma, Rator, Tau)) or not node.get_children():
+            return None
+        operands = []
+        for child in node.get_children():
+            if child.get_children():
+                return None
+            operand = self.get_symbol(child)
+            if type(operand) not in LEAVES:
+                return None
+            operands.append(operand)
+        return operands
+
     def get_delta(self, node):
+        key = self.get_subtree_hash(node)
+        if key is not None and ("delta", key) in self.structures:
+            return self.structures[("delta", key)]
         delta = Delta(self.j)
         self.j += 1
         delta.symbols = self.get_pre_order_traverse(node)
+        delta.captures = self.captures(delta.symbols)
+        if key is not None:
+            self.structures[("delta", key)] = delta
         return delta
 
+    def captures(self, symbols):
+        # Escape analysis for the environment a delta runs in: only a Lambda evaluated in it makes
+        # a closure that can refer to it after it exits. Every other environment created while it
+        # runs has the parent of the closure being applied, and nested deltas were analysed already.
+        return any(isinstance(symbol, Lambda) or (isinstance(symbol, (Delta, B, Fused)) and symbol.captures)
+                   for symbol in symbols)
+
     def get_control(self, ast):
         control = [self.e0, self.get_delta(ast.get_root())]
         return control
@@ -1,205 +1,391 @@
+import io
 from .nodes import *
+from .memo import get_memo_key, is_memo_value
+from .output import write_value
+from .quicken import Quickened, observe, get_bop_kind, get_gamma_kind
+from .fusion import Fused
+from .jit import JIT
+
+# Most free environments and tuples each machine keeps for reuse
+POOL_SIZE = 1024
 
 class CSEMachine:
     def __init__(self, control, stack, environment):
         self.control = control
         self.stack = stack
         self.environment = environment
-
-    
+        self.current_environment = environment[0]
+        self.j = 1                # Index of the next environment to create.
+        self.observers = []       # Objects whose before_step/after_step(machine, symbol) run around each step.
+        self.governor = None      # Governor enforcing the run's limits, if any.
+        self.tuple_elements = 0   # Tuple elements created by tau and aug, for the governor.
+        self.free_environments = []   # Exited environments no closure refers to, for reuse.
+        self.free_tuples = []         # Argument tuples whose elements have been bound, for reuse.
+        self.quicken = True           # Specialize Gamma and Bop sites as they run; see quicken.py.
+        self.jit = JIT()              # Compiles hot functions to Python (jit.py); None to interpret all.
+        self.jit_depth = 0            # Compiled functions active below the current step.
 
     def execute(self):
         # Execute the CSEMachine
-        current_environment = self.environment[0]
-        j = 1
+        if self.governor is not None:
+            self.resume(None)
+            return
         while self.control:
             
             # change below paths to your own paths to see how the control and stack are changing
             # self.write_control_to_file("C:\\Users\\samar\\Desktop\\PL_Project\\CSE Evaluation\\Control.txt")
             # self.write_stack_to_file("C:\\Users\\samar\\Desktop\\PL_Project\\CSE Evaluation\\Stack.txt")
             
-            current_symbol = self.control.pop()
-            if isinstance(current_symbol, Id):
-                self.stack.insert(0, current_environment.lookup(current_symbol))
-                # print(current_environment.lookup(current_symbol).get_data())
-            elif isinstance(current_symbol, Lambda):
-                current_symbol.set_environment(current_environment.get_index())
-                self.stack.insert(0, current_symbol)
-                
-                
-            elif isinstance(current_symbol, Gamma):
-                next_symbol = self.stack.pop(0)
-                if isinstance(next_symbol, Lambda):
-                    # Handle Lambda expression
-                    lambda_expr = next_symbol
-                    e = E(j)
-                    j += 1
-                    if len(lambda_expr.identifiers) == 1:
-                        temp = self.stack.pop(0)
-                        e.values[lambda_expr.identifiers[0]] = temp
-                    else:
-                        tup = self.stack.pop(0)
-                        for i, id in enumerate(lambda_expr.identifiers):
-                            e.values[id] = tup.symbols[i]
-                    for env in self.environment:
-                        if env.get_index() == lambda_expr.get_environment():
-                            e.set_parent(env)
-                    current_environment = e
-                    self.control.append(e)
-                    self.control.append(lambda_expr.get_delta())
-                    self.stack.insert(0, e)
-                    self.environment.append(e)
-                elif isinstance(next_symbol, Tup):
-                    # Handle Tup expression
-                    tup = next_symbol
-                    i = int(self.stack.pop(0).get_data())
-                    self.stack.insert(0, tup.symbols[i - 1])
-                elif isinstance(next_symbol, Ystar):
-                    # Handle Ystar expression
-                    lambda_expr = self.stack.pop(0)
-                    eta = Eta()
-                    eta.set_index(lambda_expr.get_index())
-                    eta.set_environment(lambda_expr.get_environment())
-                    eta.set_identifier(lambda_expr.identifiers[0])
-                    eta.set_lambda(lambda_expr)
-                    self.stack.insert(0, eta)
-                elif isinstance(next_symbol, Eta):
-                    # Handle Eta expression
-                    eta = next_symbol
-                    lambda_expr = eta.get_lambda()
-                    self.control.append(Gamma())
-                    self.control.append(Gamma())
-                    self.stack.insert(0, eta)
-                    self.stack.insert(0, lambda_expr)
-                else:
-                    # Handle other symbols
-                    if next_symbol.get_data() == "Print":
-                        pass
-                    elif next_symbol.get_data() == "Stem":
-                        # implement Stem function
-                        s = self.stack.pop(0)
-                        s.set_data(s.get_data()[0])
-                        self.stack.insert(0, s)
-                    elif next_symbol.get_data() == "Stern":
-                        # implement Stern function
-                        s = self.stack.pop(0)
-                        s.set_data(s.get_data()[1:])
-                        self.stack.insert(0, s)
-                    elif next_symbol.get_data() == "Conc":
-                        # implement Conc function
-                        s1 = self.stack.pop(0)
-                        s2 = self.stack.pop(0)
-                        s1.set_data(s1.get_data() + s2.get_data())
-                        self.stack.insert(0, s1)
-                    elif next_symbol.get_data() == "Order":
-                        # implement Order function
-                        tup = self.stack.pop(0)
-                        n = Int(str(len(tup.symbols)))
-                        self.stack.insert(0, n)
-                    elif next_symbol.get_data() == "Isinteger":
-                        # implement Isinteger function
-                        if isinstance(self.stack[0], Int):
-                            self.stack.insert(0, Bool("true"))
-                        else:
-                            self.stack.insert(0, Bool("false"))
-                        self.stack.pop(1)
-                    elif next_symbol.get_data() == "Null":
-                        # implement Null function
-                        pass
-                    elif next_symbol.get_data() == "Itos":
-                        # implement Itos function
-                        pass
-                    elif next_symbol.get_data() == "Isstring":
-                        # implement Isstring function
-                        if isinstance(self.stack[0], Str):
-                            self.stack.insert(0, Bool("true"))
-                        else:
-                            self.stack.insert(0, Bool("false"))
-                        self.stack.pop(1)
-                    elif next_symbol.get_data() == "Istuple":
-                        # implement Istuple function
-                        if isinstance(self.stack[0], Tup):
-                            self.stack.insert(0, Bool("true"))
-                        else:
-                            self.stack.insert(0, Bool("false"))
-                        self.stack.pop(1)
-                    elif next_symbol.get_data() == "Isdummy":
-                        # implement Isdummy function
-                        if isinstance(self.stack[0], Dummy):
-                            self.stack.insert(0, Bool("true"))
-                        else:
-                            self.stack.insert(0, Bool("false"))
-                        self.stack.pop(1)
-                    elif next_symbol.get_data() == "Istruthvalue":
-                        # implement Istruthvalue function
-                        if isinstance(self.stack[0], Bool):
-                            self.stack.insert(0, Bool("true"))
-                        else:
-                            self.stack.insert(0, Bool("false"))
-                        self.stack.pop(1)
-                    elif next_symbol.get_data() == "Isfunction":
-                        # implement Isfunction function
-                        if isinstance(self.stack[0], Lambda):
-                            self.stack.insert(0, Bool("true"))
-                        else:
-                            self.stack.insert(0, Bool("false"))
-                        self.stack.pop(1)
+            self.step(self.control.pop())
 
-            elif isinstance(current_symbol, E):
-                # Handle E expression
-                self.stack.pop(1)
-                self.environment[current_symbol.get_index()].set_is_removed(True)
-                y = len(self.environment)
-                while y > 0:
-                    if not self.environment[y - 1].get_is_removed():
-                        current_environment = self.environment[y - 1]
-                        break
-                    else:
-                        y -= 1
-            elif isinstance(current_symbol, Rator):
-                if isinstance(current_symbol, Uop):
-                    # Handle Unary operation
-                    rator = current_symbol
-                    rand = self.stack.pop(0)
-                    self.stack.insert(0, self.apply_unary_operation(rator, rand))
-                if isinstance(current_symbol, Bop):
-                    # Handle Binary operation
-                    rator = current_symbol
-                    rand1 = self.stack.pop(0)
-                    rand2 = self.stack.pop(0)
-                    self.stack.insert(0, self.apply_binary_operation(rator, rand1, rand2))
-            elif isinstance(current_symbol, Beta):
-                # Handle Beta expression
-                # print(self.stack[0].get_data())
-                # self.print_control()
-                # self.print_stack()
-                # # self.control.pop(-2)
-                # self.print_control()
-                if (self.stack[0].get_data() == "true"):
-                    self.control.pop()
-                else:
-                    self.control.pop(-2)
-                self.stack.pop(0)
-                
-                
-                
-            elif isinstance(current_symbol, Tau):
-                # Handle Tau expression
-                tau = current_symbol
-                tup = Tup()
-                for _ in range(tau.get_n()):
-                    tup.symbols.append(self.stack.pop(0))
-                self.stack.insert(0, tup)
-            elif isinstance(current_symbol, Delta):
-                # Handle Delta expression
-                self.control.extend(current_symbol.symbols)
-            elif isinstance(current_symbol, B):
-                # Handle B expression
-                self.control.extend(current_symbol.symbols)
+    def execute_observed(self):
+        # Execute the CSEMachine, calling every observer around each step. Observers see every
+        # step, so nothing is compiled while they run.
+        if self.governor is not None:
+            self.resume(None)
+            return
+        jit = self.jit
+        self.jit = None
+        try:
+            while self.control:
+                current_symbol = self.control.pop()
+                if isinstance(current_symbol, Fused):
+                    # Observers see the symbols a fused symbol stands for
+                    self.control.extend(current_symbol.symbols)
+                    continue
+                for observer in self.observers:
+                    observer.before_step(self, current_symbol)
+                self.step(current_symbol)
+                for observer in self.observers:
+                    observer.after_step(self, current_symbol)
+        finally:
+            self.jit = jit
+
+    def resume(self, steps):
+        # Run at most steps steps (until the end if steps is None), then return True if the
+        # program has finished. The machine keeps its whole state, so it can be resumed by
+        # calling this again. A governor checks its limits between slices of its interval.
+        governor = self.governor
+        if governor is None:
+            if steps is None:
+                self.execute_observed() if self.observers else self.execute()
             else:
-                self.stack.insert(0, current_symbol)
+                self.run_steps(steps)
+            return not self.control
+        interval = governor.limits.interval
+        while self.control and (steps is None or steps > 0):
+            budget = interval if steps is None else min(interval, steps)
+            done = budget - self.run_steps(budget)
+            governor.check(self, done)
+            if steps is not None:
+                steps -= done
+        return not self.control
 
-    
+    def run_steps(self, steps):
+        # Run at most steps steps and return how many of them were left unused. A compiled
+        # function would run any number of steps as one, so the slice interprets them all; the
+        # machine compiles again once it runs without slices.
+        jit = self.jit
+        self.jit = None
+        control = self.control
+        try:
+            if self.observers:
+                while control and steps > 0:
+                    current_symbol = control.pop()
+                    if isinstance(current_symbol, Fused):
+                        control.extend(current_symbol.symbols)
+                        continue
+                    for observer in self.observers:
+                        observer.before_step(self, current_symbol)
+                    self.step(current_symbol)
+                    for observer in self.observers:
+                        observer.after_step(self, current_symbol)
+                    steps -= 1
+            else:
+                while control and steps > 0:
+                    self.step(control.pop())
+                    steps -= 1
+        finally:
+            self.jit = jit
+        return steps
+
+    def apply_lambda(self, gamma, lambda_expr, memo_key=None):
+        # Bind the operand on the stack to the closure's parameters in a new environment and run its body
+        delta = lambda_expr.get_delta()
+        if self.jit is not None and lambda_expr.memo is None and self.jit_depth < self.jit.max_depth:
+            code = lambda_expr.source.code or self.jit.count(lambda_expr, delta)
+            if code is not None:
+                # A compiled function returns the value the body would leave on the stack
+                self.stack.append(code(self, lambda_expr, self.stack.pop(), self.jit_depth + 1))
+                return
+        if delta.captures or not self.free_environments:
+            e = E(self.j)
+            e.recyclable = not delta.captures
+        else:
+            e = self.free_environments.pop()
+            e.index = self.j
+            e.is_removed = False
+        self.j += 1
+        if memo_key is not None:
+            e.memo = (lambda_expr.memo, memo_key)
+        if len(lambda_expr.identifiers) == 1:
+            temp = self.stack.pop()
+            e.values[lambda_expr.identifiers[0].data] = temp
+        else:
+            tup = self.stack.pop()
+            for i, id in enumerate(lambda_expr.identifiers):
+                e.values[id.data] = tup.symbols[i]
+            if gamma.pack:
+                self.free_tuple(tup)
+        e.parent = lambda_expr.environment
+        self.current_environment = e
+        self.control.append(e)
+        self.control.append(delta)
+        self.stack.append(e)
+        self.environment.append(e)
+
+    def apply(self, gamma, callee, argument, depth):
+        # Apply callee to argument as gamma would, on a nested run of the machine, and return the
+        # result. This is how compiled functions make the calls they do not make themselves.
+        control = self.control
+        bottom = len(control)
+        outer_depth = self.jit_depth
+        self.jit_depth = depth
+        self.stack.append(argument)
+        self.stack.append(callee)
+        control.append(gamma)
+        while len(control) > bottom:
+            self.step(control.pop())
+        self.jit_depth = outer_depth
+        return self.stack.pop()
+
+    def apply_builtin(self, name):
+        # Apply the builtin function name to the operand on the stack
+        if name == "Print":
+            pass
+        elif name == "Stem":
+            # implement Stem function
+            s = self.stack.pop()
+            self.stack.append(Str(s.data[0]))
+        elif name == "Stern":
+            # implement Stern function
+            s = self.stack.pop()
+            self.stack.append(Str(s.data[1:]))
+        elif name == "Conc":
+            # implement Conc function
+            s1 = self.stack.pop()
+            s2 = self.stack.pop()
+            self.stack.append(Str(s1.data + s2.data))
+        elif name == "Order":
+            # implement Order function
+            tup = self.stack.pop()
+            n = Int(str(len(tup.symbols)))
+            self.stack.append(n)
+        elif name == "Isinteger":
+            # implement Isinteger function
+            if isinstance(self.stack[-1], Int):
+                self.stack.append(Bool("true"))
+            else:
+                self.stack.append(Bool("false"))
+            self.stack.pop(-2)
+        elif name == "Null":
+            # implement Null function
+            pass
+        elif name == "Itos":
+            # implement Itos function
+            pass
+        elif name == "Isstring":
+            # implement Isstring function
+            if isinstance(self.stack[-1], Str):
+                self.stack.append(Bool("true"))
+            else:
+                self.stack.append(Bool("false"))
+            self.stack.pop(-2)
+        elif name == "Istuple":
+            # implement Istuple function
+            if isinstance(self.stack[-1], Tup):
+                self.stack.append(Bool("true"))
+            else:
+                self.stack.append(Bool("false"))
+            self.stack.pop(-2)
+        elif name == "Isdummy":
+            # implement Isdummy function
+            if isinstance(self.stack[-1], Dummy):
+                self.stack.append(Bool("true"))
+            else:
+                self.stack.append(Bool("false"))
+            self.stack.pop(-2)
+        elif name == "Istruthvalue":
+            # implement Istruthvalue function
+            if isinstance(self.stack[-1], Bool):
+                self.stack.append(Bool("true"))
+            else:
+                self.stack.append(Bool("false"))
+            self.stack.pop(-2)
+        elif name == "Isfunction":
+            # implement Isfunction function
+            if isinstance(self.stack[-1], Lambda):
+                self.stack.append(Bool("true"))
+            else:
+                self.stack.append(Bool("false"))
+            self.stack.pop(-2)
+
+    def free_tuple(self, tup):
+        # The tuple was built by a Tau for one application and its elements are now bound
+        if len(self.free_tuples) < POOL_SIZE:
+            tup.symbols.clear()
+            self.free_tuples.append(tup)
+
+    def set_governor(self, governor):
+        # A governed run goes in slices (see resume), so compiled functions never hide steps from it
+        self.governor = governor
+
+    def add_observer(self, observer):
+        self.observers.append(observer)
+
+    def step(self, current_symbol):
+        # Process one symbol popped from the control
+        if isinstance(current_symbol, Id):
+            self.stack.append(self.current_environment.lookup(current_symbol))
+            # print(self.current_environment.lookup(current_symbol).get_data())
+        elif isinstance(current_symbol, (Fused, Quickened)) and current_symbol.run(self):
+            # A fused symbol, or a specialized Gamma or Bop site whose guard held
+            pass
+        elif isinstance(current_symbol, Lambda):
+            self.stack.append(current_symbol.bind(self.current_environment))
+            
+            
+        elif isinstance(current_symbol, TailGamma) and self.is_self_tail_call(current_symbol):
+            # Handle a self tail call: rebind the parameters and jump back to the body
+            self.stack.pop()
+            lambda_expr = current_symbol.lambda_
+            if len(lambda_expr.identifiers) == 1:
+                self.current_environment.values[lambda_expr.identifiers[0].data] = self.stack.pop()
+            else:
+                tup = self.stack.pop()
+                for i, id in enumerate(lambda_expr.identifiers):
+                    self.current_environment.values[id.data] = tup.symbols[i]
+                if current_symbol.pack:
+                    self.free_tuple(tup)
+            self.control.append(lambda_expr.get_delta())
+        elif isinstance(current_symbol, Gamma):
+            next_symbol = self.stack.pop()
+            if self.quicken and type(current_symbol) is Gamma:
+                observe(current_symbol, get_gamma_kind(next_symbol))
+            if isinstance(next_symbol, Lambda):
+                # Handle Lambda expression
+                lambda_expr = next_symbol
+                memo_key = None
+                if lambda_expr.memo is not None:
+                    # Memoized function: reuse a cached result for a structurally equal argument
+                    memo_key = get_memo_key(self.stack[-1])
+                    if memo_key is not None:
+                        memo_key = (lambda_expr.environment, memo_key)
+                        value = lambda_expr.memo.get(memo_key)
+                        if value is not None:
+                            self.stack[-1] = value
+                            return
+                self.apply_lambda(current_symbol, lambda_expr, memo_key)
+            elif isinstance(next_symbol, Tup):
+                # Handle Tup expression
+                tup = next_symbol
+                i = int(self.stack.pop().data)
+                self.stack.append(tup.symbols[i - 1])
+            elif isinstance(next_symbol, Ystar) and self.is_rec_lambda(self.stack[-1]):
+                # Handle Ystar expression with a cyclic environment: the rec function's
+                # closure environment binds the function name to the closure itself
+                lambda_expr = self.stack.pop()
+                e = E(self.j)
+                self.j += 1
+                e.parent = lambda_expr.environment
+                rec_lambda = lambda_expr.get_delta().symbols[0].bind(e)
+                e.values[lambda_expr.identifiers[0].data] = rec_lambda
+                self.stack.append(rec_lambda)
+            elif isinstance(next_symbol, Ystar):
+                # Handle Ystar expression
+                lambda_expr = self.stack.pop()
+                eta = Eta()
+                eta.index = lambda_expr.index
+                eta.environment = lambda_expr.environment
+                eta.identifier = lambda_expr.identifiers[0]
+                eta.lambda_ = lambda_expr
+                self.stack.append(eta)
+            elif isinstance(next_symbol, Eta):
+                # Handle Eta expression
+                eta = next_symbol
+                lambda_expr = eta.lambda_
+                self.control.append(Gamma())
+                self.control.append(Gamma())
+                self.stack.append(eta)
+                self.stack.append(lambda_expr)
+            else:
+                # Handle other symbols
+                self.apply_builtin(next_symbol.data)
+
+        elif isinstance(current_symbol, E):
+            # Handle E expression
+            self.stack.pop(-2)
+            if current_symbol.memo is not None and is_memo_value(self.stack[-1]):
+                memo, memo_key = current_symbol.memo
+                memo.put(memo_key, self.stack[-1])
+            # The exited environment is always the innermost active one
+            current_symbol.is_removed = True
+            self.environment.pop()
+            if self.environment:
+                self.current_environment = self.environment[-1]
+            if current_symbol.recyclable and len(self.free_environments) < POOL_SIZE:
+                current_symbol.values.clear()
+                current_symbol.parent = None
+                current_symbol.memo = None
+                self.free_environments.append(current_symbol)
+        elif isinstance(current_symbol, Rator):
+            if isinstance(current_symbol, Uop):
+                # Handle Unary operation
+                rator = current_symbol
+                rand = self.stack.pop()
+                self.stack.append(self.apply_unary_operation(rator, rand))
+            if isinstance(current_symbol, Bop):
+                # Handle Binary operation
+                rator = current_symbol
+                rand1 = self.stack.pop()
+                rand2 = self.stack.pop()
+                if self.quicken:
+                    observe(rator, get_bop_kind(rator, rand1, rand2))
+                self.stack.append(self.apply_binary_operation(rator, rand1, rand2))
+        elif isinstance(current_symbol, Beta):
+            # Handle Beta expression
+            # print(self.stack[-1].get_data())
+            # self.print_control()
+            # self.print_stack()
+            # # self.control.pop(-2)
+            # self.print_control()
+            if (self.stack[-1].data == "true"):
+                self.control.pop()
+            else:
+                self.control.pop(-2)
+            self.stack.pop()
+            
+            
+            
+        elif isinstance(current_symbol, Tau):
+            # Handle Tau expression
+            tau = current_symbol
+            tup = self.free_tuples.pop() if self.free_tuples else Tup()
+            for _ in range(tau.n):
+                tup.symbols.append(self.stack.pop())
+            self.tuple_elements += tau.n
+            self.stack.append(tup)
+        elif isinstance(current_symbol, Delta):
+            # Handle Delta expression
+            self.control.extend(current_symbol.symbols)
+        elif isinstance(current_symbol, B):
+            # Handle B expression
+            self.control.extend(current_symbol.symbols)
+        elif isinstance(current_symbol, Tup):
+            # nil is shared by the control structures and aug extends tuples in place
+            self.stack.append(Tup())
+        else:
+            self.stack.append(current_symbol)
 
     # def print_stack(self):
     #     print("Stack: ", end="")
@@ -252,6 +438,19 @@ class CSEMachine:
             else:
                 print()
                 
+    def is_self_tail_call(self, tail_gamma):
+        # The callee on the stack is a closure of the rec function the TailGamma belongs to
+        callee = self.stack[-1]
+        if isinstance(callee, Lambda):
+            return callee.get_source() is tail_gamma.lambda_
+        return isinstance(callee, Eta)
+
+    def is_rec_lambda(self, lambda_expr):
+        # A rec binding  Y* (lambda f. lambda V. E)  can be tied with a cyclic environment
+        delta = lambda_expr.get_delta()
+        return (len(lambda_expr.identifiers) == 1 and len(delta.symbols) == 1
+                and isinstance(delta.symbols[0], Lambda))
+
     def covert_string_to_bool(self, data):
         if data == "true":
             return True
@@ -260,20 +459,20 @@ class CSEMachine:
 
     def apply_unary_operation(self, rator, rand):
         # Apply unary operation
-        if rator.get_data() == "neg":
-            val = int(rand.get_data())
+        if rator.data == "neg":
+            val = int(rand.data)
             return Int(str(-1 * val))
-        elif rator.get_data() == "not":
-            val = self.covert_string_to_bool(rand.get_data())
+        elif rator.data == "not":
+            val = self.covert_string_to_bool(rand.data)
             return Bool(str(not val).lower())
         else:
             return Err()
 
     def apply_binary_operation(self, rator, rand1, rand2):
         # Apply binary operation
-        if rator.get_data() == "+":
-            val1 = int(rand1.get_data())
-            val2 = int(rand2.get_data())
+        if rator.data == "+":
+            val1 = int(rand1.data)
+            val2 = int(rand2.data)
             return Int(str(val1 + val2))
         elif rator.data == "-":
             val1 = int(rand1.data)
@@ -326,26 +525,34 @@ class CSEMachine:
         elif rator.data == "aug":
             if isinstance(rand2, Tup):
                 rand1.symbols.extend(rand2.symbols)
+                self.tuple_elements += len(rand2.symbols)
             else:
                 rand1.symbols.append(rand2)
+                self.tuple_elements += 1
             return rand1
         else:
             return Err()
 
     def get_tuple_value(self, tup):
         # Get the value of a tuple
-        temp = "("
-        for symbol in tup.symbols:
-            if isinstance(symbol, Tup):
-                temp += self.get_tuple_value(symbol) + ", "
-            else:
-                temp += symbol.get_data() + ", "
-        temp = temp[:-2] + ")"
-        return temp
+        text = io.StringIO()
+        write_value(tup, text)
+        return text.getvalue()
 
     def get_answer(self):
         # Get the answer from the CSEMachine
-        self.execute()
-        if isinstance(self.stack[0], Tup):
-            return self.get_tuple_value(self.stack[0])
-        return self.stack[0].get_data()
+        if self.observers:
+            self.execute_observed()
+        else:
+            self.execute()
+        return self.get_result()
+
+    def get_result(self):
+        # The value left on the stack by a finished program, as printed
+        if isinstance(self.stack[-1], Tup):
+            return self.get_tuple_value(self.stack[-1])
+        return self.stack[-1].get_data()
+
+    def write_result(self, file):
+        # Write the value left on the stack by a finished program to file, in chunks
+        write_value(self.stack[-1], file)
@@ -0,0 +1,72 @@
+from .nodes import *
+
+# Superinstructions: symbols the factory emits in place of control sequences that make up most
+# machine steps (counted with --opstats over Test_Cases), each run by the machine in one step:
+#   Operation    an operator (gamma, binary or unary operator, tau) whose operands are all
+#                identifiers or constants, as in  f x,  x + 1,  (a, b)
+#   Conditional  the  delta delta beta B  sequence of  C -> T | F
+#   Choice       what is left of a Conditional once its condition has been pushed
+# A fused symbol keeps the symbols it stands for in `symbols`. A machine with observers puts
+# those back on the control instead of running the fused symbol, so profiles, traces and step
+# counts are the same as without fusion.
+
+# Operand symbols an Operation evaluates itself: an Id is looked up, a constant is pushed
+LEAVES = (Id, Int, Str, Bool, Dummy)
+
+# Base class of the fused symbols. run(machine) takes the step and returns True.
+class Fused(Symbol):
+    __slots__ = ("symbols", "captures")
+
+# An operator applied to operands that are identifiers or constants.
+class Operation(Fused):
+    __slots__ = ("operator", "operands")
+
+    def __init__(self, operator, operands):
+        self.data = operator.data
+        self.symbols = [operator] + operands
+        self.captures = False     # Leaves and operators create no closures
+        self.operator = operator
+        self.operands = operands[::-1]   # In the order the machine runs them
+
+    def run(self, machine):
+        stack = machine.stack
+        e = machine.current_environment
+        for operand in self.operands:
+            stack.append(e.lookup(operand) if type(operand) is Id else operand)
+        machine.step(self.operator)
+        return True
+
+# A conditional: runs the condition, then its Choice.
+class Conditional(Fused):
+    __slots__ = ("condition", "choice")
+
+    def __init__(self, then_delta, else_delta, beta, condition):
+        self.data = "->"
+        self.symbols = [then_delta, else_delta, beta, condition]
+        self.captures = then_delta.captures or else_delta.captures or condition.captures
+        self.condition = condition
+        self.choice = Choice(then_delta, else_delta, beta)
+
+    def run(self, machine):
+        machine.control.append(self.choice)
+        machine.control.extend(self.condition.symbols)
+        return True
+
+# Pops the value of a condition and runs the branch it selects.
+class Choice(Fused):
+    __slots__ = ("then_delta", "else_delta")
+
+    def __init__(self, then_delta, else_delta, beta):
+        self.data = "beta"
+        self.symbols = [then_delta, else_delta, beta]
+        self.captures = then_delta.captures or else_delta.captures
+        self.then_delta = then_delta
+        self.else_delta = else_delta
+
+    def run(self, machine):
+        # Anything but "true" selects the else branch, as it does for Beta
+        if machine.stack.pop().data == "true":
+            machine.control.extend(self.then_delta.symbols)
+        else:
+            machine.control.extend(self.else_delta.symbols)
+        return True
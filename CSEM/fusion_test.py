@@ -0,0 +1,94 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_machine, get_answer, get_programs, report, finish
+from CSEM.fusion import Fused
+
+# Runs each program with superinstructions and without, and checks that the results are the same
+# when the machine runs straight through and when it runs in slices. Then checks that a machine
+# with an observer steps through the same symbols in the same order either way.
+
+test_cases = {
+    "operations": "let f (x, y) = x * y + x - y in f (3, 4), f (10, 2), (1, 2, 3)",
+    "unary": "let f x = not x in let g x = neg x in f true, g 5, - 3",
+    "conditionals": "let f n = n gr 0 -> 'positive' | n eq 0 -> 'zero' | 'negative' in f 1, f 0, f (-1)",
+    "conditional_on_call": "let p x = x ls 10 in let f n = p n -> n | n - 10 in f 3, f 13",
+    "nested_conditionals": "let f (a, b) = a gr b -> (a gr 0 -> a | 0) | (b gr 0 -> b | 0) in f (1, 2), f (-1, -2), f (5, 3)",
+    "tuple_of_leaves": "let x = 1 in let y = 'two' in (x, y, true, dummy), (x, x)",
+    "recursion": "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in fib 15",
+    "tail_loop": "let rec f (n, a) = n eq 0 -> a | f (n - 1, a + n) in f (300, 0)",
+    "builtins": "let s = 'abc' in Stem s, Stern s, Order (1, 2, 3), Isinteger 3, Istuple nil",
+    "closures": "let add x y = x + y in let inc = add 1 in inc 1, (add 2) 3",
+    "error": "let f x = x + 'a' in f 1",
+}
+
+class StepRecorder:
+    # The class of every symbol the machine steps through
+    def __init__(self):
+        self.steps = []
+
+    def before_step(self, machine, symbol):
+        self.steps.append(type(symbol).__name__)
+
+    def after_step(self, machine, symbol):
+        pass
+
+def run(source, fuse, observer=None, slice_steps=None):
+    cse_machine = get_machine(source, fuse=fuse)
+    if cse_machine is None or slice_steps is None:
+        if cse_machine is not None and observer is not None:
+            cse_machine.add_observer(observer)
+        return get_answer(cse_machine)
+    try:
+        while not cse_machine.resume(slice_steps):
+            pass
+        return cse_machine.get_result()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+def check(test_name, source):
+    plain = run(source, False)
+    fused = run(source, True)
+    sliced = run(source, True, slice_steps=7)
+    plain_steps = StepRecorder()
+    fused_steps = StepRecorder()
+    run(source, False, plain_steps)
+    run(source, True, fused_steps)
+    report(plain == fused == sliced and plain_steps.steps == fused_steps.steps,
+           f"{test_name}: {fused[:50]} ({len(fused_steps.steps)} observed steps)",
+           f"without fusion: {plain[:50]}", f"in slices: {sliced[:50]}",
+           f"observed {len(plain_steps.steps)} steps without fusion")
+
+def get_symbols(symbols):
+    # Every symbol in the control structures under symbols
+    stack = list(symbols)
+    seen = set()
+    while stack:
+        symbol = stack.pop()
+        if id(symbol) in seen:
+            continue
+        seen.add(id(symbol))
+        yield symbol
+        children = getattr(symbol, "symbols", None)
+        if isinstance(children, list):
+            stack.extend(children)
+        delta = getattr(symbol, "delta", None)
+        if delta is not None:
+            stack.append(delta)
+
+def check_fused():
+    # The comparisons mean something only if the factory did fuse
+    cse_machine = get_machine(test_cases["conditionals"], fuse=True)
+    fused = sum(isinstance(symbol, Fused) for symbol in get_symbols(cse_machine.control))
+    report(fused > 0, f"fused: {fused} fused symbols in the control structures")
+
+def run_fusion_tests():
+    for test_name, source in get_programs(test_cases).items():
+        check(test_name, source)
+    check_fused()
+
+if __name__ == "__main__":
+    run_fusion_tests()
+    finish()
@@ -0,0 +1,71 @@
+import json
+import time
+
+# Limits holds the quotas of one run. None means unlimited. The machine checks them every
+# interval steps, so a breach is caught at most interval steps late and the check costs one
+# clock read per interval.
+class Limits:
+    def __init__(self, steps=None, control=None, stack=None, environments=None, tuple_elements=None,
+                 seconds=None, interval=1024):
+        self.steps = steps                     # Machine steps.
+        self.control = control                 # Control length.
+        self.stack = stack                     # Stack length.
+        self.environments = environments       # Environments created.
+        self.tuple_elements = tuple_elements   # Tuple elements created (by tau and aug).
+        self.seconds = seconds                 # Wall-clock time since the run started.
+        self.interval = interval
+
+# QuotaExceeded is raised when a run breaks one of its limits. It names the limit, the value
+# that broke it and the machine's counters at that point.
+class QuotaExceeded(Exception):
+    def __init__(self, limit, value, maximum, stats):
+        super().__init__(f"{limit} limit exceeded: {value} > {maximum}")
+        self.limit = limit
+        self.value = value
+        self.maximum = maximum
+        self.stats = stats
+
+    def to_dict(self):
+        return {"limit": self.limit, "value": self.value, "maximum": self.maximum, "stats": self.stats}
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+# Governor enforces Limits on one machine; see CSEMachine.set_governor.
+class Governor:
+    def __init__(self, limits):
+        self.limits = limits
+        self.steps = 0
+        self.start = time.monotonic()
+
+    def check(self, machine, steps):
+        self.steps += steps
+        limits = self.limits
+        if limits.steps is not None and self.steps > limits.steps:
+            self.fail(machine, "steps", self.steps, limits.steps)
+        if limits.control is not None and len(machine.control) > limits.control:
+            self.fail(machine, "control", len(machine.control), limits.control)
+        if limits.stack is not None and len(machine.stack) > limits.stack:
+            self.fail(machine, "stack", len(machine.stack), limits.stack)
+        if limits.environments is not None and machine.j - 1 > limits.environments:
+            self.fail(machine, "environments", machine.j - 1, limits.environments)
+        if limits.tuple_elements is not None and machine.tuple_elements > limits.tuple_elements:
+            self.fail(machine, "tuple_elements", machine.tuple_elements, limits.tuple_elements)
+        if limits.seconds is not None:
+            seconds = time.monotonic() - self.start
+            if seconds > limits.seconds:
+                self.fail(machine, "seconds", round(seconds, 3), limits.seconds)
+
+    def fail(self, machine, limit, value, maximum):
+        raise QuotaExceeded(limit, value, maximum, self.get_stats(machine))
+
+    def get_stats(self, machine):
+        return {
+            "steps": self.steps,
+            "control": len(machine.control),
+            "stack": len(machine.stack),
+            "environments": machine.j - 1,
+            "active_environments": len(machine.environment),
+            "tuple_elements": machine.tuple_elements,
+            "seconds": round(time.monotonic() - self.start, 3),
+        }
@@ -0,0 +1,91 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_factory, get_machine, get_answer, get_programs, report, finish
+from CSEM.cse_factory import CSEMachineFactory
+from CSEM.nodes import Tup
+
+# Runs each program with symbols interned and subtrees hash-consed and with one fresh symbol per
+# node and no shared structures, and checks that the results are the same for programs that reuse
+# strings, nil, identical subtrees and identical operator sites with different values. Then checks
+# that sharing actually happened and that no run changed a shared symbol.
+
+test_cases = {
+    "stem_stern_shared_string": "let s = 'abc' in Stem s, Stern s, Stem 'abc', Stern 'abc', 'abc'",
+    "stern_chain": "let s = 'hello' in Stern (Stern s), Stem (Stern s), Stem s, s",
+    "conc": "Conc 'ab' 'cd', Conc 'ab' 'ab'",
+    "independent_nils": "let a = nil aug 1 in let b = nil aug 2 in a, b, nil",
+    "nil_in_function": "let f x = nil aug x in f 1, f 2, f 3",
+    "identical_tuples": "let a = (1, 2) in let b = (1, 2) in (a aug 3), b, (1, 2)",
+    "identical_closures": """
+        let make n = (fn x. x + n) in
+        let a = make 1 in let b = make 2 in
+        a 10, b 10, (make 1) 10
+    """,
+    "identical_subtrees_in_closures": """
+        let f n = (fn x. x * 2 + n) in let g n = (fn x. x * 2 + n) in
+        (f 1) 5, (g 100) 5
+    """,
+    "identical_bop_sites": """
+        let f (a, b) = a eq b in let g (a, b) = a eq b in
+        f (1, 1), g ('x', 'x'), f ('a', 'b'), g (true, true)
+    """,
+    "identical_gamma_sites": """
+        let apply (h, x) = h x in let call (h, x) = h x in
+        apply ((fn x. x + 1), 1), call (Stem, 'xyz'), apply (Order, (1, 2, 3)), call ((fn x. x), 'id')
+    """,
+    "strings_in_conditionals": "let f n = n eq 0 -> 'abc' | 'abc' in Stem (f 0), Stern (f 1)",
+}
+
+class PlainFactory(CSEMachineFactory):
+    # Interns nothing and shares no structures
+    def get_subtree_hash(self, node):
+        return None
+
+    def get_symbol(self, node):
+        symbol = CSEMachineFactory.get_symbol(self, node)
+        self.symbols.clear()
+        return symbol
+
+def get_state(symbol):
+    return type(symbol), symbol.get_data(), len(symbol.symbols) if isinstance(symbol, Tup) else None
+
+def run(source, factory_class):
+    # The answer and whether every interned symbol is still as the factory made it
+    factory = get_factory(factory_class)
+    cse_machine = get_machine(source, factory)
+    interned = [(symbol, get_state(symbol)) for symbol in factory.symbols.values()]
+    answer = get_answer(cse_machine)
+    return answer, all(get_state(symbol) == state for symbol, state in interned)
+
+def check(test_name, source):
+    plain, _ = run(source, PlainFactory)
+    interned, unchanged = run(source, CSEMachineFactory)
+    report(plain == interned and unchanged, f"{test_name}: {interned[:60]}", f"without sharing: {plain[:60]}",
+           "shared symbols unchanged" if unchanged else "the run changed a shared symbol")
+
+def check_shared():
+    # The same constant is one symbol, and the same subtree one structure
+    factory = get_factory()
+    get_machine("let f n = n eq 0 -> 'abc' | 'abc' in (f 0, f 1, f 0 eq 'abc' -> nil | nil)", factory)
+    strings = [key for key in factory.symbols if key == "<STR:'abc'>"]
+    ok = len(strings) == 1 and any(key[0] == "delta" for key in factory.structures)
+    report(ok, f"shared: {len(factory.symbols)} interned symbols, {len(factory.structures)} shared structures")
+
+def check_literals():
+    # Every literal is read as itself, shared or not
+    answers = [run("let f x = x in f true, f false, f dummy, false", factory_class)[0]
+               for factory_class in (PlainFactory, CSEMachineFactory)]
+    report(answers == ["(true, false, dummy, false)"] * 2, f"literals: {answers[1]}", f"without sharing: {answers[0]}")
+
+def run_intern_tests():
+    for test_name, source in get_programs(test_cases).items():
+        check(test_name, source)
+    check_shared()
+    check_literals()
+
+if __name__ == "__main__":
+    run_intern_tests()
+    finish()
@@ -0,0 +1,398 @@
+import sys
+import time
+from .nodes import *
+from .fusion import Fused
+
+# Hot-function compiler. The machine counts the applications of each compiled Lambda; on the
+# JIT_AFTER-th one the JIT translates the Lambda's body into Python source, passes it through
+# compile(), and later applications of any closure of that Lambda call the Python function
+# instead of running the body on the control and stack.
+#
+# The counts live on the body's Delta and the compiled function on the Lambda, so both are shared
+# by every machine over the same control structures, as quickened sites are: each run of a
+# Program calls a function compiled by an earlier run from its first application, and nothing is
+# compiled twice.
+#
+# A compiled function keeps its parameters, and the names bound by let and where in its body,
+# in Python locals, and looks other names up in the closure's environment. Arithmetic on
+# integers stays in Python ints until a value leaves the expression (a power goes through its
+# text, as on the machine, so that a negative exponent fails the same way), and comparisons
+# used as conditions become Python conditions. Self tail calls become a loop. Calls to closures of
+# compiled Lambdas are direct Python calls, up to MAX_DEPTH deep (less if the recursion limit
+# has no room for that many, see get_max_depth); any other call, and any deeper one, runs on the
+# machine (see CSEMachine.apply) and returns to the compiled code. A body that creates closures,
+# uses Y* or Conc (which reads the machine stack beyond its argument), or belongs to a memoized
+# function is not compiled and keeps running on the machine.
+
+JIT_AFTER = 16
+MAX_DEPTH = 100
+# Python frames one level of compiled calls takes at most: a call through the machine runs call,
+# CSEMachine.apply, step, a fused Operation's run and the step it makes, a quickened Gamma's run,
+# apply_lambda and the compiled function
+FRAMES_PER_LEVEL = 8
+# Frames kept for whatever runs the machine and for compile()
+RESERVED_FRAMES = 100
+
+# Binary operators on integers whose result is an integer, as Python operators
+ARITHMETIC = {"+": "+", "-": "-", "*": "*", "**": "**"}
+# Comparisons of integers whose result is a truth value. le is left out: the machine makes its
+# result from a Python bool, which a conditional never takes as true.
+COMPARISONS = {"ls": "<", "gr": ">", "ge": ">="}
+
+TRUE = Bool("true")
+FALSE = Bool("false")
+
+class Unsupported(Exception):
+    pass
+
+def is_simple(expression):
+    # A local, a constant or an integer literal, which can be evaluated at any time
+    return expression.isidentifier() or expression.lstrip("-").isdigit()
+
+def get_max_depth():
+    # The deepest nesting of compiled calls that fits in the current recursion limit
+    return max(0, min(MAX_DEPTH, (sys.getrecursionlimit() - RESERVED_FRAMES) // FRAMES_PER_LEVEL))
+
+def make_tuple(symbols):
+    tup = Tup.__new__(Tup)
+    tup.data = "tup"
+    tup.symbols = symbols
+    return tup
+
+def call(machine, gamma, callee, argument, depth):
+    # Apply callee to argument as gamma would, calling compiled functions directly
+    if type(callee) is Lambda:
+        if callee.memo is None and depth < machine.jit.max_depth:
+            code = callee.source.code or machine.jit.count(callee, callee.get_delta())
+            if code is not None:
+                return code(machine, callee, argument, depth + 1)
+    elif type(callee) is Tup:
+        return callee.symbols[int(argument.data) - 1]
+    elif type(callee) is Symbol and callee.data != "Conc":
+        machine.stack.append(argument)
+        machine.apply_builtin(callee.data)
+        return machine.stack.pop()
+    return machine.apply(gamma, callee, argument, depth)
+
+# What the generated source can refer to besides its constants
+GLOBALS = {"Int": Int, "Lambda": Lambda, "Eta": Eta, "TRUE": TRUE, "FALSE": FALSE,
+           "make_tuple": make_tuple, "call": call}
+
+# CompiledFunction records what happened to one hot Lambda, for the report.
+class CompiledFunction:
+    __slots__ = ("template", "name", "calls", "reason", "source")
+
+    def __init__(self, template):
+        self.template = template
+        self.name = (f"{template.name} (lambda#{template.index})" if template.name is not None
+                     else f"lambda#{template.index}")
+        self.calls = 0            # Applications that ran the compiled function.
+        self.reason = None        # Why the body could not be compiled, if it could not.
+        self.source = None        # The generated Python source.
+
+# JIT holds one machine's settings and the functions it compiled.
+class JIT:
+    def __init__(self, threshold=JIT_AFTER):
+        self.threshold = threshold
+        self.max_depth = get_max_depth()    # Read when the machine is created.
+        self.functions = {}       # Lambda -> CompiledFunction, for every Lambda that got hot in this machine
+        self.compile_time = 0.0   # Seconds spent compiling them.
+
+    def count(self, closure, delta):
+        # Count an application of closure, whose Lambda is not compiled, and compile the Lambda
+        # when it gets hot. delta is its body. Returns the compiled function, or None.
+        delta.calls += 1
+        template = closure.source
+        if delta.calls < self.threshold or template.compiled is not None:
+            return None
+        function = CompiledFunction(template)
+        template.compiled = function
+        self.functions[template] = function
+        start = time.perf_counter()
+        try:
+            code = FunctionCompiler(template, function).compile()
+        except Unsupported as e:
+            function.reason = str(e)
+            return None
+        except (RecursionError, SyntaxError):
+            function.reason = "body nested too deeply"
+            return None
+        finally:
+            self.compile_time += time.perf_counter() - start
+        template.code = code
+        return code
+
+    def to_text(self):
+        lines = [f"{'function':<32} {'machine':>10} {'compiled':>10}  status"]
+        for function in self.functions.values():
+            status = "compiled" if function.reason is None else "not compiled: " + function.reason
+            lines.append(f"{function.name:<32} {function.template.get_delta().calls:>10} "
+                         f"{function.calls:>10}  {status}")
+        return "\n".join(lines)
+
+    def to_dict(self):
+        return {function.name: {"machine_calls": function.template.get_delta().calls,
+                                "compiled_calls": function.calls,
+                                "compiled": function.reason is None,
+                                "reason": function.reason}
+                for function in self.functions.values()}
+
+# Node kinds of a parsed body
+LEAF, NIL, GAMMA, TAIL, LET, BOP, UOP, TAU, COND = range(9)
+
+# FunctionCompiler translates the body of one Lambda into the source of a Python function
+# f(m, closure, arg, depth) returning the value the body leaves on the stack.
+class FunctionCompiler:
+    def __init__(self, template, function):
+        self.template = template
+        self.function = function
+        self.constants = {}       # id(value) -> name of the constant in the generated source
+        self.values = []          # Constant values, in the order of their names
+        self.lines = []
+        self.indent = 2
+        self.names = 0
+        self.loops = False        # The body has a self tail call.
+        self.parameters = {}      # Parameter name -> local, for self tail calls to rebind
+        self.binding_lines = 0    # Lines binding the parameters, which stay outside the loop
+
+    def compile(self):
+        if self.template.memo is not None:
+            raise Unsupported("memoized")
+        calls = self.constant(self.function)
+        body = self.parse_all(self.template.get_delta().symbols)
+        scope = {}
+        self.bind(self.template, "arg", scope)
+        result = self.gen(body, scope)
+        self.emit(f"return {result}")
+        head = ["def make(" + ", ".join(self.constant_names()) + "):",
+                "    def f(m, closure, arg, depth):",
+                f"        {calls}.calls += 1",
+                "        e = closure.environment"]
+        if self.loops:
+            # The parameters are bound before the loop, which a self tail call rebinds
+            binding = self.lines[:self.binding_lines]
+            body = ["    " + line for line in self.lines[self.binding_lines:]]
+            self.lines = binding + ["        while True:"] + body
+        source = "\n".join(head + self.lines + ["    return f", ""])
+        namespace = dict(GLOBALS)
+        exec(compile(source, f"<jit {self.function.name}>", "exec"), namespace)
+        self.function.source = source
+        return namespace["make"](*self.values)
+
+    def constant_names(self):
+        return [f"k{i}" for i in range(len(self.values))]
+
+    def constant(self, value):
+        if id(value) not in self.constants:
+            self.constants[id(value)] = f"k{len(self.values)}"
+            self.values.append(value)
+        return self.constants[id(value)]
+
+    def new_name(self, prefix):
+        self.names += 1
+        return f"{prefix}{self.names}"
+
+    def emit(self, line):
+        self.lines.append("    " * self.indent + line)
+
+    def temp(self, expression):
+        # Evaluate expression now, into a new local
+        if is_simple(expression):
+            return expression
+        name = self.new_name("t")
+        self.emit(f"{name} = {expression}")
+        return name
+
+    # Parsing: the delta's symbols are the body in prefix order; the machine runs them backwards.
+
+    def parse_all(self, symbols):
+        node, i = self.parse(symbols, 0)
+        if i != len(symbols):
+            raise Unsupported("unexpected control structure")
+        return node
+
+    def parse(self, symbols, i):
+        symbol = symbols[i]
+        if isinstance(symbol, Id):
+            if symbol.data == "Conc":
+                raise Unsupported("uses Conc")
+            return (LEAF, symbol), i + 1
+        elif type(symbol) in (Int, Str, Bool, Dummy):
+            return (LEAF, symbol), i + 1
+        elif type(symbol) is Tup:
+            return (NIL,), i + 1
+        elif isinstance(symbol, Fused):
+            # A fused symbol stands for its symbols
+            return self.parse_all(symbol.symbols), i + 1
+        elif isinstance(symbol, Gamma):
+            if isinstance(symbols[i + 1], Lambda):
+                # let and where: the Lambda is applied where it is made, so it needs no closure
+                template = symbols[i + 1]
+                if template.memo is not None:
+                    raise Unsupported("memoized")
+                body = self.parse_all(template.get_delta().symbols)
+                rand, i = self.parse(symbols, i + 2)
+                return (LET, template, body, rand), i
+            rator, i = self.parse(symbols, i + 1)
+            rand, i = self.parse(symbols, i)
+            if isinstance(symbol, TailGamma) and symbol.lambda_ is self.template:
+                return (TAIL, symbol, rator, rand), i
+            return (GAMMA, symbol, rator, rand), i
+        elif isinstance(symbol, Bop):
+            rand1, i = self.parse(symbols, i + 1)
+            rand2, i = self.parse(symbols, i)
+            return (BOP, symbol, rand1, rand2), i
+        elif isinstance(symbol, Uop):
+            rand, i = self.parse(symbols, i + 1)
+            return (UOP, symbol, rand), i
+        elif isinstance(symbol, Tau):
+            elements = []
+            i += 1
+            for _ in range(symbol.n):
+                element, i = self.parse(symbols, i)
+                elements.append(element)
+            return (TAU, symbol, elements), i
+        elif isinstance(symbol, Delta):
+            then_delta, else_delta, beta, b = symbols[i:i + 4]
+            if not (isinstance(else_delta, Delta) and isinstance(beta, Beta) and isinstance(b, B)):
+                raise Unsupported("unexpected control structure")
+            return (COND, self.parse_all(b.symbols), self.parse_all(then_delta.symbols),
+                    self.parse_all(else_delta.symbols)), i + 4
+        elif isinstance(symbol, Lambda):
+            raise Unsupported("creates closures")
+        elif isinstance(symbol, Ystar):
+            raise Unsupported("uses Y*")
+        raise Unsupported("uses " + type(symbol).__name__)
+
+    # Code generation. gen returns an expression for the node's value, emitting statements for
+    # anything with an effect first; operands are emitted in the order the machine runs them.
+
+    def bind(self, template, value, scope):
+        # Bind the parameters of template to value as the machine does; returns the new scope
+        identifiers = template.identifiers
+        if len(identifiers) == 1:
+            name = self.new_name("v")
+            self.emit(f"{name} = {value}")
+            scope[identifiers[0].data] = name
+        else:
+            elements = self.new_name("s")
+            self.emit(f"{elements} = {value}.symbols")
+            for i, identifier in enumerate(identifiers):
+                name = self.new_name("v")
+                self.emit(f"{name} = {elements}[{i}]")
+                scope[identifier.data] = name
+        if template is self.template:
+            self.binding_lines = len(self.lines)
+            self.parameters = dict(scope)
+
+    def gen(self, node, scope):
+        kind = node[0]
+        if kind == LEAF:
+            symbol = node[1]
+            if isinstance(symbol, Id):
+                if symbol.data in scope:
+                    return scope[symbol.data]
+                return f"e.lookup({self.constant(symbol)})"
+            return self.constant(symbol)
+        elif kind == NIL:
+            return self.temp("make_tuple([])")
+        elif kind == GAMMA:
+            _, gamma, rator, rand = node
+            argument = self.temp(self.gen(rand, scope))
+            callee = self.temp(self.gen(rator, scope))
+            return self.temp(f"call(m, {self.constant(gamma)}, {callee}, {argument}, depth)")
+        elif kind == TAIL:
+            _, gamma, rator, rand = node
+            argument = self.temp(self.gen(rand, scope))
+            callee = self.temp(self.gen(rator, scope))
+            self.loops = True
+            self.emit(f"if (type({callee}) is Lambda and {callee}.source is {self.constant(self.template)})"
+                      f" or type({callee}) is Eta:")
+            self.indent += 1
+            # The machine rebinds the parameters in place and runs the body again
+            identifiers = self.template.identifiers
+            if len(identifiers) == 1:
+                self.emit(f"{self.parameters[identifiers[0].data]} = {argument}")
+            else:
+                elements = self.new_name("s")
+                self.emit(f"{elements} = {argument}.symbols")
+                for i, identifier in enumerate(identifiers):
+                    self.emit(f"{self.parameters[identifier.data]} = {elements}[{i}]")
+            self.emit("continue")
+            self.indent -= 1
+            return self.temp(f"call(m, {self.constant(gamma)}, {callee}, {argument}, depth)")
+        elif kind == LET:
+            _, template, body, rand = node
+            argument = self.temp(self.gen(rand, scope))
+            inner = dict(scope)
+            self.bind(template, argument, inner)
+            return self.gen(body, inner)
+        elif kind == BOP:
+            rator = node[1]
+            if rator.data in ARITHMETIC or rator.data == "/":
+                return self.temp(f"Int(str({self.gen_arithmetic(node, scope)}))")
+            elif rator.data in COMPARISONS or rator.data in ("eq", "ne"):
+                return self.temp(f"TRUE if {self.gen_condition(node, scope)} else FALSE")
+            rand2 = self.temp(self.gen(node[3], scope))
+            rand1 = self.temp(self.gen(node[2], scope))
+            return self.temp(f"m.apply_binary_operation({self.constant(rator)}, {rand1}, {rand2})")
+        elif kind == UOP:
+            rator = node[1]
+            if rator.data == "neg":
+                return self.temp(f"Int(str({self.gen_int(node, scope)}))")
+            rand = self.temp(self.gen(node[2], scope))
+            return self.temp(f"m.apply_unary_operation({self.constant(rator)}, {rand})")
+        elif kind == TAU:
+            _, tau, elements = node
+            values = [self.temp(self.gen(element, scope)) for element in reversed(elements)]
+            self.emit(f"m.tuple_elements += {tau.n}")
+            return self.temp(f"make_tuple([{', '.join(reversed(values))}])")
+        elif kind == COND:
+            _, condition, then_node, else_node = node
+            test = self.gen_condition(condition, scope)
+            result = self.new_name("t")
+            self.emit(f"if {test}:")
+            self.indent += 1
+            self.emit(f"{result} = {self.gen(then_node, scope)}")
+            self.indent -= 1
+            self.emit("else:")
+            self.indent += 1
+            self.emit(f"{result} = {self.gen(else_node, scope)}")
+            self.indent -= 1
+            return result
+        raise Unsupported("unexpected node")
+
+    def gen_arithmetic(self, node, scope):
+        # An expression for the Python number the machine would make the node's value from
+        rand2 = self.gen_int(node[3], scope)
+        rand2 = self.temp(rand2)
+        rand1 = self.gen_int(node[2], scope)
+        if node[1].data == "/":
+            return f"int({rand1} / {rand2})"
+        return f"({rand1} {ARITHMETIC[node[1].data]} {rand2})"
+
+    def gen_int(self, node, scope):
+        # An expression for the Python int of the node's value, which must be an integer
+        if node[0] == BOP and node[1].data == "**":
+            # A negative exponent makes a fraction, which the machine keeps as text that the
+            # next integer operation fails to read; going through the text fails the same way
+            return f"int(str({self.gen_arithmetic(node, scope)}))"
+        elif node[0] == BOP and (node[1].data in ARITHMETIC or node[1].data == "/"):
+            return self.gen_arithmetic(node, scope)
+        elif node[0] == UOP and node[1].data == "neg":
+            return f"(-{self.gen_int(node[2], scope)})"
+        elif node[0] == LEAF and type(node[1]) is Int:
+            return repr(int(node[1].data))
+        return f"int({self.temp(self.gen(node, scope))}.data)"
+
+    def gen_condition(self, node, scope):
+        # An expression that is true when the machine would take the node's value as true
+        if node[0] == BOP and node[1].data in COMPARISONS:
+            rand2 = self.temp(self.gen_int(node[3], scope))
+            rand1 = self.temp(self.gen_int(node[2], scope))
+            return f"{rand1} {COMPARISONS[node[1].data]} {rand2}"
+        elif node[0] == BOP and node[1].data in ("eq", "ne"):
+            rand2 = self.temp(self.gen(node[3], scope))
+            rand1 = self.temp(self.gen(node[2], scope))
+            return f"{rand1}.data {'==' if node[1].data == 'eq' else '!='} {rand2}.data"
+        return f"{self.temp(self.gen(node, scope))}.data == 'true'"
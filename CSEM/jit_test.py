@@ -0,0 +1,133 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_programs, report, finish
+from CSEM.jit import JIT
+from CSEM.stats import MachineStats
+from Pipeline.program import compile
+
+# Runs each program interpreted, with every function compiled on its first application and with
+# the default threshold, and checks that the three results are the same. Then checks the depth
+# limit under a low recursion limit, that runs in slices stay bounded, and that the runs of one
+# Program share what the first one compiled.
+
+test_cases = {
+    "tail_loop": "let rec f (n, a) = n eq 0 -> a | f (n - 1, a + n) in f (1000, 0)",
+    "tail_loop_one_parameter": "let rec count n = n ls 1 -> 'done' | count (n - 1) in count 500",
+    "tail_call_in_let": "let rec f (n, a) = n eq 0 -> a | (let a = a + n in f (n - 1, a)) in f (50, 0)",
+    "let_shadowing": "let rec f n = n eq 0 -> 0 | (let n = n - 1 in let m = n * 2 in m - n + f n) in f 30",
+    "where_shadowing": "let rec f n = n eq 0 -> 0 | n + f n where n = n - 1 in f 30",
+    "tuple_parameters": "let rec f (a, b, c) = a eq 0 -> (a, b, c) | f (a - 1, c, b + 1) in f (21, 1, 2)",
+    "tuple_argument": """
+        let g (x, y) = x - y in
+        let rec f n = n eq 0 -> 0 | g (n, 1) + f (n - 1) in
+        let t = (5, 3) in (f 20, g t)
+    """,
+    "mixed_types": """
+        let rec f n = n eq 0 -> nil
+            | (f (n - 1)) aug (n eq 'a', n ne 'a', n eq true, true eq 'true', 'x' eq 'x', n ne n,
+                               (n, 1) eq (n, 2), n le 3, n le 3 -> 'le' | 'gt', n ge 3 -> 'ge' | 'ls')
+        in f 20
+    """,
+    "string_operations": "let rec f (s, n) = n eq 0 -> s | f (Stern s, n - 1) in (f ('abcdefghij', 3), Stem 'xyz')",
+    "higher_order": "let rec map f n = n eq 0 -> nil | (map f (n - 1)) aug (f n) in map (fn x. x * x) 20",
+    "negative_power": """
+        let f (x, y) = x ** y + 1 in
+        let rec g n = n eq 0 -> f (2, -1) | f (2, n) + g (n - 1) in g 20
+    """,
+    "negative_power_result": "let f (x, y) = x ** y in let rec g n = n eq 0 -> (f (2, -1), f (2, 3)) | g (n - 1) in g 20",
+    "negative_power_condition": """
+        let f (x, y) = x ** y ls 1 -> 'less' | 'not less' in
+        let rec g n = n eq 0 -> f (2, -1) | (f (2, n), g (n - 1)) in g 20
+    """,
+    "deep_recursion": "let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in f 3000",
+    "deep_mixed_recursion": """
+        let h k n = Isfunction (fn x. x) -> k n | 0 in
+        let rec f n = n eq 0 -> 0 | 1 + h f (n - 1) in f 1000
+    """,
+}
+
+def run(source, jit):
+    # The printed result, or the error, of a run on a new Program
+    try:
+        cse_machine = compile(source).get_cse_machine()
+        cse_machine.jit = jit
+        cse_machine.execute()
+        return cse_machine.get_result()
+    except Exception as e:
+        return f"{type(e).__name__}: {e}"
+
+def check(test_name, source):
+    interpreted = run(source, None)
+    first = run(source, JIT(1))
+    default = run(source, JIT())
+    report(interpreted == first == default, f"{test_name}: {interpreted[:60]}",
+           f"compiled on first application: {first[:60]}", f"default threshold: {default[:60]}")
+
+def check_recursion_limit():
+    # The depth limit follows the recursion limit, so deep mixed recursion fits in a small one
+    limit = sys.getrecursionlimit()
+    sys.setrecursionlimit(300)
+    try:
+        result = run(test_cases["deep_mixed_recursion"], JIT(1))
+    finally:
+        sys.setrecursionlimit(limit)
+    report(result == "1000", f"recursion_limit_300: {result[:60]}")
+
+def check_slices():
+    # A run in slices of 1000 steps takes as many slices with the compiler as without it
+    program = compile("let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in fib 18")
+    slices = []
+    for jit in (None, JIT(1)):
+        execution = program.start()
+        execution.cse_machine.jit = jit
+        count = 1
+        while not execution.resume(1000):
+            count += 1
+        slices.append(count)
+    report(slices[0] == slices[1] > 1, f"slices: {slices}")
+
+def check_after_slices():
+    # A slice interprets every function but leaves the compiler in place, so the rest of the run
+    # compiles; an observed run compiles nothing and keeps it too
+    source = "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in fib 15"
+    cse_machine = compile(source).get_cse_machine()
+    cse_machine.resume(1000)
+    cse_machine.execute()
+    sliced = len(cse_machine.jit.functions)
+    cse_machine = compile(source).get_cse_machine()
+    jit = cse_machine.jit
+    cse_machine.add_observer(MachineStats())
+    cse_machine.execute_observed()
+    observed = len(jit.functions)
+    report(sliced == 1 and observed == 0 and cse_machine.jit is jit,
+           f"after_slices: compiled {sliced} after a slice, {observed} while observed")
+
+def check_shared():
+    # The second run of a Program calls the functions the first one compiled
+    program = compile("let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in fib 15")
+    results = []
+    machines = []
+    for _ in range(2):
+        cse_machine = program.get_cse_machine()
+        cse_machine.execute()
+        results.append(cse_machine.get_result())
+        machines.append(cse_machine)
+    compiled = [len(cse_machine.jit.functions) for cse_machine in machines]
+    report(results == ["610", "610"] and compiled == [1, 0], f"shared: compiled {compiled}")
+
+def run_jit_tests():
+    sys.setrecursionlimit(10000)
+    for test_name, source in get_programs(test_cases).items():
+        check(test_name, source)
+    sys.setrecursionlimit(1000)
+    check_recursion_limit()
+    check_slices()
+    check_after_slices()
+    check_shared()
+
+if __name__ == "__main__":
+    run_jit_tests()
+    finish()
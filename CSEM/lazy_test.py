@@ -0,0 +1,56 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_factory, get_machine, get_answer, get_programs, report, finish
+
+# Runs each program with lambda bodies compiled on first application and with every body compiled
+# up front, and checks that the results are the same. Then checks that a body which is never
+# applied is never compiled, and that a body applied many times is compiled once.
+
+test_cases = {
+    "unused_function": "let f x = x * 2 in let g x = x + 1 in g 41",
+    "unused_branch": "let f n = n gr 0 -> (fn x. x + n) | (fn x. x - n) in (f 3) 10",
+    "recursion": "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in fib 12",
+    "closures": "let add x y = x + y in let inc = add 1 in inc 1, inc 2, (add 10) 5, inc 3",
+    "tuple_parameters": "let f (a, b) = a - b in f (10, 3), f (3, 10)",
+    "higher_order": "let twice f x = f (f x) in twice (fn x. x * 3) 2",
+    "where": "f 5 where f x = x * y where y = 7",
+    "rec_tail_loop": "let rec f (n, a) = n eq 0 -> a | f (n - 1, a + n) in f (100, 0)",
+    "error_in_unused_body": "let f x = x + 'a' in let g x = x in g 1",
+}
+
+def run(source, lazy):
+    # The answer and the number of deltas the factory compiled
+    factory = get_factory(lazy=lazy)
+    return get_answer(get_machine(source, factory)), factory.j
+
+def check(test_name, source):
+    eager, eager_deltas = run(source, False)
+    lazy, lazy_deltas = run(source, True)
+    report(eager == lazy and lazy_deltas <= eager_deltas,
+           f"{test_name}: {lazy[:50]} ({lazy_deltas} of {eager_deltas} deltas compiled)", f"eager: {eager[:50]}")
+
+def check_unused():
+    # Neither f nor the  -  branch closure is applied, so their bodies are never compiled
+    for test_name in ("unused_function", "unused_branch"):
+        _, eager_deltas = run(test_cases[test_name], False)
+        _, lazy_deltas = run(test_cases[test_name], True)
+        report(lazy_deltas == eager_deltas - 1,
+               f"unused {test_name}: {lazy_deltas} deltas compiled, {eager_deltas} up front")
+
+def check_compiled_once():
+    # Applying a function more often compiles nothing more
+    counts = [run(f"let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in f {n}", True)[1] for n in (1, 200)]
+    report(counts[0] == counts[1], f"compiled once: {counts[0]} deltas for 1 call, {counts[1]} for 200")
+
+def run_lazy_tests():
+    for test_name, source in get_programs(test_cases).items():
+        check(test_name, source)
+    check_unused()
+    check_compiled_once()
+
+if __name__ == "__main__":
+    run_lazy_tests()
+    finish()
@@ -0,0 +1,57 @@
+from collections import OrderedDict
+from .nodes import *
+
+# Builtins that depend only on their arguments and leave them untouched.
+PURE_BUILTINS = ("Order", "Isinteger", "Isstring", "Istuple", "Isdummy", "Istruthvalue",
+                 "Isfunction", "Null", "Itos")
+
+# MemoTable is a bounded LRU cache of results for one rec function.
+class MemoTable:
+    def __init__(self, name, capacity=4096):
+        self.name = name              # Name the function is bound to with rec.
+        self.capacity = capacity      # Maximum number of cached results.
+        self.values = OrderedDict()   # Map from (environment, argument key) to result.
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        value = self.values.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self.values.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        self.values[key] = value
+        self.values.move_to_end(key)
+        if len(self.values) > self.capacity:
+            self.values.popitem(last=False)
+
+    def get_report(self):
+        return f"{self.name}: hits={self.hits} misses={self.misses} size={len(self.values)}"
+
+# Structural key of an argument value, or None if the value cannot be keyed (e.g. a function).
+def get_memo_key(value):
+    if isinstance(value, Int):
+        return ("int", value.get_data())
+    elif isinstance(value, Str):
+        return ("str", value.get_data())
+    elif isinstance(value, Bool):
+        return ("bool", value.get_data())
+    elif isinstance(value, Dummy):
+        return ("dummy",)
+    elif isinstance(value, Tup):
+        keys = []
+        for symbol in value.symbols:
+            key = get_memo_key(symbol)
+            if key is None:
+                return None
+            keys.append(key)
+        return ("tup", tuple(keys))
+    return None
+
+# Only values the machine never mutates in place are safe to hand out more than once.
+def is_memo_value(value):
+    return isinstance(value, (Int, Str, Bool, Dummy))
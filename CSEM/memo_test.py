@@ -0,0 +1,69 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_factory, get_machine, get_answer, get_programs, compare, report, finish
+
+# Runs each program with its rec functions memoized and on the plain interpreter, and checks that
+# the results are the same. Then checks the hit, miss and size counters of a memo table, that a
+# small table evicts down to its capacity without changing the result, and which functions
+# --memoize picks on its own.
+
+test_cases = {
+    "fib": "let rec fib n = n ls 2 -> n | fib (n - 1) + fib (n - 2) in fib 15",
+    "tuple_argument": "let rec c (n, k) = k eq 0 or k eq n -> 1 | c (n - 1, k - 1) + c (n - 1, k) in c (12, 6)",
+    "string_argument": "let rec f (s, n) = n eq 0 -> s | f (Stern s, n - 1) in f ('abcdef', 3)",
+    "tuple_result": "let rec f n = n eq 0 -> nil | (f (n - 1)) aug n in f 5",
+    "function_argument": "let rec f (g, n) = n eq 0 -> g 0 | f (g, n - 1) + 1 in f ((fn x. x + 1), 10)",
+    "function_result": "let rec f n = n eq 0 -> (fn x. x) | (fn x. (f (n - 1)) x * 2) in (f 6) 1",
+    "rec_in_function": """
+        let make k = (let rec f n = n eq 0 -> k | f (n - 1) + 1 in f) in
+        (make 1) 5, (make 10) 5
+    """,
+    "shadowed": "let rec f n = n eq 0 -> 0 | 1 + f (n - 1) in (let rec f n = n eq 0 -> 100 | f (n - 1) in f 3) + f 3",
+}
+
+def run(source, memoize, memo_size=4096):
+    # The answer and the memo tables the factory made
+    factory = get_factory(memoize=memoize, memo_size=memo_size)
+    return get_answer(get_machine(source, factory)), factory.memo_tables
+
+def check(test_name, source, memoize):
+    plain, _ = run(source, None)
+    memoized, memo_tables = run(source, memoize)
+    names = ", ".join(table.name for table in memo_tables) or "none memoized"
+    compare(f"{test_name} ({names})", plain, memoized)
+
+def check_counters():
+    # fib 15 misses once per argument 0..15 and hits on the second call of each fib (n - 2)
+    _, memo_tables = run(test_cases["fib"], ["fib"])
+    counters = [(table.hits, table.misses, len(table.values)) for table in memo_tables]
+    report(counters == [(13, 16, 16)], f"counters: {memo_tables[0].get_report() if memo_tables else 'no table'}")
+
+def check_eviction():
+    plain, _ = run(test_cases["fib"], None)
+    memoized, memo_tables = run(test_cases["fib"], ["fib"], memo_size=5)
+    ok = memoized == plain and len(memo_tables) == 1 and len(memo_tables[0].values) <= 5
+    report(ok, f"eviction: {memoized}, {memo_tables[0].get_report() if memo_tables else 'no table'}")
+
+def check_auto():
+    # auto leaves functions that use aug or make closures alone; naming them memoizes them anyway
+    selected = []
+    for memoize in (["auto"], ["f"]):
+        _, memo_tables = run(test_cases["tuple_result"], memoize)
+        selected.append([table.name for table in memo_tables])
+    report(selected == [[], ["f"]], f"auto: selects {selected[0]}, by name {selected[1]}")
+
+def run_memo_tests():
+    for test_name, source in get_programs(test_cases).items():
+        check(test_name, source, ["auto"])
+    for test_name in ("tuple_result", "function_argument", "function_result", "shadowed"):
+        check(test_name + " by name", test_cases[test_name], ["f"])
+    check_counters()
+    check_eviction()
+    check_auto()
+
+if __name__ == "__main__":
+    run_memo_tests()
+    finish()
@@ -0,0 +1,183 @@
+import json
+import threading
+import tracemalloc
+from . import nodes
+from .nodes import *
+
+# The MemStats whose counting constructors are installed, if any
+counting = None
+
+# MemStats samples the shape of the machine's heap every interval steps: live and active
+# environments, tuples and their elements, and string bytes. It also tracks peak control
+# and stack lengths and counts the symbols of each class created during the run.
+#
+# Symbols are made all over the interpreter, so start() counts them by wrapping the
+# constructors of the classes in CSEM.nodes and Lambda.bind, which is process-wide: until
+# finish(), every machine in the process runs the wrappers and is slower. Only the symbols made
+# during a step of the observed machine, on the thread that called start(), are counted, so
+# other executions do not show up in the figures. The wrappers of two MemStats would nest, so
+# only one can count at a time.
+class MemStats:
+    def __init__(self, interval=10000, use_tracemalloc=False):
+        self.interval = interval
+        self.use_tracemalloc = use_tracemalloc
+        self.steps = 0
+        self.max_control = 0
+        self.max_stack = 0
+        self.samples = []
+        self.allocations = {}         # Symbol class name -> instances created
+        self.constructors = {}        # Symbol class -> its own __init__ (None if inherited), while counting
+        self.bind = None              # Original Lambda.bind, while counting
+        self.thread = None            # Thread that started counting.
+        self.in_step = False          # The observed machine is running a step.
+        self.top_allocations = []
+
+    def start(self):
+        # Most classes inherit __init__, so remember which ones define their own, and wrap the
+        # constructors they resolve to before any of them is replaced
+        global counting
+        if counting is not None:
+            raise RuntimeError("another MemStats is already counting allocations")
+        counting = self
+        self.thread = threading.get_ident()
+        classes = get_symbol_classes()
+        constructors = {cls: cls.__init__ for cls in classes}
+        for cls in classes:
+            self.constructors[cls] = cls.__dict__.get("__init__")
+            cls.__init__ = self.get_counting_constructor(cls, constructors[cls])
+        self.bind = Lambda.bind
+        Lambda.bind = self.get_counting_bind(self.bind)
+        if self.use_tracemalloc:
+            tracemalloc.start()
+
+    def get_counting_constructor(self, cls, constructor):
+        allocations = self.allocations
+        name = cls.__name__
+
+        def counting_constructor(symbol, *args):
+            if self.in_step and threading.get_ident() == self.thread:
+                allocations[name] = allocations.get(name, 0) + 1
+            constructor(symbol, *args)
+        return counting_constructor
+
+    def get_counting_bind(self, bind):
+        # Closures are made without calling Lambda.__init__
+        allocations = self.allocations
+
+        def counting_bind(lambda_expr, e):
+            if self.in_step and threading.get_ident() == self.thread:
+                allocations["Lambda"] = allocations.get("Lambda", 0) + 1
+            return bind(lambda_expr, e)
+        return counting_bind
+
+    def finish(self, machine):
+        # Take the last sample and stop counting. Call it however the run ended (in a finally):
+        # until then every machine in the process runs the counting constructors.
+        try:
+            self.sample(machine)
+            if self.use_tracemalloc and tracemalloc.is_tracing():
+                snapshot = tracemalloc.take_snapshot()
+                self.top_allocations = [str(stat) for stat in snapshot.statistics("lineno")[:10]]
+        finally:
+            self.stop()
+
+    def stop(self):
+        # Put the symbol classes back and stop tracemalloc; does nothing if already stopped
+        global counting
+        if counting is self:
+            counting = None
+        self.in_step = False
+        for cls, constructor in self.constructors.items():
+            if constructor is None:
+                del cls.__init__
+            else:
+                cls.__init__ = constructor
+        self.constructors = {}
+        if self.bind is not None:
+            Lambda.bind = self.bind
+            self.bind = None
+        if self.use_tracemalloc and tracemalloc.is_tracing():
+            tracemalloc.stop()
+
+    def before_step(self, machine, symbol):
+        self.steps += 1
+        if len(machine.control) + 1 > self.max_control:
+            self.max_control = len(machine.control) + 1
+        if len(machine.stack) > self.max_stack:
+            self.max_stack = len(machine.stack)
+        if self.steps % self.interval == 0:
+            self.sample(machine)
+        self.in_step = True
+
+    def after_step(self, machine, symbol):
+        self.in_step = False
+
+    def sample(self, machine):
+        # Walk everything reachable from the stack, the environments still on the control
+        # and the closures found along the way
+        live_environments = tuples = tuple_elements = max_tuple = string_bytes = 0
+        seen = set()
+        values = list(machine.stack)
+        values.append(machine.current_environment)
+        values.extend(symbol for symbol in machine.control if isinstance(symbol, E))
+        while values:
+            value = values.pop()
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+            if isinstance(value, E):
+                live_environments += 1
+                values.extend(value.values.values())
+                if value.parent is not None:
+                    values.append(value.parent)
+            elif isinstance(value, Tup):
+                tuples += 1
+                tuple_elements += len(value.symbols)
+                max_tuple = max(max_tuple, len(value.symbols))
+                values.extend(value.symbols)
+            elif isinstance(value, Str):
+                string_bytes += len(value.get_data().encode())
+            elif isinstance(value, (Lambda, Eta)) and value.get_environment() is not None:
+                values.append(value.get_environment())
+        sample = {
+            "step": self.steps,
+            "control": len(machine.control),
+            "stack": len(machine.stack),
+            "live_environments": live_environments,
+            "active_environments": len(machine.environment),
+            "tuples": tuples,
+            "tuple_elements": tuple_elements,
+            "max_tuple": max_tuple,
+            "string_bytes": string_bytes,
+        }
+        if self.use_tracemalloc:
+            sample["traced_bytes"], sample["traced_peak_bytes"] = tracemalloc.get_traced_memory()
+        self.samples.append(sample)
+
+    def get_summary(self):
+        summary = {"steps": self.steps, "max_control": self.max_control, "max_stack": self.max_stack}
+        for key in ("live_environments", "active_environments", "tuples", "tuple_elements",
+                    "max_tuple", "string_bytes"):
+            summary["peak_" + key] = max(sample[key] for sample in self.samples)
+        if self.use_tracemalloc:
+            summary["peak_traced_bytes"] = max(sample["traced_peak_bytes"] for sample in self.samples)
+        summary["allocations"] = dict(sorted(self.allocations.items(), key=lambda item: item[1], reverse=True))
+        return summary
+
+    def to_json(self):
+        return json.dumps({"summary": self.get_summary(), "samples": self.samples,
+                           "top_allocations": self.top_allocations})
+
+    def to_text(self):
+        summary = self.get_summary()
+        allocations = summary.pop("allocations")
+        lines = [f"{key:<28} {value:>12}" for key, value in summary.items()]
+        lines += ["", f"{'symbol class':<28} {'allocations':>12}"]
+        lines += [f"{name:<28} {count:>12}" for name, count in allocations.items()]
+        if self.top_allocations:
+            lines += ["", "top allocation sites:"] + self.top_allocations
+        return "\n".join(lines)
+
+# Every symbol class defined in CSEM.nodes.
+def get_symbol_classes():
+    return [cls for cls in vars(nodes).values() if isinstance(cls, type) and issubclass(cls, Symbol)]
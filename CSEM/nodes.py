@@ -1,5 +1,11 @@
+# Symbols are created on every few machine steps, so every class declares __slots__ (no
+# per-instance __dict__) and sets its fields directly instead of chaining constructors.
+# The machine reads the fields directly; the getters and setters are for everything else.
+
 # Base class for all symbols used in the CSE machine.
 class Symbol:
+    __slots__ = ("data",)
+
     def __init__(self, data):
         self.data = data  # Core value or label of the symbol.
 
@@ -11,44 +17,52 @@ class Symbol:
 
 # Rand represents operands (constants, identifiers, etc.).
 class Rand(Symbol):
-    def __init__(self, data):
-        super().__init__(data)
-
-    def get_data(self):
-        return super().get_data()
+    __slots__ = ()
 
 # Rator represents operators in the CSE machine (unary or binary).
 class Rator(Symbol):
-    def __init__(self, data):
-        super().__init__(data)
+    __slots__ = ()
 
 # B represents the beginning of a new control stack segment (used for scoping).
 class B(Symbol):
+    __slots__ = ("symbols", "captures")
+
     def __init__(self):
-        super().__init__("b")
+        self.data = "b"
         self.symbols = []  # Used to store symbols within a block (optional).
+        self.captures = True      # Whether running the block can create a closure; see Delta.
 
 # Beta symbol for conditional branching in the control structure.
 class Beta(Symbol):
+    __slots__ = ()
+
     def __init__(self):
-        super().__init__("beta")
+        self.data = "beta"
 
 # Boolean constant.
 class Bool(Rand):
-    def __init__(self, data):
-        super().__init__(data)
+    __slots__ = ()
 
 # Binary operator (like +, -, *, /, etc.).
 class Bop(Rator):
+    __slots__ = ("hits", "target")
+
     def __init__(self, data):
-        super().__init__(data)
+        self.data = data
+        self.hits = 0             # Consecutive executions with the same operand kind; see quicken.py.
+        self.target = None        # That operand kind, or what a specialized site runs.
 
 # Delta is a subtree or lambda body stored in the control structure.
 class Delta(Symbol):
+    __slots__ = ("index", "symbols", "captures", "calls")
+
     def __init__(self, i):
-        super().__init__("delta")
+        self.data = "delta"
         self.index = i            # Delta index used to reference it.
         self.symbols = []         # Symbols (AST nodes) inside this delta.
+        self.captures = True      # Whether running it (and the deltas of its conditionals) can create
+                                  # a closure of the current environment. The factory clears it if not.
+        self.calls = 0            # Applications of functions with this body run on the machine; see jit.py.
 
     def set_index(self, i):
         self.index = i
@@ -58,17 +72,23 @@ class Delta(Symbol):
 
 # Dummy is used for dummy variable bindings, such as in recursion (like Y combinator).
 class Dummy(Rand):
+    __slots__ = ()
+
     def __init__(self):
-        super().__init__("dummy")
+        self.data = "dummy"
 
 # E represents an environment record in the environment stack.
 class E(Symbol):
+    __slots__ = ("index", "parent", "is_removed", "values", "memo", "recyclable")
+
     def __init__(self, i):
-        super().__init__("e")
+        self.data = "e"
         self.index = i            # Index to identify the environment.
         self.parent = None        # Reference to the parent environment (lexical scoping).
         self.is_removed = False   # Tracks if the environment is removed from stack.
-        self.values = {}          # Map from Id symbols to their bound values.
+        self.values = {}          # Map from identifier names to their bound values.
+        self.memo = None          # (MemoTable, key) to fill with the result when the environment exits.
+        self.recyclable = False   # No closure can capture it, so the machine reuses it after it exits.
 
     def set_parent(self, e):
         self.parent = e
@@ -90,23 +110,38 @@ class E(Symbol):
 
     # Lookup searches for the value of a variable in the environment chain.
     def lookup(self, id):
-        for key in self.values:
-            if key.get_data() == id.get_data():
-                return self.values[key]
-        if self.parent is not None:
-            return self.parent.lookup(id)
-        else:
-            return Symbol(id.get_data())  # Return an unbound symbol if not found.
+        name = id.data
+        e = self
+        while e is not None:
+            if name in e.values:
+                return e.values[name]
+            e = e.parent
+        return Symbol(name)  # Return an unbound symbol if not found.
+
+    # Number of parent links lookup follows to find the variable (the chain length if unbound).
+    def get_lookup_depth(self, id):
+        depth = 0
+        e = self
+        while e is not None:
+            if id.get_data() in e.values:
+                return depth
+            e = e.parent
+            depth += 1
+        return depth
 
 # Err represents an error symbol.
 class Err(Symbol):
+    __slots__ = ()
+
     def __init__(self):
-        super().__init__("")
+        self.data = ""
 
 # Eta is a closure: a triple of environment, identifier, and lambda body.
 class Eta(Symbol):
+    __slots__ = ("index", "environment", "identifier", "lambda_")
+
     def __init__(self):
-        super().__init__("eta")
+        self.data = "eta"
         self.index = None
         self.environment = None
         self.identifier = None    # The identifier being abstracted.
@@ -135,30 +170,64 @@ class Eta(Symbol):
 
 # Gamma is the apply operator in the CSE machine (used to apply functions).
 class Gamma(Symbol):
-    def __init__(self):
-        super().__init__("gamma")
+    __slots__ = ("pack", "hits", "target")
+
+    def __init__(self, pack=False):
+        self.data = "gamma"
+        self.pack = pack          # The operand is a tuple built just for this application.
+        self.hits = 0             # Consecutive executions with the same callee kind; see quicken.py.
+        self.target = None        # That callee kind, or what a specialized site calls.
+
+# TailGamma is a Gamma in tail position of a rec function's body that calls the function itself.
+# When the callee is the rec closure, the machine rebinds the parameters in place and loops.
+class TailGamma(Gamma):
+    __slots__ = ("lambda_",)
+
+    def __init__(self, lambda_, pack=False):
+        self.data = "gamma"
+        self.pack = pack
+        self.hits = 0
+        self.target = None
+        self.lambda_ = lambda_    # The rec function's Lambda whose parameters are rebound.
+
+    def get_lambda(self):
+        return self.lambda_
 
 # Id represents variable identifiers.
 class Id(Rand):
-    def __init__(self, data):
-        super().__init__(data)
-
-    def get_data(self):
-        return super().get_data()
+    __slots__ = ()
 
 # Integer constants.
 class Int(Rand):
-    def __init__(self, data):
-        super().__init__(data)
+    __slots__ = ()
 
 # Lambda symbol representing a function in the control structure.
 class Lambda(Symbol):
+    __slots__ = ("index", "environment", "identifiers", "delta", "body", "compiler", "memo", "name",
+                 "source", "code", "compiled")
+
     def __init__(self, i):
-        super().__init__("lambda")
+        self.data = "lambda"
         self.index = i              # Index assigned during control structure creation.
         self.environment = None     # The environment in which the lambda was created.
         self.identifiers = []       # List of formal parameters.
         self.delta = None           # The body of the lambda (as a Delta symbol).
+        self.body = None            # Standardized subtree of the body, until it is compiled.
+        self.compiler = None        # Factory that compiles the body on first use.
+        self.memo = None            # MemoTable of results when the function is memoized.
+        self.name = None            # Name the lambda is bound to, if the factory could tell.
+        self.source = None          # For a closure, the compiled Lambda it was made from.
+        self.code = None            # The body compiled to a Python function, for every machine; see jit.py.
+        self.compiled = None        # The JIT's CompiledFunction once the body got hot, compiled or not.
+                                    # Closures leave these two unset: the machine reads the source's.
+
+    def __getstate__(self):
+        # Compiled code cannot be pickled: a restored Lambda is compiled again when it is next hot
+        state = {name: getattr(self, name) for name in ("data",) + Lambda.__slots__ if hasattr(self, name)}
+        if "code" in state:
+            state["code"] = None
+            state["compiled"] = None
+        return (None, state)
 
     def set_environment(self, n):
         self.environment = n
@@ -169,22 +238,55 @@ class Lambda(Symbol):
     def set_delta(self, delta):
         self.delta = delta
 
+    # The body is compiled into a Delta the first time it is needed, then cached.
+    def set_body(self, body, compiler):
+        self.body = body
+        self.compiler = compiler
+
     def get_delta(self):
+        if self.delta is None:
+            if self.source is not None:
+                self.delta = self.source.get_delta()
+            else:
+                self.delta = self.compiler.get_delta(self.body)
+                self.body = None
+                self.compiler = None
         return self.delta
 
+    # A closure is a copy of the compiled Lambda that records the environment it was created in,
+    # so the control structures can be shared by several closures and several machines.
+    def bind(self, e):
+        # Runs once per closure, so the fields are set here rather than in __init__ and again
+        closure = Lambda.__new__(Lambda)
+        closure.data = "lambda"
+        closure.index = self.index
+        closure.environment = e
+        closure.identifiers = self.identifiers
+        closure.delta = self.delta
+        closure.body = None
+        closure.compiler = None
+        closure.memo = self.memo
+        closure.name = self.name
+        closure.source = self
+        return closure
+
+    def get_source(self):
+        return self.source if self.source is not None else self
+
     def get_index(self):
         return self.index
 
 # String constants.
 class Str(Rand):
-    def __init__(self, data):
-        super().__init__(data)
+    __slots__ = ()
 
 # Tau is used to create a tuple of size n.
 class Tau(Symbol):
+    __slots__ = ("n",)
+
     def __init__(self, n):
-        super().__init__("tau")
-        self.set_n(n)
+        self.data = "tau"
+        self.n = n
 
     def set_n(self, n):
         self.n = n
@@ -194,16 +296,19 @@ class Tau(Symbol):
 
 # Tup is the tuple data structure to hold a sequence of values.
 class Tup(Rand):
+    __slots__ = ("symbols",)
+
     def __init__(self):
-        super().__init__("tup")
+        self.data = "tup"
         self.symbols = []  # Elements of the tuple.
 
 # Uop represents unary operators.
 class Uop(Rator):
-    def __init__(self, data):
-        super().__init__(data)
+    __slots__ = ()
 
 # Y* is a special symbol used for recursive function application (Y combinator).
 class Ystar(Symbol):
+    __slots__ = ()
+
     def __init__(self):
-        super().__init__("<Y*>")
+        self.data = "<Y*>"
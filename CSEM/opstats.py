@@ -0,0 +1,88 @@
+import json
+from .nodes import *
+
+# Name of the kind of step the machine is about to take for a symbol popped from the control.
+def get_step_kind(machine, symbol):
+    if isinstance(symbol, Id):
+        return "id"
+    elif isinstance(symbol, Lambda):
+        return "lambda"
+    elif isinstance(symbol, TailGamma) and machine.is_self_tail_call(symbol):
+        return "tail_call"
+    elif isinstance(symbol, Gamma):
+        callee = machine.stack[-1]
+        if isinstance(callee, Lambda):
+            return "gamma:lambda"
+        elif isinstance(callee, Tup):
+            return "gamma:tuple"
+        elif isinstance(callee, Ystar):
+            return "gamma:ystar"
+        elif isinstance(callee, Eta):
+            return "gamma:eta"
+        return "gamma:builtin:" + str(callee.get_data())
+    elif isinstance(symbol, E):
+        return "env_exit"
+    elif isinstance(symbol, Uop):
+        return "uop:" + symbol.get_data()
+    elif isinstance(symbol, Bop):
+        return "bop:" + symbol.get_data()
+    elif isinstance(symbol, Beta):
+        return "beta"
+    elif isinstance(symbol, Tau):
+        return "tau"
+    elif isinstance(symbol, Delta):
+        return "delta"
+    elif isinstance(symbol, B):
+        return "b"
+    return "push:" + type(symbol).__name__.lower()
+
+# OpStats counts step kinds, consecutive pairs of step kinds and lookup chain depths.
+# The total step count does not depend on the host, so it can serve as a cost metric.
+class OpStats:
+    def __init__(self):
+        self.total = 0
+        self.kinds = {}
+        self.pairs = {}
+        self.previous = None
+        self.lookups = 0
+        self.lookup_depth = 0
+
+    def before_step(self, machine, symbol):
+        kind = get_step_kind(machine, symbol)
+        self.total += 1
+        self.kinds[kind] = self.kinds.get(kind, 0) + 1
+        if self.previous is not None:
+            pair = (self.previous, kind)
+            self.pairs[pair] = self.pairs.get(pair, 0) + 1
+        self.previous = kind
+        if kind == "id":
+            self.lookups += 1
+            self.lookup_depth += machine.current_environment.get_lookup_depth(symbol)
+
+    def after_step(self, machine, symbol):
+        pass
+
+    def get_average_lookup_depth(self):
+        return self.lookup_depth / self.lookups if self.lookups else 0.0
+
+    def to_dict(self):
+        return {
+            "total_steps": self.total,
+            "kinds": dict(sorted(self.kinds.items(), key=lambda item: item[1], reverse=True)),
+            "pairs": {f"{a} -> {b}": n for (a, b), n in sorted(self.pairs.items(), key=lambda item: item[1], reverse=True)},
+            "average_lookup_depth": self.get_average_lookup_depth(),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def to_text(self, top_pairs=20):
+        lines = [f"total steps: {self.total}",
+                 f"average lookup depth: {self.get_average_lookup_depth():.2f}",
+                 "", f"{'step kind':<32} {'count':>10} {'share':>7}"]
+        for kind, n in sorted(self.kinds.items(), key=lambda item: item[1], reverse=True):
+            lines.append(f"{kind:<32} {n:>10} {n / self.total:>7.1%}")
+        lines += ["", f"{'step pair':<48} {'count':>10}"]
+        for (a, b), n in sorted(self.pairs.items(), key=lambda item: item[1], reverse=True)[:top_pairs]:
+            lines.append(f"{a + ' -> ' + b:<48} {n:>10}")
+        return "\n".join(lines)
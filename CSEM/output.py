@@ -0,0 +1,49 @@
+from .nodes import *
+
+# Writes a value the way the interpreter prints it. Tuples are walked with an explicit stack,
+# so nesting depth is not limited by Python's recursion limit, and the text goes to the file
+# in chunks of about chunk_size characters, so printing a large tuple takes linear time and
+# no more extra memory than one chunk and the nesting depth.
+
+CHUNK_SIZE = 1 << 16
+
+def write_value(symbol, file, chunk_size=CHUNK_SIZE):
+    if not isinstance(symbol, Tup):
+        file.write(str(symbol.get_data()))
+        return
+    if not symbol.symbols:
+        # An empty tuple prints as ")", as it always has
+        file.write(")")
+        return
+    parts = ["("]
+    size = 1
+    stack = [iter(symbol.symbols)]   # One iterator per open tuple, innermost last.
+    first = True                     # No element of the innermost open tuple written yet.
+    while stack:
+        for element in stack[-1]:
+            if not first:
+                parts.append(", ")
+                size += 2
+            first = False
+            if isinstance(element, Tup):
+                if element.symbols:
+                    parts.append("(")
+                    size += 1
+                    stack.append(iter(element.symbols))
+                    first = True
+                    break
+                text = ")"
+            else:
+                text = str(element.get_data())
+            parts.append(text)
+            size += len(text)
+            if size >= chunk_size:
+                file.write("".join(parts))
+                parts.clear()
+                size = 0
+        else:
+            # The innermost tuple is exhausted
+            stack.pop()
+            parts.append(")")
+            size += 1
+    file.write("".join(parts))
@@ -0,0 +1,137 @@
+import time
+from .nodes import *
+
+# FunctionProfile accumulates the cost of one Lambda over a run.
+class FunctionProfile:
+    def __init__(self, name):
+        self.name = name
+        self.calls = 0
+        self.inclusive_steps = 0
+        self.exclusive_steps = 0
+        self.inclusive_time = 0.0
+        self.exclusive_time = 0.0
+        self.active = 0           # Activations currently on the call stack.
+        self.max_depth = 0        # Deepest recursion seen.
+
+# Frame is one activation of a function, from its Gamma until its environment exits.
+class Frame:
+    def __init__(self, profile, environment, stack_node, steps, start):
+        self.profile = profile
+        self.environment = environment
+        self.stack_node = stack_node    # Node of the call-stack trie for this frame's stack.
+        self.steps = steps
+        self.start = start
+        self.child_steps = 0
+        self.child_time = 0.0
+
+# StackNode is a node of the call-stack trie used for the collapsed-stack output.
+class StackNode:
+    def __init__(self, name, parent):
+        self.name = name
+        self.parent = parent
+        self.children = {}
+        self.time = 0.0           # Exclusive time spent with exactly this stack.
+
+    def get_child(self, name):
+        if name not in self.children:
+            self.children[name] = StackNode(name, self)
+        return self.children[name]
+
+# Profiler attributes machine steps and wall time to the Lambdas that run them.
+# It is a machine observer, so a run without it pays nothing.
+class Profiler:
+    def __init__(self):
+        self.profiles = {}
+        self.steps = 0
+        self.root = StackNode("<main>", None)
+        self.frames = [Frame(self.get_profile(None), None, self.root, 0, time.perf_counter())]
+        self.frames[0].profile.calls = 1
+        self.frames[0].profile.active = 1
+        self.frames[0].profile.max_depth = 1
+        self.callee = None
+        self.j = 0
+
+    def get_profile(self, lambda_expr):
+        key = None if lambda_expr is None else lambda_expr.get_index()
+        if key not in self.profiles:
+            self.profiles[key] = FunctionProfile(self.get_name(lambda_expr))
+        return self.profiles[key]
+
+    def get_name(self, lambda_expr):
+        if lambda_expr is None:
+            return "<main>"
+        if lambda_expr.name is None:
+            return f"lambda#{lambda_expr.get_index()}"
+        return f"{lambda_expr.name} (lambda#{lambda_expr.get_index()})"
+
+    def before_step(self, machine, symbol):
+        self.steps += 1
+        if isinstance(symbol, TailGamma) and machine.is_self_tail_call(symbol):
+            # A self tail call loops inside the current activation
+            self.frames[-1].profile.calls += 1
+        elif isinstance(symbol, Gamma) and isinstance(machine.stack[-1], Lambda):
+            self.callee = machine.stack[-1]
+            self.j = machine.j
+        elif isinstance(symbol, E) and len(self.frames) > 1 and self.frames[-1].environment is symbol:
+            self.exit_frame()
+
+    def after_step(self, machine, symbol):
+        if self.callee is None:
+            return
+        profile = self.get_profile(self.callee)
+        profile.calls += 1
+        if machine.j != self.j:
+            # The application created an environment; memo hits do not
+            self.enter_frame(profile, machine.current_environment)
+        self.callee = None
+
+    def enter_frame(self, profile, environment):
+        profile.active += 1
+        profile.max_depth = max(profile.max_depth, profile.active)
+        stack_node = self.frames[-1].stack_node.get_child(profile.name)
+        self.frames.append(Frame(profile, environment, stack_node, self.steps, time.perf_counter()))
+
+    def exit_frame(self):
+        frame = self.frames.pop()
+        steps = self.steps - frame.steps
+        elapsed = time.perf_counter() - frame.start
+        self.attribute(frame, steps, elapsed)
+        self.frames[-1].child_steps += steps
+        self.frames[-1].child_time += elapsed
+
+    def attribute(self, frame, steps, elapsed):
+        profile = frame.profile
+        profile.active -= 1
+        profile.exclusive_steps += steps - frame.child_steps
+        profile.exclusive_time += elapsed - frame.child_time
+        frame.stack_node.time += elapsed - frame.child_time
+        # Recursive activations are already inside the outermost one
+        if profile.active == 0:
+            profile.inclusive_steps += steps
+            profile.inclusive_time += elapsed
+
+    def finish(self):
+        # Close the activations still open (the main program, or all of them after an error)
+        while len(self.frames) > 1:
+            self.exit_frame()
+        frame = self.frames.pop()
+        self.attribute(frame, self.steps - frame.steps, time.perf_counter() - frame.start)
+
+    def get_table(self):
+        profiles = sorted(self.profiles.values(), key=lambda p: p.exclusive_time, reverse=True)
+        lines = [f"{'function':<32} {'calls':>8} {'depth':>6} {'excl steps':>11} {'incl steps':>11} "
+                 f"{'excl ms':>10} {'incl ms':>10}"]
+        for p in profiles:
+            lines.append(f"{p.name:<32} {p.calls:>8} {p.max_depth:>6} {p.exclusive_steps:>11} "
+                         f"{p.inclusive_steps:>11} {p.exclusive_time * 1000:>10.3f} {p.inclusive_time * 1000:>10.3f}")
+        return "\n".join(lines)
+
+    def write_collapsed_stacks(self, file):
+        # One "frame;frame;frame microseconds" line per distinct stack, for flamegraph tools
+        nodes = [(self.root, self.root.name)]
+        while nodes:
+            node, path = nodes.pop()
+            if node.time > 0:
+                file.write(f"{path} {int(node.time * 1e6)}\n")
+            for child in node.children.values():
+                nodes.append((child, path + ";" + child.name))
@@ -0,0 +1,158 @@
+from .nodes import *
+
+# Adaptive specialization of Gamma and Bop sites, after CPython 3.11's quickening interpreter.
+# A site is rewritten in place: once a generic site has run QUICKEN_AFTER times in a row with the
+# same kind of operands, its class is switched to a specialized subclass with the same fields. A
+# specialized site checks a guard and runs a short path; when the guard fails it switches back to
+# the generic class, waits BACKOFF executions and starts counting again.
+#
+# A site object is not tied to one place in the program. The factory hash-conses identical
+# subtrees (see CSEMachineFactory.get_subtree_hash), so the Gamma and Bop sites inside them are
+# shared by every copy, and the rewrite persists across runs of the same control structures.
+# This is safe because a specialized site checks its guard every time it runs, and behaves
+# exactly like the generic one when the guard holds. The copies only share one operand history:
+# if they see different kinds of operands, the site deoptimizes more often.
+
+QUICKEN_AFTER = 8
+BACKOFF = 64
+
+# The value of Bop with two integer operands, as CSEMachine.apply_binary_operation computes it.
+# The top of the stack is the first operand. These are module functions rather than lambdas so
+# that a checkpoint can pickle a specialized site.
+def add(x, y): return Int(str(int(x.data) + int(y.data)))
+def subtract(x, y): return Int(str(int(x.data) - int(y.data)))
+def multiply(x, y): return Int(str(int(x.data) * int(y.data)))
+def divide(x, y): return Int(str(int(int(x.data) / int(y.data))))
+def power(x, y): return Int(str(int(x.data) ** int(y.data)))
+def equal(x, y): return Bool(str(x.data == y.data).lower())
+def not_equal(x, y): return Bool(str(x.data != y.data).lower())
+def less(x, y): return Bool(str(int(x.data) < int(y.data)).lower())
+def less_equal(x, y): return Bool(int(x.data) <= int(y.data))
+def greater(x, y): return Bool(str(int(x.data) > int(y.data)).lower())
+def greater_equal(x, y): return Bool(str(int(x.data) >= int(y.data)).lower())
+
+INT_OPERATIONS = {
+    "+": add, "-": subtract, "*": multiply, "/": divide, "**": power,
+    "eq": equal, "ne": not_equal, "ls": less, "le": less_equal, "gr": greater, "ge": greater_equal,
+}
+
+TUPLE = "tuple"   # Callee kind of a tuple selection
+
+def observe(site, kind):
+    # Count a generic execution of site with operands of kind (None if they can't be
+    # specialized) and specialize the site once the same kind has been seen often enough
+    if site.hits < 0:
+        site.hits += 1
+    elif kind is None:
+        site.hits = 0
+        site.target = None
+    elif site.target is kind or site.target == kind:
+        site.hits += 1
+        if site.hits >= QUICKEN_AFTER:
+            specialize(site, kind)
+    else:
+        site.target = kind
+        site.hits = 1
+
+def specialize(site, kind):
+    if isinstance(site, Bop):
+        site.__class__ = IntBop
+        site.target = INT_OPERATIONS[kind]
+    elif isinstance(kind, Lambda):
+        site.__class__ = LambdaGamma
+        site.target = kind
+    elif kind is TUPLE:
+        site.__class__ = TupleGamma
+    else:
+        site.__class__ = BuiltinGamma
+        site.target = kind
+    site.hits = 0
+
+def deoptimize(site, generic):
+    site.__class__ = generic
+    site.target = None
+    site.hits = -BACKOFF
+
+def unquicken(symbols):
+    # Put every specialized site among symbols back to its generic class for good, as if the
+    # sites had never been specialized (for a restored machine run with quickening off)
+    for symbol in symbols:
+        if isinstance(symbol, Quickened):
+            symbol.__class__ = Bop if isinstance(symbol, Bop) else Gamma
+            symbol.target = None
+            symbol.hits = 0
+
+def get_bop_kind(rator, rand1, rand2):
+    if type(rand1) is Int and type(rand2) is Int and rator.data in INT_OPERATIONS:
+        return rator.data
+    return None
+
+def get_gamma_kind(callee):
+    # The template of a closure, TUPLE, or the name of a builtin
+    if type(callee) is Lambda:
+        return callee.source if callee.memo is None else None
+    elif type(callee) is Tup:
+        return TUPLE
+    elif type(callee) is Symbol:
+        return callee.data
+    return None
+
+# Quickened is the base of the specialized sites. run returns False, without touching the
+# machine, if the guard failed and the site went back to its generic class.
+class Quickened:
+    __slots__ = ()
+
+# Bop on two integers.
+class IntBop(Bop, Quickened):
+    __slots__ = ()
+
+    def run(self, machine):
+        stack = machine.stack
+        rand1 = stack[-1]
+        rand2 = stack[-2]
+        if type(rand1) is Int and type(rand2) is Int:
+            stack.pop()
+            stack[-1] = self.target(rand1, rand2)
+            return True
+        deoptimize(self, Bop)
+        return False
+
+# Gamma applying closures of one Lambda.
+class LambdaGamma(Gamma, Quickened):
+    __slots__ = ()
+
+    def run(self, machine):
+        callee = machine.stack[-1]
+        if type(callee) is Lambda and callee.source is self.target:
+            machine.stack.pop()
+            machine.apply_lambda(self, callee)
+            return True
+        deoptimize(self, Gamma)
+        return False
+
+# Gamma selecting an element of a tuple.
+class TupleGamma(Gamma, Quickened):
+    __slots__ = ()
+
+    def run(self, machine):
+        stack = machine.stack
+        callee = stack[-1]
+        if type(callee) is Tup and type(stack[-2]) is Int:
+            stack.pop()
+            stack[-1] = callee.symbols[int(stack[-1].data) - 1]
+            return True
+        deoptimize(self, Gamma)
+        return False
+
+# Gamma calling one builtin function.
+class BuiltinGamma(Gamma, Quickened):
+    __slots__ = ()
+
+    def run(self, machine):
+        callee = machine.stack[-1]
+        if type(callee) is Symbol and callee.data == self.target:
+            machine.stack.pop()
+            machine.apply_builtin(self.target)
+            return True
+        deoptimize(self, Gamma)
+        return False
@@ -0,0 +1,126 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_machine, get_answer, get_programs, compare, report, finish
+from CSEM.nodes import Bop, Gamma
+from CSEM.quicken import BACKOFF
+
+# Runs each program with quickening on and off and checks that the results are the same. The
+# programs run a site often enough to specialize it, then give it operands or a callee of another
+# kind. An observer records the class of every site after each step, to check that the sites did
+# specialize, went back to their generic class when the guard failed, and specialized again.
+# The accumulators make each site see the kinds in the order written: the machine evaluates the
+# right operand of  +  first, so  (...) + go (n + 1)  would see them in reverse. In shared_site
+# the bodies of f and g are one hash-consed Delta, so its Gamma sees the callees of both.
+
+test_cases = {
+    "int_then_string": """
+        let v n = n ls 20 -> n | 'x' in
+        let rec go (n, a) = n gr 40 -> a | go (n + 1, a + (v n eq v n -> 1 | 0)) in
+        go (1, 0)
+    """,
+    "int_then_bool": """
+        let v n = n ls 20 -> n | n ls 30 in
+        let rec go (n, a) = n gr 40 -> a | go (n + 1, a + (v n ne v (n + 1) -> 1 | 0)) in
+        go (1, 0)
+    """,
+    "string_then_int": """
+        let v n = n ls 20 -> 'a' | n in
+        let rec go (n, a) = n gr 40 -> a | go (n + 1, a + (v n eq v n -> 1 | 0)) in
+        go (1, 0)
+    """,
+    "int_again_after_backoff": """
+        let v n = n ls 20 or n gr 30 -> n | 'x' in
+        let rec go (n, a) = n gr 200 -> a | go (n + 1, a + (v n eq v n -> 1 | 0)) in
+        go (1, 0)
+    """,
+    "callee_changes": """
+        let apply (h, x) = h x in
+        let rec go (n, a) = n eq 0 -> a | go (n - 1, a + apply ((n gr 10 -> (fn x. x + 1) | (fn x. x * 2)), n)) in
+        go (30, 0)
+    """,
+    "lambda_then_tuple": """
+        let select (h, x) = h x in
+        let rec go (n, a) = n eq 0 -> a | go (n - 1, a + (n gr 10 -> select ((fn x. x), n) | select ((10, 20, 30), 2))) in
+        go (30, 0)
+    """,
+    "tuple_then_builtin": """
+        let select (h, x) = h x in
+        let rec go (n, a) = n eq 0 -> a | go (n - 1, a + (n gr 10 -> select ((10, 20, 30), 3) | select (Order, (1, 2)))) in
+        go (30, 0)
+    """,
+    "builtin_then_lambda": """
+        let select (h, x) = h x in
+        let rec go (n, a) = n eq 0 -> a | go (n - 1, a + (n gr 10 -> select (Order, (1, 2, 3)) | select ((fn x. x - 1), n))) in
+        go (30, 0)
+    """,
+    "same_template_other_closures": """
+        let make k = fn x. x + k in
+        let rec go (n, a) = n eq 0 -> a | go (n - 1, a + (make n) 1) in
+        go (30, 0)
+    """,
+    "shared_site": """
+        let f h = h 1 in let g h = h 1 in
+        let inc x = x + 1 in
+        let rec go (n, a) = n eq 0 -> a | go (n - 1, a + (n gr 10 -> f inc | g (10, 20))) in
+        go (30, 0)
+    """,
+    "tuple_index_type_change": """
+        let select (t, i) = t i in
+        let rec go (n, T) = n eq 0 -> T | go (n - 1, T aug (n gr 2 -> select ((1, 2, 3), 1) | select ((1, 2, 3), 'x'))) in
+        go (12, nil)
+    """,
+}
+
+class SiteHistory:
+    # Classes each Gamma and Bop site went through, and the hits of sites just deoptimized
+    def __init__(self):
+        self.classes = {}
+        self.backoffs = []
+
+    def before_step(self, machine, symbol):
+        pass
+
+    def after_step(self, machine, symbol):
+        if isinstance(symbol, (Gamma, Bop)):
+            classes = self.classes.setdefault(id(symbol), [])
+            name = type(symbol).__name__
+            if not classes or classes[-1] != name:
+                if name in ("Gamma", "Bop") and classes:
+                    self.backoffs.append(symbol.hits)
+                classes.append(name)
+
+def run(source, quicken, observer=None):
+    cse_machine = get_machine(source, quicken=quicken)
+    if cse_machine is not None and observer is not None:
+        cse_machine.add_observer(observer)
+    return get_answer(cse_machine)
+
+def check_deoptimized(test_name, specialized, generic, respecialized=False):
+    # Some site went from generic to specialized and back, and a site that went back is waiting
+    # out its backoff (the generic run after the failed guard already counts)
+    observer = SiteHistory()
+    run(test_cases[test_name], True, observer)
+    pattern = [generic, specialized, generic] + ([specialized] if respecialized else [])
+    found = any(classes[i:i + len(pattern)] == pattern
+                for classes in observer.classes.values() for i in range(len(classes)))
+    ok = found and observer.backoffs and all(-BACKOFF <= hits < 0 for hits in observer.backoffs)
+    report(ok, f"{test_name}: a site went {' -> '.join(pattern)}")
+
+def run_quicken_tests():
+    for test_name, source in get_programs(test_cases).items():
+        compare(test_name, run(source, False), run(source, True), "without quickening")
+    check_deoptimized("int_then_string", "IntBop", "Bop")
+    check_deoptimized("int_then_bool", "IntBop", "Bop")
+    check_deoptimized("int_again_after_backoff", "IntBop", "Bop", respecialized=True)
+    check_deoptimized("callee_changes", "LambdaGamma", "Gamma")
+    check_deoptimized("lambda_then_tuple", "LambdaGamma", "Gamma")
+    check_deoptimized("tuple_then_builtin", "TupleGamma", "Gamma")
+    check_deoptimized("builtin_then_lambda", "BuiltinGamma", "Gamma")
+    check_deoptimized("shared_site", "LambdaGamma", "Gamma")
+
+if __name__ == "__main__":
+    run_quicken_tests()
+    finish()
@@ -0,0 +1,76 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import CSEM.csemachine
+from CSEM.checks import get_machine, get_answer, get_programs, compare, report, finish
+from CSEM.nodes import Eta
+
+# Runs each program with rec functions tied by a cyclic environment and with every rec binding
+# unfolded through Eta, as the plain interpreter does, and checks that the results are the same.
+# Then checks that tying rec functions makes no Eta at all, and pins the one visible difference:
+# Isfunction is true for a rec function, which used to be an Eta and answered false.
+
+test_cases = {
+    "recursion": "let rec f n = n eq 0 -> 0 | n + f (n - 1) in f 100",
+    "tuple_parameters": "let rec f (a, b) = a eq 0 -> b | f (a - 1, b + a) in f (50, 0)",
+    "rec_returned": "let rec f n = n eq 0 -> 0 | f (n - 1) in let g = f in g 10",
+    "rec_passed": "let apply (h, x) = h x in let rec f n = n eq 0 -> 'zero' | f (n - 1) in apply (f, 7)",
+    "rec_in_function": """
+        let make k = (let rec f n = n eq 0 -> k | f (n - 1) in f) in
+        (make 1) 5 + (make 10) 5
+    """,
+    "nested_rec": """
+        let rec outer n = n eq 0 -> 0
+            | (let rec inner m = m eq 0 -> 1 | inner (m - 1) in inner n) + outer (n - 1)
+        in outer 10
+    """,
+    "closure_of_rec": "let rec f n = n eq 0 -> (fn x. x) | (fn x. (f (n - 1)) x + 1) in (f 5) 0",
+    "rec_without_lambda": "let rec t = (1, 2) in t",
+    "rec_fn": "let rec f = fn n. n eq 0 -> 1 | n * f (n - 1) in f 6",
+    "tail_loop": "let rec f (n, a) = n eq 0 -> a | f (n - 1, a + n) in f (200, 0)",
+}
+
+class CountedEta(Eta):
+    # Stands in for Eta in the machine module to count the Etas a run makes
+    made = 0
+
+    def __init__(self, *args):
+        Eta.__init__(self, *args)
+        CountedEta.made += 1
+
+def run(source, cyclic):
+    cse_machine = get_machine(source)
+    if cse_machine is not None and not cyclic:
+        # Every Y* application takes the Eta path
+        cse_machine.is_rec_lambda = lambda lambda_expr: False
+    return get_answer(cse_machine)
+
+def check_no_eta():
+    counts = []
+    CSEM.csemachine.Eta = CountedEta
+    try:
+        for cyclic in (True, False):
+            CountedEta.made = 0
+            run(test_cases["recursion"], cyclic)
+            counts.append(CountedEta.made)
+    finally:
+        CSEM.csemachine.Eta = Eta
+    report(counts[0] == 0 and counts[1] > 0, f"no eta: {counts[0]} Etas made, {counts[1]} when unfolded")
+
+def check_isfunction():
+    source = "let rec f n = n eq 0 -> 0 | f (n - 1) in Isfunction f, Isfunction (fn x. x)"
+    answers = (run(source, True), run(source, False))
+    report(answers == ("(true, true)", "(false, true)"),
+           f"isfunction: {answers[0]}, {answers[1]} when unfolded through Eta")
+
+def run_rec_tests():
+    for test_name, source in get_programs(test_cases).items():
+        compare(test_name, run(source, False), run(source, True), "unfolded through Eta")
+    check_no_eta()
+    check_isfunction()
+
+if __name__ == "__main__":
+    run_rec_tests()
+    finish()
@@ -0,0 +1,121 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+import CSEM.csemachine
+from CSEM.checks import get_machine, get_answer, get_programs, compare, report, finish
+from CSEM.nodes import Lambda, Tup
+
+# Runs each program with exited environments and bound argument tuples recycled and with recycling
+# off, and checks that the results are the same. While the recycling runs go, an observer checks
+# after every step that nothing in the free lists is still reachable: no active environment, no
+# environment a closure refers to (or any of its parents), and no tuple on the stack or bound to a
+# name. A run that breaks this stops with an error. The programs make closures that escape the
+# call that made them and pass tuples that are still bound elsewhere.
+
+test_cases = {
+    "curried": "let add x y z = x + y + z in let f = add 1 in let g = f 2 in g 3, g 4, (f 5) 6",
+    "curried_in_recursion": """
+        let add x y = x + y in
+        let rec build (n, fs) = n eq 0 -> fs | build (n - 1, fs aug (add n)) in
+        let fs = build (5, nil) in
+        (fs 1) 10, (fs 5) 10
+    """,
+    "closures_in_tuples": """
+        let make n = (fn x. x + n), (fn x. x * n) in
+        let p = make 3 in let q = make 4 in
+        (p 1) 10, (p 2) 10, (q 1) 10, (q 2) 10
+    """,
+    "closure_returned": """
+        let rec make n = n eq 0 -> (fn x. x) | (let g = make (n - 1) in fn x. g x + n) in
+        (make 10) 0, (make 3) 100
+    """,
+    "closure_over_tuple_parameters": """
+        let f (a, b) = fn x. a * x + b in
+        let g = f (2, 3) in let h = f (10, 20) in
+        g 1, h 1, g 2
+    """,
+    "tuple_argument_kept": "let keep t = fn x. t in let k = keep (1, 2, 3) in let u = (4, 5) in k 0, u",
+    "tuple_argument_returned": "let id (a, b) = (a, b) in let f (a, b) = a + b in id (1, 2), f (3, 4), id (5, 6)",
+    "named_tuple_argument": "let t = (1, 2) in let f (a, b) = a + b in f t, t, f t",
+    "tuple_bound_whole": "let f t = t in let g (a, b) = f (a, b) in g (1, 2), g (3, 4)",
+    "nested_calls": """
+        let rec f (n, a) = n eq 0 -> a | f (n - 1, a + g (n, n)) where g (x, y) = x * y in
+        f (30, 0)
+    """,
+    "higher_order": """
+        let compose (f, g) = fn x. f (g x) in
+        let inc x = x + 1 in let dbl x = x * 2 in
+        let h = compose (inc, dbl) in let k = compose (dbl, inc) in
+        h 5, k 5, h 6
+    """,
+}
+
+class FreeListChecker:
+    # Stops the run at the first step after which a recycled environment or tuple is reachable,
+    # since the run could go on to loop or answer wrongly
+    def __init__(self):
+        self.steps = 0
+
+    def before_step(self, machine, symbol):
+        pass
+
+    def after_step(self, machine, symbol):
+        self.steps += 1
+        free_environments = {id(e) for e in machine.free_environments}
+        free_tuples = {id(t) for t in machine.free_tuples}
+        environments = list(machine.environment)
+        values = list(machine.stack)
+        for e in machine.environment:
+            values.extend(e.values.values())
+        seen = set()
+        while values:
+            value = values.pop()
+            if id(value) in seen:
+                continue
+            seen.add(id(value))
+            if isinstance(value, Tup):
+                if id(value) in free_tuples:
+                    raise AssertionError(f"recycled tuple reachable after step {self.steps}")
+                values.extend(value.symbols)
+            elif isinstance(value, Lambda) and value.environment is not None:
+                # A wrongly recycled environment can end up among its own parents
+                e = value.environment
+                while e is not None and id(e) not in seen:
+                    seen.add(id(e))
+                    environments.append(e)
+                    values.extend(e.values.values())
+                    e = e.parent
+        if any(id(e) in free_environments for e in environments):
+            raise AssertionError(f"recycled environment reachable after step {self.steps}")
+
+def run(source, recycle, observer=None):
+    cse_machine = get_machine(source)
+    if cse_machine is not None and observer is not None:
+        cse_machine.add_observer(observer)
+    pool_size = CSEM.csemachine.POOL_SIZE
+    if not recycle:
+        CSEM.csemachine.POOL_SIZE = 0
+    try:
+        return get_answer(cse_machine)
+    finally:
+        CSEM.csemachine.POOL_SIZE = pool_size
+
+def check_recycled():
+    # The checks mean something only if the machine did recycle
+    cse_machine = get_machine(test_cases["nested_calls"])
+    get_answer(cse_machine)
+    sizes = (len(cse_machine.free_environments), len(cse_machine.free_tuples))
+    report(min(sizes) > 0, f"recycled: {sizes[0]} free environments, {sizes[1]} free tuples at the end")
+
+def run_recycle_tests():
+    for test_name, source in get_programs(test_cases).items():
+        observer = FreeListChecker()
+        recycled = run(source, True, observer)
+        compare(f"{test_name} ({observer.steps} steps checked)", run(source, False), recycled, "without recycling")
+    check_recycled()
+
+if __name__ == "__main__":
+    run_recycle_tests()
+    finish()
@@ -0,0 +1,35 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_machine, get_answer, report, finish
+from CSEM.cse_factory import CSEMachineFactory
+from CSEM.jit import JIT
+
+# The machine stack keeps its top at the end of the list. Programs that underflow it (Conc takes
+# its second string from whatever is on the stack) must still fail with the message the machine
+# gave when the top was at index 0. The expected answers were recorded from that machine; each
+# program runs on the plain interpreter and with every optimization on.
+
+test_cases = {
+    "conc": ("Conc 'ab' 'cd'", "IndexError: pop index out of range"),
+    "conc_twice": ("Conc 'ab' 'cd', Conc 'ab' 'ab'", "IndexError: pop from empty list"),
+    "conc_in_function": ("let f x = Conc x in f 'a' 'b'", "IndexError: pop index out of range"),
+    "conc_of_tuple": ("Conc ('a', 'b')", "IndexError: pop index out of range"),
+    "nested_conc": ("Conc (Conc 1 'ab') (Conc 'c' Conc)", "IndexError: pop from empty list"),
+    "conc_of_nil": ("let f x = Conc 1 nil in f (Stem, nil)", "IndexError: pop index out of range"),
+    "conc_in_recursion": ("let rec f n = n eq 0 -> Conc 'a' 'b' | f (n - 1) in f 3", "IndexError: pop index out of range"),
+    "conc_in_tuple": ("(Conc 'a' 'b', 1)", "IndexError: pop index out of range"),
+}
+
+def run_stack_tests():
+    for test_name, (source, expected) in test_cases.items():
+        plain = get_answer(get_machine(source))
+        optimized = get_answer(get_machine(source, factory=CSEMachineFactory(), quicken=True, jit=JIT()))
+        report(plain == optimized == expected, f"{test_name}: {plain}",
+               f"with every optimization: {optimized}", f"expected: {expected}")
+
+if __name__ == "__main__":
+    run_stack_tests()
+    finish()
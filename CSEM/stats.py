@@ -0,0 +1,25 @@
+# MachineStats counts steps and tracks peak control and stack depth while the machine runs.
+class MachineStats:
+    def __init__(self):
+        self.steps = 0
+        self.max_control = 0
+        self.max_stack = 0
+
+    def before_step(self, machine, symbol):
+        self.steps += 1
+        # The popped symbol still counts towards the control depth of this step
+        if len(machine.control) + 1 > self.max_control:
+            self.max_control = len(machine.control) + 1
+        if len(machine.stack) > self.max_stack:
+            self.max_stack = len(machine.stack)
+
+    def after_step(self, machine, symbol):
+        pass
+
+    def get_counters(self, machine):
+        return {
+            "steps": self.steps,
+            "max_control": self.max_control,
+            "max_stack": self.max_stack,
+            "environments": machine.j - 1,
+        }
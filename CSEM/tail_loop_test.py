@@ -0,0 +1,65 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import get_machine, get_answer, get_programs, compare, report, finish
+
+# Runs each program with self tail calls compiled into loops and on the plain interpreter, and
+# checks that the results are the same, including for functions whose recursion is not all in
+# tail position. Then checks that a tail loop keeps the control, stack and environments bounded
+# however many times it goes round, while the plain interpreter keeps one environment per call.
+
+test_cases = {
+    "sum": "let rec Loop (N, S) = N eq 0 -> S | Loop (N - 1, S + N) in Loop (1000, 0)",
+    "count_down": "let rec count n = n ls 1 -> 'done' | count (n - 1) in count 500",
+    "both_branches": "let rec f (n, a) = n eq 0 -> a | n gr 50 -> f (n - 2, a + 1) | f (n - 1, a * 1) in f (101, 0)",
+    "tuple_accumulator": "let rec build (n, T) = n eq 0 -> T | build (n - 1, T aug n) in build (20, nil)",
+    "not_all_tail": "let rec f n = n eq 0 -> 0 | n + f (n - 1) in f 100",
+    "tail_and_not_tail": "let rec f n = n ls 2 -> n | n gr 10 -> f (n - 1) | f (n - 1) + f (n - 2) in f 20",
+    "closure_in_body": "let rec f (n, g) = n eq 0 -> g 0 | f (n - 1, (fn x. g x + n)) in f (10, (fn x. x))",
+    "shadowed_name": "let rec f n = n eq 0 -> 0 | (let f = fn x. x + 1 in f n) in f 5",
+    "gcd": "let rec gcd (a, b) = b eq 0 -> a | gcd (b, a - (a / b) * b) in gcd (1071, 462)",
+}
+
+LOOP = "let rec Loop (N, S) = N eq 0 -> S | Loop (N - 1, S + N) in Loop ({}, 0)"
+
+class PeakSizes(list):
+    # A control list that records the largest control, stack and environment lengths seen each
+    # time the machine takes a symbol from it
+    def __init__(self, cse_machine):
+        list.__init__(self, cse_machine.control)
+        self.cse_machine = cse_machine
+        self.peak = (0, 0, 0)
+
+    def pop(self, *args):
+        sizes = (len(self), len(self.cse_machine.stack), len(self.cse_machine.environment))
+        self.peak = tuple(max(a, b) for a, b in zip(self.peak, sizes))
+        return list.pop(self, *args)
+
+def get_peak(source, tail_loops):
+    cse_machine = get_machine(source, tail_loops=tail_loops)
+    cse_machine.control = PeakSizes(cse_machine)
+    get_answer(cse_machine)
+    return cse_machine.control.peak
+
+def check_bounded():
+    # The peak sizes of a tail loop do not depend on the number of iterations
+    peaks = [get_peak(LOOP.format(n), True) for n in (100, 1000)]
+    report(peaks[0] == peaks[1],
+           f"bounded: control, stack, environments {peaks[0]} for 100 and {peaks[1]} for 1000 iterations")
+
+def check_calls_grow():
+    # Without loops the same program keeps one environment per pending call
+    peak = get_peak(LOOP.format(1000), False)
+    report(peak[2] > 1000, f"plain calls: {peak[2]} environments")
+
+def run_tail_loop_tests():
+    for test_name, source in get_programs(test_cases).items():
+        compare(test_name, get_answer(get_machine(source)), get_answer(get_machine(source, tail_loops=True)))
+    check_bounded()
+    check_calls_grow()
+
+if __name__ == "__main__":
+    run_tail_loop_tests()
+    finish()
@@ -0,0 +1,51 @@
+from array import array
+
+# Tracer records compact step events in a fixed-size ring buffer: step number, symbol class,
+# symbol index (for Delta, Lambda and E), stack depth and current environment index.
+# Nothing is written until dump is called, so it can stay enabled on long runs.
+class Tracer:
+    def __init__(self, capacity=100000, sample=1):
+        self.capacity = capacity
+        self.sample = sample          # Record every sample-th step.
+        self.steps = 0
+        self.recorded = 0             # Events recorded so far; the buffer keeps the last capacity.
+        self.step_numbers = array("q", bytes(8 * capacity))
+        self.kinds = array("b", bytes(capacity))
+        self.indices = array("q", bytes(8 * capacity))
+        self.stack_depths = array("q", bytes(8 * capacity))
+        self.environments = array("q", bytes(8 * capacity))
+        self.codes = {}               # Symbol class -> kind code
+        self.names = []               # Kind code -> symbol class name
+
+    def before_step(self, machine, symbol):
+        self.steps += 1
+        if self.steps % self.sample:
+            return
+        code = self.codes.get(type(symbol))
+        if code is None:
+            code = self.codes[type(symbol)] = len(self.names)
+            self.names.append(type(symbol).__name__)
+        i = self.recorded % self.capacity
+        self.step_numbers[i] = self.steps
+        self.kinds[i] = code
+        index = getattr(symbol, "index", None)
+        self.indices[i] = index if isinstance(index, int) else -1
+        self.stack_depths[i] = len(machine.stack)
+        self.environments[i] = machine.current_environment.get_index()
+        self.recorded += 1
+
+    def after_step(self, machine, symbol):
+        pass
+
+    def get_events(self):
+        # Recorded events, oldest first
+        start = max(0, self.recorded - self.capacity)
+        for n in range(start, self.recorded):
+            i = n % self.capacity
+            yield (self.step_numbers[i], self.names[self.kinds[i]], self.indices[i],
+                   self.stack_depths[i], self.environments[i])
+
+    def dump(self, file):
+        file.write("step kind index stack env\n")
+        for step, kind, index, depth, environment in self.get_events():
+            file.write(f"{step} {kind} {index} {depth} {environment}\n")
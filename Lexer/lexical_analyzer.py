@@ -27,54 +27,47 @@ class Token:
 
 
 
+# Token patterns, tried in order at the current position
+patterns = {
+    # Single-line comment: starts with // and goes until the end of the line
+    'COMMENT': r'//.*',
+    # Keywords: exact matches for reserved words, ending on a word boundary
+    'KEYWORD': r'(let|in|fn|where|aug|or|not|gr|ge|ls|le|eq|ne|true|false|nil|dummy|within|and|rec)\b',
+    # String literals enclosed in single quotes, allowing escaped single quotes
+    'STRING': r'\'(?:\\\'|[^\'])*\'',
+    # Identifiers: start with a letter, followed by letters, digits, or underscores
+    'ID': r'[a-zA-Z][a-zA-Z0-9_]*',
+    # Integer literals: one or more digits
+    'INT': r'\d+',
+    # Operators: one or more of the specified symbols
+    'OPERATOR': r'[+\-*<>&.@/:=~|$\#!%^_\[\]{}"\'?]+',
+    # Whitespace: one or more spaces, tabs, or newlines
+    'SPACES': r'[ \t\n]+',
+    # Punctuation characters
+    'PUNCTUATION': r'[();,]'
+}
+compiled_patterns = [(key, re.compile(pattern)) for key, pattern in patterns.items()]
+
 def tokenize(input_str):
     tokens = []
-    keywords = {
-        # Single-line comment: starts with // and goes until the end of the line
-        'COMMENT': r'//.*',
-        # Keywords: exact matches for reserved words, ending on a word boundary
-        'KEYWORD': r'(let|in|fn|where|aug|or|not|gr|ge|ls|le|eq|ne|true|false|nil|dummy|within|and|rec)\b',
-        # String literals enclosed in single quotes, allowing escaped single quotes
-        'STRING': r'\'(?:\\\'|[^\'])*\'',
-        # Identifiers: start with a letter, followed by letters, digits, or underscores
-        'ID': r'[a-zA-Z][a-zA-Z0-9_]*',
-        # Integer literals: one or more digits
-        'INT': r'\d+',
-        # Operators: one or more of the specified symbols
-        'OPERATOR': r'[+\-*<>&.@/:=~|$\#!%^_\[\]{}"\'?]+',
-        # Whitespace: one or more spaces, tabs, or newlines
-        'SPACES': r'[ \t\n]+',
-        # Punctuation characters
-        'PUNCTUATION': r'[();,]'
-    }
-    
-    while input_str:
+    # Match at a moving position instead of slicing the input, which would copy it per token
+    position = 0
+    while position < len(input_str):
         # Flag to check if a pattern matched
         matched = False
-        for key, pattern in keywords.items():
-            match = re.match(pattern, input_str)
+        for key, pattern in compiled_patterns:
+            match = pattern.match(input_str, position)
             if match:
-                # print(key, match.group(0))
-                if key != 'SPACES':
-                    if key == 'COMMENT':
-                        # If it's a comment, remove the comment from input
-                        comment = match.group(0)
-                        input_str = input_str[match.end():]
-                        matched = True
-                        break
-                    else:
-                        # Get the corresponding TokenType
-                        token_type = getattr(TokenType, key)  
-                        if not isinstance(token_type, TokenType):
-                            raise ValueError(f"Token type '{key}' is not a valid TokenType")
-                        # Create and add the token to the list
-                        tokens.append(Token(token_type, match.group(0)))
-                        input_str = input_str[match.end():]
-                        matched = True
-                        break
-                input_str = input_str[match.end():]
+                if key != 'SPACES' and key != 'COMMENT':
+                    # Get the corresponding TokenType
+                    token_type = getattr(TokenType, key)
+                    # Create and add the token to the list
+                    tokens.append(Token(token_type, match.group(0)))
+                position = match.end()
                 matched = True
                 break
         if not matched:
             print("Error: Unable to tokenize input")
+            # Skip the character so the lexer cannot loop forever
+            position += 1
     return tokens
@@ -47,22 +47,34 @@ class Node:
 # Main Parser class implementing a recursive descent parser
 class Parser:
     def __init__(self, tokens):
-        self.tokens = tokens        
+        self.tokens = tokens
+        self.position = 0          # Index of the current token in the list
         self.ast = []              # Stack-based AST construction (nodes in reverse order)
         self.string_ast = []       # String representation of the AST
 
     def peek_token(self):
         """Safely peek at the current token without consuming it"""
-        if self.tokens:
-            return self.tokens[0]
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
         return None
 
     def consume_token(self):
         """Safely consume and return the current token"""
-        if self.tokens:
-            return self.tokens.pop(0)
+        if self.position < len(self.tokens):
+            token = self.tokens[self.position]
+            self.position += 1
+            if self.position * 2 > len(self.tokens):
+                # Drop the consumed half: each token is moved at most once more, so
+                # consuming stays O(1) amortized and consumed tokens are freed early
+                self.drop_consumed_tokens()
+            return token
         return None
 
+    def drop_consumed_tokens(self):
+        """Remove the tokens before the current one from the token list"""
+        del self.tokens[:self.position]
+        self.position = 0
+
     def parse(self):
         """Main parsing entry point - parses the entire token stream"""
         # Add end-of-tokens marker to simplify parsing logic
@@ -71,6 +83,8 @@ class Parser:
         # Start parsing from the top-level expression rule
         self.E()
         
+        self.drop_consumed_tokens()
+
         # Check if all tokens were consumed successfully
         if self.tokens[0].type == TokenType.END_OF_TOKENS:
             return self.ast
@@ -548,7 +562,7 @@ class Parser:
             
         elif token.type == TokenType.ID:
             # Look ahead to determine definition type
-            next_token = self.tokens[1] if len(self.tokens) > 1 else None
+            next_token = self.tokens[self.position + 1] if len(self.tokens) > self.position + 1 else None
             
             if next_token and (next_token.value == "(" or next_token.type == TokenType.ID):
                 # Function definition: ID Vb+ = E
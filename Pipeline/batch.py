@@ -0,0 +1,84 @@
+import contextlib
+import io
+import json
+import os
+import signal
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+from CSEM.governor import QuotaExceeded
+from Pipeline.timings import Timings
+
+# Runs every file of a directory through the interpreter on a pool of processes. Each file's
+# output is exactly what  python myrpal.py FILE  would print to stdout with the same options.
+# Results are written in file name order, as JSON lines on stdout or as one FILE.out per file.
+
+# Raised by the timeout alarm. It is not an Exception, so the interpreter's own error
+# handling, which prints exceptions as program output, does not swallow it.
+class ProgramTimeout(BaseException):
+    pass
+
+def on_timeout(signum, frame):
+    raise ProgramTimeout()
+
+def get_worker_count():
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+def run_file(path, args, timeout):
+    # Imported here: myrpal imports this module
+    from myrpal import run
+    output = io.StringIO()
+    result = {"file": path, "status": "ok"}
+    start = time.perf_counter()
+    if timeout:
+        signal.signal(signal.SIGALRM, on_timeout)
+        signal.setitimer(signal.ITIMER_REAL, timeout)
+    try:
+        with open(path, "r") as file:
+            input_text = file.read()
+        with contextlib.redirect_stdout(output):
+            run(input_text, args, Timings())
+    except ProgramTimeout:
+        result["status"] = "timeout"
+    except QuotaExceeded as e:
+        result["status"] = "quota"
+        result["error"] = e.to_dict()
+    except Exception as e:
+        result["status"] = "error"
+        result["error"] = f"{type(e).__name__}: {e}"
+    finally:
+        if timeout:
+            signal.setitimer(signal.ITIMER_REAL, 0)
+    result["time"] = time.perf_counter() - start
+    result["output"] = output.getvalue()
+    return result
+
+def run_batch(directory, args):
+    files = sorted(os.path.join(directory, name) for name in os.listdir(directory)
+                   if os.path.isfile(os.path.join(directory, name)))
+    jobs = args.jobs or get_worker_count()
+    # Several small programs per task, so tiny files don't pay a round trip each
+    chunksize = max(1, len(files) // (jobs * 4))
+    if args.batch_output:
+        os.makedirs(args.batch_output, exist_ok=True)
+    statuses = {}
+    start = time.perf_counter()
+    with ProcessPoolExecutor(jobs) as executor:
+        for result in executor.map(run_file, files, repeat(args), repeat(args.timeout), chunksize=chunksize):
+            statuses[result["status"]] = statuses.get(result["status"], 0) + 1
+            if args.batch_output:
+                name = os.path.basename(result["file"]) + ".out"
+                with open(os.path.join(args.batch_output, name), "w") as file:
+                    file.write(result["output"])
+                if result["status"] != "ok":
+                    print(f"{result['file']}: {result['status']} {result.get('error', '')}".rstrip(),
+                          file=sys.stderr)
+            else:
+                print(json.dumps(result), flush=True)
+    elapsed = time.perf_counter() - start
+    counts = ", ".join(f"{count} {status}" for status, count in sorted(statuses.items()))
+    print(f"{len(files)} programs in {elapsed:.3f} s ({len(files) / max(elapsed, 1e-9):.1f} programs/s) "
+          f"on {jobs} workers: {counts or 'none'}", file=sys.stderr)
@@ -0,0 +1,258 @@
+import gc
+import json
+import math
+import os
+import resource
+import selectors
+import signal
+import socket
+import time
+from collections import deque
+from Pipeline.session import Session
+
+# WorkerPool is a local server on a Unix socket. The interpreter is imported once in the
+# server process, which then forks a pool of workers that share those pages copy-on-write.
+# Clients send the JSON-lines requests of Session (see session.py) and get one response line
+# per request; {"op": "stats"} returns queue depth, worker counts and latency percentiles.
+#
+# Every request runs in a worker under a CPU-time rlimit (per request) and an address-space
+# rlimit (per worker). A worker that breaches a limit answers with a LimitExceeded or
+# MemoryError response and exits; a worker also exits after max_requests requests. Either
+# way, and if it dies outright, the server forks a replacement.
+
+class LimitExceeded(Exception):
+    pass
+
+LIMIT_ERRORS = ("LimitExceeded", "MemoryError")   # Error types after which a worker is recycled.
+
+def on_cpu_limit(signum, frame):
+    raise LimitExceeded("CPU time limit exceeded")
+
+def is_limit_error(response):
+    return not response["ok"] and response["error"]["type"] in LIMIT_ERRORS
+
+def get_percentile(values, percent):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * percent / 100))]
+
+# Worker is the server's view of one forked worker process.
+class Worker:
+    def __init__(self, pid, sock):
+        self.pid = pid
+        self.sock = sock
+        self.buffer = b""
+        self.job = None           # (client, request, arrival time) being run, or None if idle.
+        self.handled = 0
+        self.retiring = False     # The worker exits after its current response; send it nothing more.
+
+# Client is one accepted connection; requests arrive as lines in its buffer.
+class Client:
+    def __init__(self, sock):
+        self.sock = sock
+        self.buffer = b""
+
+class WorkerPool:
+    def __init__(self, socket_path, workers=4, max_requests=1000, cpu_limit=10,
+                 memory_limit=1024 * 1024 * 1024, cache_size=256):
+        self.socket_path = socket_path
+        self.size = workers
+        self.max_requests = max_requests    # Requests a worker answers before it is recycled.
+        self.cpu_limit = cpu_limit          # CPU seconds per request, 0 for no limit.
+        self.memory_limit = memory_limit    # Address space bytes per worker, 0 for no limit.
+        self.cache_size = cache_size
+        self.workers = {}                   # pid -> Worker
+        self.clients = set()
+        self.queue = deque()                # (client, request, arrival time) waiting for a worker.
+        self.latencies = deque(maxlen=10000)
+        self.requests = 0
+        self.recycled = 0
+        self.running = False
+        self.listener = None
+        self.selector = None
+
+    def serve_forever(self):
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+        self.listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.listener.bind(self.socket_path)
+        self.listener.listen()
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.listener, selectors.EVENT_READ, self.accept)
+        # Keep the imported modules out of the collector's reach so workers don't copy them
+        gc.freeze()
+        for _ in range(self.size):
+            self.start_worker()
+        self.running = True
+        try:
+            while self.running:
+                for key, _ in self.selector.select(timeout=1):
+                    key.data(key.fileobj)
+                self.dispatch()
+        finally:
+            self.close()
+
+    def stop(self):
+        self.running = False
+
+    def close(self):
+        for worker in list(self.workers.values()):
+            os.kill(worker.pid, signal.SIGTERM)
+            self.remove_worker(worker)
+        for client in list(self.clients):
+            self.remove_client(client)
+        self.selector.close()
+        self.listener.close()
+        if os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def start_worker(self):
+        parent_sock, child_sock = socket.socketpair()
+        pid = os.fork()
+        if pid == 0:
+            # The worker only keeps its end of the pair
+            parent_sock.close()
+            self.selector.close()
+            self.listener.close()
+            for client in self.clients:
+                client.sock.close()
+            for worker in self.workers.values():
+                worker.sock.close()
+            status = 0
+            try:
+                self.run_worker(child_sock)
+            except BaseException:
+                status = 1
+            os._exit(status)
+        child_sock.close()
+        worker = Worker(pid, parent_sock)
+        self.workers[pid] = worker
+        self.selector.register(parent_sock, selectors.EVENT_READ, self.read_worker)
+
+    def run_worker(self, sock):
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        signal.signal(signal.SIGTERM, signal.SIG_DFL)
+        signal.signal(signal.SIGXCPU, on_cpu_limit)
+        if self.memory_limit:
+            resource.setrlimit(resource.RLIMIT_AS, (self.memory_limit, self.memory_limit))
+        session = Session(self.cache_size)
+        file = sock.makefile("rw")
+        for handled, line in enumerate(file, 1):
+            if self.cpu_limit:
+                usage = resource.getrusage(resource.RUSAGE_SELF)
+                _, hard = resource.getrlimit(resource.RLIMIT_CPU)
+                soft = math.ceil(usage.ru_utime + usage.ru_stime) + self.cpu_limit
+                resource.setrlimit(resource.RLIMIT_CPU, (soft, hard))
+            response = session.handle(json.loads(line))
+            file.write(json.dumps(response) + "\n")
+            file.flush()
+            if handled >= self.max_requests or is_limit_error(response):
+                break
+
+    def accept(self, listener):
+        sock, _ = listener.accept()
+        client = Client(sock)
+        self.clients.add(client)
+        self.selector.register(sock, selectors.EVENT_READ, lambda sock: self.read_client(client))
+
+    def read_client(self, client):
+        data = client.sock.recv(65536)
+        if not data:
+            self.remove_client(client)
+            return
+        client.buffer += data
+        while b"\n" in client.buffer:
+            line, client.buffer = client.buffer.split(b"\n", 1)
+            if not line.strip():
+                continue
+            arrival = time.perf_counter()
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                self.respond(client, {"id": None, "ok": False,
+                                      "error": {"type": "RequestError", "message": str(e)}})
+                continue
+            if request.get("op") == "stats":
+                self.respond(client, dict(self.get_stats(), id=request.get("id"), ok=True))
+            else:
+                self.queue.append((client, request, arrival))
+
+    def read_worker(self, sock):
+        worker = next(w for w in self.workers.values() if w.sock is sock)
+        data = sock.recv(65536)
+        if not data:
+            # The worker exited: recycled, over a limit or crashed
+            if worker.job is not None:
+                client, request, arrival = worker.job
+                self.finish(client, arrival, {"id": request.get("id"), "ok": False, "error": {
+                    "type": "WorkerDied", "message": "the worker running the request exited"}})
+            self.remove_worker(worker)
+            self.recycled += 1
+            if self.running:
+                self.start_worker()
+            return
+        worker.buffer += data
+        while b"\n" in worker.buffer:
+            line, worker.buffer = worker.buffer.split(b"\n", 1)
+            client, request, arrival = worker.job
+            response = json.loads(line)
+            worker.job = None
+            worker.handled += 1
+            if worker.handled >= self.max_requests or is_limit_error(response):
+                worker.retiring = True
+            self.finish(client, arrival, response)
+
+    def dispatch(self):
+        for worker in self.workers.values():
+            if not self.queue:
+                return
+            if worker.job is None and not worker.retiring:
+                worker.job = self.queue.popleft()
+                worker.sock.sendall(json.dumps(worker.job[1]).encode() + b"\n")
+
+    def finish(self, client, arrival, response):
+        self.requests += 1
+        self.latencies.append(time.perf_counter() - arrival)
+        self.respond(client, response)
+
+    def respond(self, client, response):
+        if client not in self.clients:
+            return
+        try:
+            client.sock.sendall(json.dumps(response).encode() + b"\n")
+        except OSError:
+            self.remove_client(client)
+
+    def remove_client(self, client):
+        self.clients.discard(client)
+        self.selector.unregister(client.sock)
+        client.sock.close()
+
+    def remove_worker(self, worker):
+        del self.workers[worker.pid]
+        self.selector.unregister(worker.sock)
+        worker.sock.close()
+        os.waitpid(worker.pid, 0)
+
+    def get_stats(self):
+        latencies = {}
+        if self.latencies:
+            for percent in (50, 90, 99):
+                latencies[f"p{percent}"] = get_percentile(self.latencies, percent) * 1000
+        return {
+            "queue_depth": len(self.queue),
+            "workers": len(self.workers),
+            "busy_workers": sum(worker.job is not None for worker in self.workers.values()),
+            "requests": self.requests,
+            "recycled_workers": self.recycled,
+            "latency_ms": latencies,
+        }
+
+# Send requests to a server on socket_path and return the responses, in the order they arrive.
+def send_requests(socket_path, requests):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(b"".join(json.dumps(request).encode() + b"\n" for request in requests))
+        file = sock.makefile("r")
+        return [json.loads(file.readline()) for _ in requests]
@@ -0,0 +1,44 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from CSEM.checks import report, finish
+from Pipeline.pool import WorkerPool, send_requests
+
+# Starts a pool on a temporary Unix socket and checks normal requests, worker recycling,
+# the CPU limit and the stats request, all on localhost.
+
+test_cases = {
+    "tuple_output": ("let T = (1, 2, 3) in Print T", True),
+    "recursion": ("let rec f n = n eq 0 -> 0 | n + f (n - 1) in Print (f 100)", True),
+    "runaway": ("let rec f n = f (n + 1) in Print (f 0)", False),
+}
+
+def start_pool(socket_path):
+    pid = os.fork()
+    if pid == 0:
+        WorkerPool(socket_path, workers=2, max_requests=2, cpu_limit=1).serve_forever()
+        os._exit(0)
+    while not os.path.exists(socket_path):
+        time.sleep(0.05)
+    return pid
+
+def run_pool_tests():
+    socket_path = os.path.join(tempfile.mkdtemp(), "rpal.sock")
+    pid = start_pool(socket_path)
+    try:
+        for test_name, (source, ok) in test_cases.items():
+            response = send_requests(socket_path, [{"id": test_name, "source": source}])[0]
+            report(response["ok"] == ok, f"{test_name}: {response.get('output', response.get('error'))}")
+        stats = send_requests(socket_path, [{"op": "stats"}])[0]
+        report(stats["workers"] == 2 and stats["recycled_workers"] >= 1, f"stats: {stats}")
+    finally:
+        os.kill(pid, 15)
+        os.waitpid(pid, 0)
+
+if __name__ == "__main__":
+    run_pool_tests()
+    finish()
@@ -0,0 +1,167 @@
+import asyncio
+import contextlib
+import io
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.csemachine import CSEMachine
+from CSEM.cse_factory import CSEMachineFactory
+from CSEM.nodes import *
+from CSEM.governor import Governor, QuotaExceeded
+from Pipeline.timings import Timings
+
+# Library entry point for embedding the interpreter:
+#
+#   program = compile("let f x = x * Scale in f (3)")
+#   program.run({"Scale": 7})          # -> 21
+#
+# A Program is compiled once and can be run any number of times. Each run gets a fresh machine
+# over the shared control structures, with the bindings placed in the primitive environment.
+# Values cross the boundary as native Python values: int, bool, str, tuple and None (dummy).
+# Functions are returned as their machine symbol. Runs can also advance in slices of steps
+# (start and Execution.resume), or as asyncio tasks (run_async); a run in slices interprets every
+# function, so each slice stays bounded. Program.write streams the printed result to any
+# file-like object instead.
+
+class RPALError(Exception):
+    pass
+
+# The source could not be tokenized or parsed; the message holds the parser's report.
+class RPALSyntaxError(RPALError):
+    pass
+
+# Evaluation failed, e.g. arithmetic on a non-integer or applying a non-function.
+class RPALRuntimeError(RPALError):
+    pass
+
+class Program:
+    def __init__(self, factory, delta, diagnostics=""):
+        self.factory = factory
+        self.delta = delta                  # Root delta of the control structures.
+        self.diagnostics = diagnostics      # What the front end printed while compiling.
+
+    def get_cse_machine(self, bindings=None, limits=None):
+        e0 = E(0)
+        for name, value in (bindings or {}).items():
+            e0.values[name] = to_symbol(value)
+        cse_machine = CSEMachine([e0, self.delta], [e0], [e0])
+        if limits is not None:
+            cse_machine.set_governor(Governor(limits))
+        return cse_machine
+
+    def run(self, bindings=None, limits=None):
+        # limits is a CSEM.governor.Limits; a breach raises QuotaExceeded
+        execution = self.start(bindings, limits)
+        execution.resume(None)
+        return execution.get_result()
+
+    def write(self, file, bindings=None, limits=None):
+        # Run the program and write its result to file as myrpal.py prints it, in chunks, so
+        # a large tuple is never built as one string
+        execution = self.start(bindings, limits)
+        execution.resume(None)
+        execution.write_result(file)
+
+    def start(self, bindings=None, limits=None):
+        return Execution(self.get_cse_machine(bindings, limits))
+
+    async def run_async(self, bindings=None, slice_steps=1000, limits=None):
+        # Runs slice_steps machine steps at a time and yields to the event loop in between, so
+        # many programs share one thread fairly. Cancelling the task stops the run at a slice boundary.
+        execution = self.start(bindings, limits)
+        while not execution.resume(slice_steps):
+            await asyncio.sleep(0)
+        return execution.get_result()
+
+# Execution is one run of a program. It advances by a bounded number of machine steps at a
+# time and can be resumed until it finishes.
+class Execution:
+    def __init__(self, cse_machine):
+        self.cse_machine = cse_machine
+        self.finished = False
+
+    def resume(self, steps):
+        # Run at most steps steps (all of them if steps is None); True once the program has finished
+        try:
+            if steps is None:
+                self.cse_machine.execute()
+                self.finished = True
+            else:
+                self.finished = self.cse_machine.resume(steps)
+        except (RPALError, QuotaExceeded):
+            raise
+        except Exception as e:
+            raise RPALRuntimeError(f"{type(e).__name__}: {e}") from e
+        return self.finished
+
+    def get_result(self):
+        if not self.finished:
+            raise RPALError("the program has not finished")
+        return to_native(self.cse_machine.stack[-1])
+
+    def write_result(self, file):
+        if not self.finished:
+            raise RPALError("the program has not finished")
+        self.cse_machine.write_result(file)
+
+def compile(source, memoize=None, memo_size=4096, timings=None):
+    # Lambda bodies are compiled up front, so running never has to print diagnostics
+    if timings is None:
+        timings = Timings()
+    diagnostics = io.StringIO()
+    with contextlib.redirect_stdout(diagnostics):
+        with timings.phase("tokenize"):
+            tokens = tokenize(source)
+        if diagnostics.getvalue():
+            raise RPALSyntaxError(diagnostics.getvalue().strip())
+        with timings.phase("parse"):
+            parser = Parser(tokens)
+            ast_nodes = parser.parse()
+        if ast_nodes is None or diagnostics.getvalue():
+            raise RPALSyntaxError(diagnostics.getvalue().strip() or "parsing failed")
+        with timings.phase("string_ast"):
+            string_ast = parser.convert_ast_to_string_ast()
+        with timings.phase("ast_factory"):
+            ast = ASTFactory().get_abstract_syntax_tree(string_ast)
+        with timings.phase("standardize"):
+            ast.standardize()
+        with timings.phase("cse_factory"):
+            factory = CSEMachineFactory(memoize=memoize, memo_size=memo_size, lazy=False)
+            delta = factory.get_delta(ast.get_root())
+    return Program(factory, delta, diagnostics.getvalue())
+
+def to_symbol(value):
+    # String data keeps the opening quote of the literal it came from, so bound strings do too
+    if isinstance(value, bool):
+        return Bool("true" if value else "false")
+    elif isinstance(value, int):
+        return Int(str(value))
+    elif isinstance(value, str):
+        return Str("'" + value)
+    elif isinstance(value, (tuple, list)):
+        tup = Tup()
+        tup.symbols = [to_symbol(element) for element in value]
+        return tup
+    elif value is None:
+        return Dummy()
+    elif isinstance(value, Symbol):
+        return value
+    raise TypeError(f"cannot bind a value of type {type(value).__name__}")
+
+def to_native(symbol):
+    if isinstance(symbol, Bool):
+        return symbol.get_data() in (True, "true")
+    elif isinstance(symbol, Int):
+        return int(symbol.get_data())
+    elif isinstance(symbol, Str):
+        data = symbol.get_data()
+        return data[1:] if data.startswith("'") else data
+    elif isinstance(symbol, Tup):
+        return tuple(to_native(element) for element in symbol.symbols)
+    elif isinstance(symbol, Dummy):
+        return None
+    elif isinstance(symbol, (Lambda, Eta)):
+        return symbol
+    elif isinstance(symbol, Err):
+        raise RPALRuntimeError("the program evaluated to an error value")
+    raise RPALRuntimeError(f"the program evaluated to the unbound identifier {symbol.get_data()}")
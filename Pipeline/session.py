@@ -0,0 +1,125 @@
+import contextlib
+import io
+import json
+from collections import OrderedDict
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.governor import Limits, QuotaExceeded
+from Pipeline.program import compile
+from Pipeline.timings import Timings
+
+# Session is a long-lived interpreter that answers JSON-lines requests, one per line:
+#   {"id": 1, "source": "...", "mode": "run", "options": {"memoize": "auto", "memo_size": 4096}}
+# "path" may be given instead of "source", and mode is one of run, ast and sast. Options may also
+# hold "limits", the keyword arguments of CSEM.governor.Limits for the run.
+# Each request gets one response line:
+#   {"id": 1, "ok": true, "output": "...", "diagnostics": "...", "cached": false, "timings": {...}}
+# or, if it failed,
+#   {"id": 1, "ok": false, "error": {"type": "...", "message": "..."}, "diagnostics": "...", "timings": {...}}
+# Compiled programs (see program.py), or the printed trees for ast and sast, are kept in an LRU
+# cache keyed on the source, mode and options, so repeated sources skip the front end entirely.
+
+class RequestError(Exception):
+    pass
+
+class Session:
+    def __init__(self, cache_size=256):
+        self.cache_size = cache_size
+        self.programs = OrderedDict()   # (mode, source, options) -> Program or printed tree, least recently used first
+        self.requests = 0
+        self.hits = 0
+
+    def serve(self, input_stream, output_stream):
+        for line in input_stream:
+            if not line.strip():
+                continue
+            try:
+                request = json.loads(line)
+                if not isinstance(request, dict):
+                    raise ValueError("a request must be a JSON object")
+            except ValueError as e:
+                response = {"id": None, "ok": False, "error": {"type": "RequestError", "message": str(e)}}
+            else:
+                response = self.handle(request)
+            output_stream.write(json.dumps(response) + "\n")
+            output_stream.flush()
+
+    def handle(self, request):
+        self.requests += 1
+        timings = Timings()
+        diagnostics = io.StringIO()
+        response = {"id": request.get("id")}
+        try:
+            # Anything the interpreter prints is a diagnostic; stdout carries the protocol
+            with contextlib.redirect_stdout(diagnostics):
+                output, cached = self.execute(request, timings)
+            response.update({"ok": True, "output": output, "cached": cached})
+        except Exception as e:
+            response.update({"ok": False, "error": {"type": type(e).__name__, "message": str(e)}})
+            if isinstance(e, QuotaExceeded):
+                response["error"].update(e.to_dict())
+        response["diagnostics"] = diagnostics.getvalue()
+        response["timings"] = timings.to_dict()
+        return response
+
+    def execute(self, request, timings):
+        mode = request.get("mode", "run")
+        if mode not in ("run", "ast", "sast"):
+            raise RequestError(f"unknown mode {mode!r}")
+        source = self.get_source(request)
+        options = request.get("options") or {}
+        memoize = options.get("memoize")
+        if isinstance(memoize, str):
+            memoize = memoize.split(",")
+        memo_size = options.get("memo_size", 4096)
+        limits = Limits(**options["limits"]) if options.get("limits") else None
+        key = (mode, source, tuple(memoize) if memoize else None, memo_size)
+
+        program = self.programs.get(key)
+        cached = program is not None
+        if cached:
+            self.hits += 1
+            self.programs.move_to_end(key)
+        else:
+            program = self.compile(source, mode, memoize, memo_size, timings)
+            self.programs[key] = program
+            if len(self.programs) > self.cache_size:
+                self.programs.popitem(last=False)
+
+        if isinstance(program, str):
+            return program, cached
+        with timings.phase("execute"):
+            return str(program.get_cse_machine(limits=limits).get_answer()), cached
+
+    def get_source(self, request):
+        if "source" in request:
+            return request["source"]
+        if "path" in request:
+            with open(request["path"], "r") as file:
+                return file.read()
+        raise RequestError("a request needs a source or a path")
+
+    def compile(self, source, mode, memoize, memo_size, timings):
+        if mode == "run":
+            program = compile(source, memoize, memo_size, timings)
+            print(program.diagnostics, end="")
+            return program
+        with timings.phase("tokenize"):
+            tokens = tokenize(source)
+        with timings.phase("parse"):
+            parser = Parser(tokens)
+            if parser.parse() is None:
+                raise RequestError("parsing failed")
+        with timings.phase("string_ast"):
+            string_ast = parser.convert_ast_to_string_ast()
+        if mode == "ast":
+            return "\n".join(string_ast)
+        with timings.phase("ast_factory"):
+            ast = ASTFactory().get_abstract_syntax_tree(string_ast)
+        with timings.phase("standardize"):
+            ast.standardize()
+        printed = io.StringIO()
+        with contextlib.redirect_stdout(printed):
+            ast.print_ast()
+        return printed.getvalue().rstrip("\n")
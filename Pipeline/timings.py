@@ -0,0 +1,66 @@
+import json
+import time
+from contextlib import contextmanager
+
+# PhaseRecord holds the wall and CPU time of one pipeline phase and the counters it reported.
+class PhaseRecord:
+    def __init__(self, name):
+        self.name = name
+        self.wall = 0.0
+        self.cpu = 0.0
+        self.counters = {}
+
+    def to_dict(self):
+        return {"phase": self.name, "wall": self.wall, "cpu": self.cpu, "counters": self.counters}
+
+# Timings collects a PhaseRecord per phase and passes each finished record to the hooks.
+class Timings:
+    def __init__(self):
+        self.phases = []
+        self.hooks = []   # Callables taking a finished PhaseRecord.
+
+    def add_hook(self, hook):
+        self.hooks.append(hook)
+
+    @contextmanager
+    def phase(self, name):
+        record = PhaseRecord(name)
+        wall = time.perf_counter()
+        cpu = time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall = time.perf_counter() - wall
+            record.cpu = time.process_time() - cpu
+            self.phases.append(record)
+            for hook in self.hooks:
+                hook(record)
+
+    def to_dict(self):
+        return {
+            "phases": [record.to_dict() for record in self.phases],
+            "total_wall": sum(record.wall for record in self.phases),
+            "total_cpu": sum(record.cpu for record in self.phases),
+        }
+
+    def to_json(self):
+        return json.dumps(self.to_dict())
+
+    def to_text(self):
+        lines = [f"{'phase':<14} {'wall (ms)':>10} {'cpu (ms)':>10}  counters"]
+        for record in self.phases:
+            counters = ", ".join(f"{key}={value}" for key, value in record.counters.items())
+            lines.append(f"{record.name:<14} {record.wall * 1000:>10.3f} {record.cpu * 1000:>10.3f}  {counters}")
+        lines.append(f"{'total':<14} {sum(r.wall for r in self.phases) * 1000:>10.3f} "
+                     f"{sum(r.cpu for r in self.phases) * 1000:>10.3f}")
+        return "\n".join(lines)
+
+# Count the nodes of a (standardized) tree without recursion.
+def count_nodes(root):
+    count = 0
+    nodes = [root]
+    while nodes:
+        node = nodes.pop()
+        count += 1
+        nodes.extend(node.get_children())
+    return count
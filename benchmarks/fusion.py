@@ -0,0 +1,65 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.cse_factory import CSEMachineFactory
+from programs import get_benchmarks
+
+# Machine steps and time of the benchmark programs with and without superinstructions.
+# Runs with and without fusion alternate, and the fastest of each is kept.
+
+def get_standardized_ast(source):
+    parser = Parser(tokenize(source))
+    if parser.parse() is None:
+        return None
+    ast = ASTFactory().get_abstract_syntax_tree(parser.convert_ast_to_string_ast())
+    ast.standardize()
+    return ast
+
+def time_run(ast, fuse):
+    cse_machine = CSEMachineFactory(lazy=False, fuse=fuse).get_cse_machine(ast)
+    start = time.perf_counter()
+    steps = sys.maxsize - cse_machine.run_steps(sys.maxsize)
+    return time.perf_counter() - start, steps, cse_machine.get_result()
+
+def run_benchmark(name, source, repeats):
+    ast = get_standardized_ast(source)
+    if ast is None:
+        return None
+    best = {False: None, True: None}
+    steps = {}
+    answers = {}
+    for _ in range(repeats):
+        for fuse in (False, True):
+            elapsed, steps[fuse], answers[fuse] = time_run(ast, fuse)
+            best[fuse] = elapsed if best[fuse] is None else min(best[fuse], elapsed)
+    assert answers[False] == answers[True], name
+    return (f"{name:<24}{steps[False]:>10}{steps[True]:>10}{steps[True] / steps[False] - 1:>9.0%}"
+            f"{best[False] * 1e3:>10.2f}{best[True] * 1e3:>10.2f}{best[True] / best[False] - 1:>9.0%}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare machine steps and time with and without fusion.')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs per program and mode; the fastest is kept')
+    parser.add_argument('--filter', default='', help='Only run programs whose name contains this')
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(100000)
+    print(f"{'program':<24}{'steps':>10}{'fused':>10}{'change':>9}{'ms':>10}{'fused':>10}{'change':>9}")
+    for name, source in get_benchmarks():
+        if args.filter in name:
+            # Interpreter diagnostics are not part of the measurement
+            with contextlib.redirect_stdout(io.StringIO()):
+                line = run_benchmark(name, source, args.repeats)
+            if line is not None:
+                print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+import argparse
+import contextlib
+import io
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.cse_factory import CSEMachineFactory
+from CSEM.jit import JIT
+from programs import get_benchmarks
+
+# Time of the benchmark programs with and without the hot-function compiler, and the functions
+# it compiled. Runs with and without it alternate, and the fastest of each is kept.
+
+def get_standardized_ast(source):
+    parser = Parser(tokenize(source))
+    if parser.parse() is None:
+        return None
+    ast = ASTFactory().get_abstract_syntax_tree(parser.convert_ast_to_string_ast())
+    ast.standardize()
+    return ast
+
+def time_run(ast, jit):
+    cse_machine = CSEMachineFactory(lazy=False).get_cse_machine(ast)
+    cse_machine.jit = JIT() if jit else None
+    start = time.perf_counter()
+    cse_machine.execute()
+    return time.perf_counter() - start, cse_machine.jit, cse_machine.get_result()
+
+def run_benchmark(name, source, repeats):
+    ast = get_standardized_ast(source)
+    if ast is None:
+        return None
+    best = {False: None, True: None}
+    answers = {}
+    for _ in range(repeats):
+        for jit in (False, True):
+            elapsed, compiler, answers[jit] = time_run(ast, jit)
+            best[jit] = elapsed if best[jit] is None else min(best[jit], elapsed)
+    assert answers[False] == answers[True], name
+    compiled = ", ".join(function.name for function in compiler.functions.values() if function.reason is None)
+    return (f"{name:<24}{best[False] * 1e3:>10.2f}{best[True] * 1e3:>10.2f}{best[True] / best[False] - 1:>9.0%}"
+            f"  {compiled}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare time with and without the hot-function compiler.')
+    parser.add_argument('--repeats', type=int, default=5, help='Timed runs per program and mode; the fastest is kept')
+    parser.add_argument('--filter', default='', help='Only run programs whose name contains this')
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(100000)
+    print(f"{'program':<24}{'ms':>10}{'jit ms':>10}{'change':>9}  compiled")
+    for name, source in get_benchmarks():
+        if args.filter in name:
+            # Interpreter diagnostics are not part of the measurement
+            with contextlib.redirect_stdout(io.StringIO()):
+                line = run_benchmark(name, source, args.repeats)
+            if line is not None:
+                print(line)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+import os
+
+# Benchmark programs: the test cases, scaled variants of them and synthetic generators.
+
+TEST_CASES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Test_Cases")
+
+def read_test_case(name):
+    with open(os.path.join(TEST_CASES, name), "r") as file:
+        return file.read()
+
+def get_palindromes(scale):
+    # Test_Cases/Q6.txt with the searched range multiplied by scale
+    return read_test_case("Q6.txt").replace("Palindrome_List(800, 1000)",
+                                            f"Palindrome_List(800, {800 + 200 * scale})")
+
+def get_fibonacci(scale):
+    # Test_Cases/Q3.txt with the bound multiplied by 10 ** scale
+    return read_test_case("Q3.txt").replace("fib_print(0, 50)", f"fib_print(0, {50 * 10 ** scale})")
+
+def get_let_chain(n):
+    lines = ["let x0 = 1 in"]
+    for i in range(1, n):
+        lines.append(f"let x{i} = x{i - 1} + {i % 7} in")
+    lines.append(f"Print (x{n - 1})")
+    return "\n".join(lines)
+
+def get_wide_tuple(n):
+    elements = ", ".join(str(i) for i in range(n))
+    return f"let T = ({elements}) in Print (Order T, T {n // 2}, T {n})"
+
+def get_tuple_build(n):
+    return f"""
+let rec build (n, T) = n eq 0 -> T | build (n - 1, T aug n)
+in Print (Order (build ({n}, nil)))
+"""
+
+def get_deep_recursion(n):
+    return f"""
+let rec Sum N = N eq 0 -> 0 | N + Sum (N - 1)
+in Print (Sum {n})
+"""
+
+def get_string_walk(n):
+    return f"""
+let rec walk (s, n) = n eq 0 -> s | walk (Stern s, n - 1)
+in Print (walk ('{"ab" * n}', {2 * n - 1}))
+"""
+
+def get_benchmarks(scale=1):
+    benchmarks = []
+    for name in sorted(os.listdir(TEST_CASES)):
+        benchmarks.append(("test_case:" + name, read_test_case(name)))
+    benchmarks += [
+        ("palindromes:x3", get_palindromes(3 * scale)),
+        ("fibonacci:x1e6", get_fibonacci(6 * scale)),
+        ("let_chain:400", get_let_chain(400 * scale)),
+        ("wide_tuple:2000", get_wide_tuple(2000 * scale)),
+        ("tuple_build:2000", get_tuple_build(2000 * scale)),
+        ("deep_recursion:500", get_deep_recursion(500 * scale)),
+        ("string_walk:1000", get_string_walk(1000 * scale)),
+    ]
+    return benchmarks
@@ -0,0 +1,130 @@
+import argparse
+import contextlib
+import io
+import json
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.cse_factory import CSEMachineFactory
+from CSEM.stats import MachineStats
+from Pipeline.timings import Timings
+from programs import get_benchmarks
+
+# Runs every benchmark, saves the results as JSON and compares them with a stored baseline.
+# Exits with status 1 if time, step count or peak memory regressed beyond the thresholds.
+
+BENCHMARKS = os.path.dirname(os.path.abspath(__file__))
+
+def run_pipeline(source, timings, observer=None):
+    with timings.phase("tokenize"):
+        tokens = tokenize(source)
+    with timings.phase("parse"):
+        parser = Parser(tokens)
+        if parser.parse() is None:
+            return None
+    with timings.phase("string_ast"):
+        string_ast = parser.convert_ast_to_string_ast()
+    with timings.phase("ast_factory"):
+        ast = ASTFactory().get_abstract_syntax_tree(string_ast)
+    with timings.phase("standardize"):
+        ast.standardize()
+    with timings.phase("cse_factory"):
+        cse_machine = CSEMachineFactory().get_cse_machine(ast)
+    if observer is not None:
+        cse_machine.add_observer(observer)
+    with timings.phase("execute"):
+        return cse_machine.get_answer()
+
+def run_benchmark(source, repeats):
+    # Interpreter diagnostics are not part of the measurement
+    with contextlib.redirect_stdout(io.StringIO()):
+        best = {}
+        for _ in range(repeats):
+            timings = Timings()
+            answer = run_pipeline(source, timings)
+            for record in timings.phases:
+                best[record.name] = min(best.get(record.name, record.wall), record.wall)
+        stats = MachineStats()
+        run_pipeline(source, Timings(), stats)
+        tracemalloc.start()
+        run_pipeline(source, Timings())
+        peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+    return {
+        "answer": answer,
+        "phases": best,
+        "time": sum(best.values()),
+        "steps": stats.steps,
+        "max_control": stats.max_control,
+        "max_stack": stats.max_stack,
+        "peak_memory": peak_memory,
+    }
+
+def compare(results, baseline, args):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        base = baseline[name]
+        if result["answer"] != base["answer"]:
+            regressions.append(f"{name}: answer changed from {base['answer']!r} to {result['answer']!r}")
+        for metric, threshold in (("time", args.time_threshold), ("steps", args.steps_threshold),
+                                  ("peak_memory", args.memory_threshold)):
+            if metric == "time" and base["time"] < args.min_time:
+                continue
+            if result[metric] > base[metric] * (1 + threshold):
+                regressions.append(f"{name}: {metric} {base[metric]} -> {result[metric]} "
+                                   f"(+{(result[metric] / base[metric] - 1) * 100:.1f}%)")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description='Run the RPAL benchmark suite.')
+    parser.add_argument('--filter', default='', help='Only run benchmarks whose name contains this')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per benchmark (the best is kept)')
+    parser.add_argument('--results', default=os.path.join(BENCHMARKS, 'results.json'))
+    parser.add_argument('--baseline', default=os.path.join(BENCHMARKS, 'baseline.json'))
+    parser.add_argument('--update-baseline', action='store_true', help='Store the results as the new baseline')
+    parser.add_argument('--time-threshold', type=float, default=0.25)
+    parser.add_argument('--min-time', type=float, default=0.1,
+                        help='Seconds below which a benchmark is too noisy to gate on time')
+    parser.add_argument('--steps-threshold', type=float, default=0.0)
+    parser.add_argument('--memory-threshold', type=float, default=0.10)
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(100000)
+    results = {}
+    print(f"{'benchmark':<28} {'time (ms)':>10} {'steps':>10} {'peak KiB':>10}  answer")
+    for name, source in get_benchmarks():
+        if args.filter not in name:
+            continue
+        result = results[name] = run_benchmark(source, args.repeats)
+        answer = str(result["answer"])
+        print(f"{name:<28} {result['time'] * 1000:>10.2f} {result['steps']:>10} "
+              f"{result['peak_memory'] / 1024:>10.1f}  {answer[:40] + '...' if len(answer) > 40 else answer}")
+
+    with open(args.results, "w") as file:
+        json.dump(results, file, indent=2)
+    if args.update_baseline:
+        with open(args.baseline, "w") as file:
+            json.dump(results, file, indent=2)
+        print(f"baseline written to {args.baseline}")
+        return
+    if not os.path.exists(args.baseline):
+        print("no baseline to compare with; run with --update-baseline")
+        return
+    with open(args.baseline, "r") as file:
+        regressions = compare(results, json.load(file), args)
+    for regression in regressions:
+        print("REGRESSION " + regression)
+    if regressions:
+        sys.exit(1)
+    print("no regressions")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+import argparse
+import contextlib
+import gc
+import io
+import math
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.cse_factory import CSEMachineFactory
+from CSEM.output import write_value
+
+# Runs every stage of the pipeline on inputs of size n, 2n, 4n and 8n, fits the growth
+# exponent of each stage's time on a log-log scale and exits with status 1 if any
+# exponent is above the limit. A linear stage has an exponent close to 1.
+#
+# Wall times of a few milliseconds are noisy, and one slow run at the largest size is enough
+# to push the exponent of a linear stage over the limit. So the base sizes keep every timed
+# stage at about ten milliseconds or more, each size is run several times (interleaved with
+# the others) and the fastest run kept, the collector is off while a stage runs, and a stage
+# over the limit is measured again, keeping the fastest time of each size over all the runs,
+# before it fails.
+#
+# A few stages do too little work on their family's programs to be timed this way: they take
+# a few milliseconds at size n, and their time per element can change by a factor of two
+# between sizes as the data outgrows the processor caches. Those stages are gated on the
+# number of Python bytecodes they run instead, which is the same on every run.
+
+def get_wide_program(n):
+    # n small definitions joined by "and" and used in one tuple: the program grows in
+    # width only, so no stage recurses deeper as n grows
+    definitions = " and ".join(f"f{i} x = x + {i} * 2 - (x / 3)" for i in range(n))
+    uses = ", ".join(f"f{i} {i}" for i in range(n))
+    return f"let {definitions} in Print (Order ({uses}))"
+
+def get_tail_loop(n):
+    return f"let rec Loop (N, S) = N eq 0 -> S | Loop (N - 1, S + N) in Print (Loop ({n}, 0))"
+
+def get_deep_recursion(n):
+    return f"let rec Sum N = N eq 0 -> 0 | N + Sum (N - 1) in Print (Sum {n})"
+
+def get_wide_tuple(n):
+    elements = ", ".join(str(i) for i in range(n))
+    return f"let T = ({elements}) in Print (Order T, T {n // 2})"
+
+def get_tuple_build(n):
+    return f"let rec build (n, T) = n eq 0 -> T | build (n - 1, T aug n) in Print (Order (build ({n}, nil)))"
+
+def get_tuple_output(n):
+    # Prints a tuple of n elements
+    return f"let rec build (n, T) = n eq 0 -> T | build (n - 1, T aug n) in build ({n}, nil)"
+
+def get_nested_output(n):
+    # Prints a tuple nested n deep
+    return f"let rec nest (n, T) = n eq 0 -> T | nest (n - 1, (T, n)) in nest ({n}, nil)"
+
+# Every stage before the standardizer, and the factory after it
+FRONT_END = ["lexer", "parser", "string_ast", "ast_factory", "factory"]
+
+# (family, generator, base size, stages timed, stages counted in bytecodes)
+FAMILIES = [
+    ("wide_program", get_wide_program, 1000, FRONT_END + ["machine"], ["standardizer"]),
+    ("tail_loop", get_tail_loop, 5000, ["machine"], []),
+    ("deep_recursion", get_deep_recursion, 2000, ["machine"], []),
+    ("wide_tuple", get_wide_tuple, 10000, FRONT_END, ["standardizer", "machine"]),
+    ("tuple_build", get_tuple_build, 5000, ["machine"], []),
+    ("tuple_output", get_tuple_output, 10000, [], ["output"]),
+    ("nested_output", get_nested_output, 10000, [], ["output"]),
+]
+
+def count_bytecodes(function, *args):
+    # Run function under a trace function that counts the bytecodes of every Python frame
+    count = 0
+
+    def trace(frame, event, arg):
+        nonlocal count
+        if event == "call":
+            frame.f_trace_opcodes = True
+        elif event == "opcode":
+            count += 1
+        return trace
+
+    sys.settrace(trace)
+    try:
+        result = function(*args)
+    finally:
+        sys.settrace(None)
+    return result, count
+
+def measure(source, counted=()):
+    # Wall time of each stage for one run of the pipeline; the stages in counted are run
+    # under count_bytecodes and measured in bytecodes instead
+    times = {}
+
+    def timed(stage, function, *args):
+        if stage in counted:
+            result, times[stage] = count_bytecodes(function, *args)
+            return result
+        # The collector is off while a stage runs: its full collections walk every live
+        # object, which makes allocation-heavy stages look superlinear
+        gc.collect()
+        gc.disable()
+        try:
+            start = time.perf_counter()
+            result = function(*args)
+            times[stage] = time.perf_counter() - start
+        finally:
+            gc.enable()
+        return result
+
+    tokens = timed("lexer", tokenize, source)
+    parser = Parser(tokens)
+    timed("parser", parser.parse)
+    string_ast = timed("string_ast", parser.convert_ast_to_string_ast)
+    ast = timed("ast_factory", ASTFactory().get_abstract_syntax_tree, string_ast)
+    timed("standardizer", ast.standardize)
+    # Compile every lambda body up front so the factory stage covers the whole program
+    cse_machine = timed("factory", CSEMachineFactory(lazy=False).get_cse_machine, ast)
+    timed("machine", cse_machine.execute)
+    timed("output", write_value, cse_machine.stack[-1], NullWriter())
+    return times
+
+class NullWriter:
+    # Discards what is written, so the output stage measures formatting alone
+    def write(self, text):
+        pass
+
+def get_exponent(sizes, times):
+    # Least squares slope of log(time) against log(size)
+    xs = [math.log(size) for size in sizes]
+    ys = [math.log(max(t, 1e-9)) for t in times]
+    mean_x = sum(xs) / len(xs)
+    mean_y = sum(ys) / len(ys)
+    numerator = sum((x - mean_x) * (y - mean_y) for x, y in zip(xs, ys))
+    denominator = sum((x - mean_x) ** 2 for x in xs)
+    return numerator / denominator
+
+def run_family(generator, base, stages, counted, repeats, scale):
+    # Each repeat runs every size once, so a slow spell of the machine affects all sizes alike.
+    # Bytecode counts do not change between runs, so the counted stages run once per size.
+    sizes = [base * scale * factor for factor in (1, 2, 4, 8)]
+    sources = [generator(size) for size in sizes]
+    best = {stage: [None] * len(sizes) for stage in stages + counted}
+    if counted:
+        for i, source in enumerate(sources):
+            counts = measure(source, counted)
+            for stage in counted:
+                best[stage][i] = counts[stage]
+    for _ in range(repeats if stages else 0):
+        for i, source in enumerate(sources):
+            times = measure(source)
+            for stage in stages:
+                if best[stage][i] is None or times[stage] < best[stage][i]:
+                    best[stage][i] = times[stage]
+    return sizes, best
+
+def main():
+    parser = argparse.ArgumentParser(description='Check that each pipeline stage scales linearly.')
+    parser.add_argument('--max-exponent', type=float, default=1.2, help='Largest growth exponent allowed')
+    parser.add_argument('--repeats', type=int, default=5, help='Runs per size; the fastest is kept')
+    parser.add_argument('--retries', type=int, default=2,
+                        help='Times a stage over the limit is measured again before it fails')
+    parser.add_argument('--scale', type=int, default=1, help='Multiplier for the base sizes')
+    parser.add_argument('--family', action='append', help='Only run these program families')
+    args = parser.parse_args()
+
+    failures = []
+    print(f"{'family':<16}{'stage':<14}{'sizes':<24}{'times (s) or bytecodes':<40}{'exponent':>9}")
+    for name, generator, base, stages, counted in FAMILIES:
+        if args.family and name not in args.family:
+            continue
+        # Interpreter output and diagnostics are not part of the measurement
+        with contextlib.redirect_stdout(io.StringIO()):
+            sizes, best = run_family(generator, base, stages, counted, args.repeats, args.scale)
+            for _ in range(args.retries):
+                over = [stage for stage in stages if get_exponent(sizes, best[stage]) > args.max_exponent]
+                if not over:
+                    break
+                _, again = run_family(generator, base, over, [], args.repeats, args.scale)
+                for stage in over:
+                    best[stage] = [min(t, u) for t, u in zip(best[stage], again[stage])]
+        for stage in stages + counted:
+            exponent = get_exponent(sizes, best[stage])
+            if stage in counted:
+                label = stage + "*"
+                times = " ".join(str(count) for count in best[stage])
+            else:
+                label = stage
+                times = " ".join(f"{t:.4f}" for t in best[stage])
+            flag = "  FAIL" if exponent > args.max_exponent else ""
+            print(f"{name:<16}{label:<14}{'/'.join(map(str, sizes)):<24}{times:<40}{exponent:>9.2f}{flag}")
+            if exponent > args.max_exponent:
+                failures.append(f"{name} {stage}: exponent {exponent:.2f}")
+
+    if failures:
+        print(f"\n{len(failures)} stages grow faster than n^{args.max_exponent}:")
+        for failure in failures:
+            print("  " + failure)
+        sys.exit(1)
+    print(f"\nAll stages grow no faster than n^{args.max_exponent} (* counted in bytecodes, not timed)")
+
+if __name__ == "__main__":
+    main()
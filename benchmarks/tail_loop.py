@@ -0,0 +1,42 @@
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.cse_factory import CSEMachineFactory
+
+# Per-iteration cost of a self-tail-recursive rec function, with and without loop compilation.
+
+program = """
+let rec count (n, acc) = n eq 0 -> acc | count (n - 1, acc + n)
+in Print (count ({n}, 0))
+"""
+
+def get_standardized_ast(source):
+    parser = Parser(tokenize(source))
+    parser.parse()
+    ast = ASTFactory().get_abstract_syntax_tree(parser.convert_ast_to_string_ast())
+    ast.standardize()
+    return ast
+
+def time_run(n, tail_loops):
+    ast = get_standardized_ast(program.format(n=n))
+    cse_machine = CSEMachineFactory(tail_loops=tail_loops).get_cse_machine(ast)
+    start = time.perf_counter()
+    answer = cse_machine.get_answer()
+    return time.perf_counter() - start, answer
+
+def run_benchmark(sizes=(1000, 2000, 4000)):
+    print(f"{'n':>8} {'mode':>8} {'total (s)':>10} {'per iter (us)':>14}")
+    for n in sizes:
+        for tail_loops in (False, True):
+            elapsed, answer = time_run(n, tail_loops)
+            mode = "loop" if tail_loops else "call"
+            print(f"{n:>8} {mode:>8} {elapsed:>10.4f} {elapsed / n * 1e6:>14.2f}")
+
+if __name__ == "__main__":
+    run_benchmark()
@@ -0,0 +1,160 @@
+import argparse
+import contextlib
+import gc
+import io
+import json
+import os
+import sys
+import time
+import timeit
+import tracemalloc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+from Parser.parser import Parser
+from Lexer.lexical_analyzer import tokenize
+from Standardizer.ast_factory import ASTFactory
+from CSEM.cse_factory import CSEMachineFactory
+from CSEM.memstats import MemStats
+from CSEM.nodes import *
+from programs import get_benchmarks
+
+# Measures what machine values cost: bytes, memory blocks and construction time of one value
+# of each class the machine creates while running, then the symbols created, the bytes and
+# blocks they take and the time per machine step on the benchmark programs. Bytes and blocks
+# per step are the per-value figures weighted by the symbols of each class created per step.
+# Save the results with --save before a change and pass them to --compare after it.
+
+def get_bind():
+    # Closures are made by binding a compiled Lambda to an environment
+    lambda_expr = Lambda(1)
+    lambda_expr.set_delta(Delta(1))
+    e = E(0)
+    return lambda: lambda_expr.bind(e)
+
+# Class name -> a function making one value of the class as the machine does
+VALUES = {
+    "Int": lambda: Int("1"),
+    "Str": lambda: Str("'a"),
+    "Bool": lambda: Bool("true"),
+    "Tup": Tup,
+    "E": lambda: E(1),
+    "Lambda": get_bind(),
+    "Eta": Eta,
+    "Gamma": Gamma,
+    "Dummy": Dummy,
+    "Err": Err,
+    "Symbol": lambda: Symbol("x"),
+}
+
+def measure_value(make, count):
+    values = [None] * count
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    for i in range(count):
+        values[i] = make()
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    values = [None] * count
+    gc.collect()
+    # Counted without tracing, so tracemalloc's own bookkeeping is not included
+    blocks = sys.getallocatedblocks()
+    for i in range(count):
+        values[i] = make()
+    blocks = sys.getallocatedblocks() - blocks
+    seconds = min(timeit.repeat(make, number=count, repeat=5))
+    return {"bytes": size / count, "blocks": blocks / count, "ns": seconds / count * 1e9}
+
+def get_machine(source):
+    tokens = tokenize(source)
+    parser = Parser(tokens)
+    if parser.parse() is None:
+        return None
+    ast = ASTFactory().get_abstract_syntax_tree(parser.convert_ast_to_string_ast())
+    ast.standardize()
+    # Every body is compiled up front, so running measures machine steps alone
+    return CSEMachineFactory(lazy=False).get_cse_machine(ast)
+
+def measure_program(source, values, repeats):
+    memstats = MemStats(interval=sys.maxsize)
+    cse_machine = get_machine(source)
+    if cse_machine is None:
+        return None
+    cse_machine.add_observer(memstats)
+    memstats.start()
+    try:
+        cse_machine.resume(None)
+    finally:
+        memstats.finish(cse_machine)
+    steps = max(memstats.steps, 1)
+    allocations = memstats.allocations
+    best = None
+    for _ in range(repeats):
+        cse_machine = get_machine(source)
+        gc.collect()
+        start = time.perf_counter()
+        cse_machine.execute()
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return {
+        "steps": memstats.steps,
+        "symbols_per_step": sum(allocations.values()) / steps,
+        "bytes_per_step": sum(count * values[name]["bytes"] for name, count in allocations.items()
+                              if name in values) / steps,
+        "blocks_per_step": sum(count * values[name]["blocks"] for name, count in allocations.items()
+                               if name in values) / steps,
+        "ns_per_step": best / steps * 1e9,
+    }
+
+def get_change(result, before, key):
+    if before is None or not before.get(key):
+        return ""
+    return f"{(result[key] / before[key] - 1) * 100:+.0f}%"
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure the memory and time cost of machine values.')
+    parser.add_argument('--count', type=int, default=100000, help='Values made per class')
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs per program; the fastest is kept')
+    parser.add_argument('--filter', default='', help='Only run programs whose name contains this')
+    parser.add_argument('--save', metavar='FILE', help='Write the results to FILE as JSON')
+    parser.add_argument('--compare', metavar='FILE', help='Show the change from results saved with --save')
+    args = parser.parse_args()
+
+    sys.setrecursionlimit(100000)
+    before = {"values": {}, "programs": {}}
+    if args.compare:
+        with open(args.compare, "r") as file:
+            before = json.load(file)
+
+    values = {}
+    print(f"{'value':<12}{'bytes':>10}{'blocks':>10}{'ns':>10}{'bytes chg':>12}{'ns chg':>10}")
+    for name, make in VALUES.items():
+        result = values[name] = measure_value(make, args.count)
+        base = before["values"].get(name)
+        print(f"{name:<12}{result['bytes']:>10.1f}{result['blocks']:>10.2f}{result['ns']:>10.1f}"
+              f"{get_change(result, base, 'bytes'):>12}{get_change(result, base, 'ns'):>10}")
+
+    programs = {}
+    print(f"\n{'program':<24}{'steps':>10}{'symbols':>10}{'bytes':>10}{'blocks':>10}{'ns':>10}"
+          f"{'bytes chg':>12}{'ns chg':>10}   (per step)")
+    # Interpreter diagnostics are not part of the measurement
+    for name, source in get_benchmarks():
+        if args.filter not in name:
+            continue
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = measure_program(source, values, args.repeats)
+        if result is None:
+            continue
+        programs[name] = result
+        base = before["programs"].get(name)
+        print(f"{name:<24}{result['steps']:>10}{result['symbols_per_step']:>10.2f}"
+              f"{result['bytes_per_step']:>10.1f}{result['blocks_per_step']:>10.2f}{result['ns_per_step']:>10.0f}"
+              f"{get_change(result, base, 'bytes_per_step'):>12}{get_change(result, base, 'ns_per_step'):>10}")
+
+    if args.save:
+        with open(args.save, "w") as file:
+            json.dump({"values": values, "programs": programs}, file, indent=2)
+
+if __name__ == "__main__":
+    main()
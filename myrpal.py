@@ -1,56 +1,318 @@
 import argparse
+import json
+import signal
+import sys
+import time
 from Parser.parser import Parser
 from Lexer.lexical_analyzer import tokenize
 from Standardizer.ast_factory import ASTFactory
 from CSEM.csemachine import CSEMachine
 from CSEM.cse_factory import CSEMachineFactory
+from CSEM.stats import MachineStats
+from CSEM.profiler import Profiler
+from CSEM.opstats import OpStats
+from CSEM.tracer import Tracer
+from CSEM.memstats import MemStats
+from CSEM.governor import Limits, Governor, QuotaExceeded
+from CSEM.checkpoint import Checkpointer, load_checkpoint, get_objects
+from CSEM.quicken import unquicken
+from Pipeline.timings import Timings, count_nodes
+from Pipeline.session import Session
+from Pipeline.pool import WorkerPool
+from Pipeline.batch import run_batch
 
 def main():
     parser = argparse.ArgumentParser(description='Process some RPAL files.')
-    parser.add_argument('file_name', type=str, help='The RPAL program input file')
+    parser.add_argument('file_name', type=str, nargs='?', help='The RPAL program input file')
     parser.add_argument('-ast', action='store_true', help='Print the abstract syntax tree')
     parser.add_argument('-sast', action='store_true', help='Print the standardized abstract syntax tree')
+    parser.add_argument('--memoize', action='store_true', help='Memoize rec functions detected as pure')
+    parser.add_argument('--memoize-names', metavar='NAMES', help='Memoize the rec functions with these comma separated names')
+    parser.add_argument('--memo-size', type=int, default=4096, help='LRU capacity of each memo table')
+    parser.add_argument('--no-quicken', action='store_true', help='Do not specialize gamma and operator sites')
+    parser.add_argument('--no-fuse', action='store_true', help='Do not fuse common control sequences into one step')
+    parser.add_argument('--no-jit', action='store_true', help='Do not compile hot functions to Python')
+    parser.add_argument('--jit-report', action='store_true',
+                        help='Report compiled functions and the time spent compiling on stderr')
+    parser.add_argument('--jit-report-format', choices=['text', 'json'], default='text', help='Format of --jit-report')
+    parser.add_argument('--timings', action='store_true', help='Report time and counters for each phase on stderr')
+    parser.add_argument('--timings-format', choices=['text', 'json'], default='text', help='Format of --timings')
+    parser.add_argument('--profile', action='store_true', help='Report time and steps per RPAL function on stderr')
+    parser.add_argument('--profile-stacks', metavar='FILE',
+                        help='Profile and write collapsed stacks (for flamegraph tools) to FILE')
+    parser.add_argument('--opstats', action='store_true',
+                        help='Report counts of machine step kinds and step pairs on stderr')
+    parser.add_argument('--opstats-format', choices=['text', 'json'], default='text', help='Format of --opstats')
+    parser.add_argument('--trace', action='store_true',
+                        help='Keep the last --trace-steps machine steps in memory; dump them on error or SIGUSR1')
+    parser.add_argument('--trace-steps', type=int, default=100000, metavar='STEPS', help='Steps kept by --trace')
+    parser.add_argument('--trace-sample', type=int, default=1, metavar='N', help='Trace every N-th step')
+    parser.add_argument('--trace-file', default='trace.txt', help='File the trace is dumped to')
+    parser.add_argument('--memstats', action='store_true',
+                        help='Report heap shape and allocations of the machine on stderr')
+    parser.add_argument('--memstats-format', choices=['text', 'json'], default='text', help='Format of --memstats')
+    parser.add_argument('--memstats-interval', type=int, default=10000, metavar='STEPS',
+                        help='Steps between heap samples')
+    parser.add_argument('--tracemalloc', action='store_true', help='Include tracemalloc figures in --memstats')
+    parser.add_argument('--serve', action='store_true',
+                        help='Answer JSON-lines requests from stdin on stdout until end of input')
+    parser.add_argument('--cache-size', type=int, default=256, help='Compiled programs kept by --serve')
+    parser.add_argument('--server', metavar='SOCKET',
+                        help='Serve the --serve protocol on a Unix socket with a pool of forked workers')
+    parser.add_argument('--workers', type=int, default=4, help='Worker processes of --server')
+    parser.add_argument('--max-requests', type=int, default=1000, help='Requests a worker answers before it is replaced')
+    parser.add_argument('--cpu-limit', type=int, default=10, metavar='SECONDS',
+                        help='CPU time limit of each --server request (0 for none)')
+    parser.add_argument('--memory-limit', type=int, default=1024, metavar='MB',
+                        help='Address space limit of each --server worker (0 for none)')
+    parser.add_argument('--max-steps', type=int, help='Stop the program after this many machine steps')
+    parser.add_argument('--max-control', type=int, help='Stop the program if the control grows past this length')
+    parser.add_argument('--max-stack', type=int, help='Stop the program if the stack grows past this length')
+    parser.add_argument('--max-environments', type=int, help='Stop the program after it creates this many environments')
+    parser.add_argument('--max-tuple-elements', type=int,
+                        help='Stop the program after it creates this many tuple elements')
+    parser.add_argument('--max-seconds', type=float, help='Stop the program after this much wall-clock time')
+    parser.add_argument('--checkpoint', metavar='FILE',
+                        help='Save a snapshot of the machine to FILE on SIGUSR2 or every --checkpoint-every steps')
+    parser.add_argument('--checkpoint-every', type=int, metavar='STEPS', help='Steps between snapshots')
+    parser.add_argument('--restore', metavar='FILE', help='Continue the program saved in a --checkpoint snapshot')
+    parser.add_argument('--batch', metavar='DIR', help='Run every file in DIR on a pool of processes')
+    parser.add_argument('--batch-output', metavar='DIR',
+                        help='Write each --batch output to DIR/FILE.out instead of JSON lines on stdout')
+    parser.add_argument('--jobs', type=int, default=None, help='Processes of --batch (default: available cores)')
+    parser.add_argument('--timeout', type=float, default=None, metavar='SECONDS',
+                        help='Time limit of each --batch program')
 
     args = parser.parse_args()
 
+    if args.serve:
+        Session(args.cache_size).serve(sys.stdin, sys.stdout)
+        return
+    if args.server:
+        pool = WorkerPool(args.server, args.workers, args.max_requests, args.cpu_limit,
+                          args.memory_limit * 1024 * 1024, args.cache_size)
+        signal.signal(signal.SIGTERM, lambda signum, frame: pool.stop())
+        pool.serve_forever()
+        return
+    if args.batch:
+        run_batch(args.batch, args)
+        return
+    if args.restore:
+        restore(args)
+        return
+    if args.file_name is None:
+        parser.error("the file_name argument is required unless --serve, --server, --batch or --restore is given")
+
     input_file = open(args.file_name, "r")
     input_text = input_file.read()
     input_file.close()
-    
+
+    timings = Timings()
+    try:
+        run(input_text, args, timings)
+    except QuotaExceeded as e:
+        # The breached limit and the machine's counters go to stderr as JSON
+        print(e.to_json(), file=sys.stderr)
+        sys.exit(2)
+    finally:
+        # Timings go to stderr so the program output is unchanged
+        if args.timings:
+            print(timings.to_json() if args.timings_format == 'json' else timings.to_text(), file=sys.stderr)
+
+def run(input_text, args, timings):
     # Tokenize the input text
-    tokens = tokenize(input_text)
+    with timings.phase("tokenize") as phase:
+        tokens = tokenize(input_text)
+        phase.counters["tokens"] = len(tokens)
 
     try:
-        parser = Parser(tokens)
-        ast_nodes = parser.parse()
+        with timings.phase("parse"):
+            parser = Parser(tokens)
+            ast_nodes = parser.parse()
         if ast_nodes is None:
             return
         
         # Abstract Syntax Tree (AST)
-        string_ast = parser.convert_ast_to_string_ast()
+        with timings.phase("string_ast") as phase:
+            string_ast = parser.convert_ast_to_string_ast()
+            phase.counters["ast_nodes"] = len(string_ast)
         if args.ast:
             for string in string_ast:
                 print(string)
             return
         
         # Standardized Abstract Syntax Tree (SAST)
-        ast_factory = ASTFactory()
-        ast = ast_factory.get_abstract_syntax_tree(string_ast)
-        ast.standardize()
+        with timings.phase("ast_factory"):
+            ast_factory = ASTFactory()
+            ast = ast_factory.get_abstract_syntax_tree(string_ast)
+        with timings.phase("standardize") as phase:
+            ast.standardize()
+        if args.timings:
+            phase.counters["standardized_nodes"] = count_nodes(ast.get_root())
         if args.sast:
             ast.print_ast()
             return
         
         # Final Output
-        cse_machine_factory = CSEMachineFactory()
-        cse_machine = cse_machine_factory.get_cse_machine(ast)
+        with timings.phase("cse_factory") as phase:
+            cse_machine_factory = CSEMachineFactory(memoize=get_memoize(args), memo_size=args.memo_size, fuse=not args.no_fuse)
+            cse_machine = cse_machine_factory.get_cse_machine(ast)
+            phase.counters["deltas"] = cse_machine_factory.j
+            phase.counters["lambdas"] = cse_machine_factory.i - 1
+        cse_machine.quicken = not args.no_quicken
+        if args.no_jit:
+            cse_machine.jit = None
+        stats = MachineStats()
+        if args.timings:
+            cse_machine.add_observer(stats)
+        profiler = Profiler()
+        if args.profile or args.profile_stacks:
+            cse_machine.add_observer(profiler)
+        opstats = OpStats()
+        if args.opstats:
+            cse_machine.add_observer(opstats)
+        memstats = MemStats(args.memstats_interval, args.tracemalloc)
+        if args.memstats:
+            cse_machine.add_observer(memstats)
+        limits = get_limits(args)
+        if limits is not None:
+            cse_machine.set_governor(Governor(limits))
+        checkpointer = get_checkpointer(args)
+        tracer = None
+        if args.trace:
+            tracer = Tracer(args.trace_steps, args.trace_sample)
+            cse_machine.add_observer(tracer)
+            if hasattr(signal, "SIGUSR1"):
+                signal.signal(signal.SIGUSR1, lambda signum, frame: dump_trace(tracer, args.trace_file))
         
         # Default action: print the final output
         print("Output of the above program is:")
-        print(cse_machine.get_answer())
+        with timings.phase("execute") as phase:
+            if args.memstats:
+                memstats.start()
+            try:
+                start = time.perf_counter()
+                if checkpointer is not None:
+                    checkpointer.execute(cse_machine)
+                else:
+                    cse_machine.resume(None)
+                elapsed = time.perf_counter() - start
+                print_result(cse_machine)
+            except Exception:
+                if tracer is not None:
+                    dump_trace(tracer, args.trace_file)
+                raise
+            finally:
+                if args.memstats:
+                    # The symbol classes are put back even if the run failed or was interrupted
+                    memstats.finish(cse_machine)
+        if args.timings:
+            # Lambda bodies are compiled lazily, so these include deltas built while running
+            phase.counters.update(stats.get_counters(cse_machine))
+            phase.counters["deltas"] = cse_machine_factory.j
+            phase.counters["lambdas"] = cse_machine_factory.i - 1
+
+        if args.profile or args.profile_stacks:
+            profiler.finish()
+            print(profiler.get_table(), file=sys.stderr)
+            if args.profile_stacks:
+                with open(args.profile_stacks, "w") as file:
+                    profiler.write_collapsed_stacks(file)
+
+        if args.memstats:
+            print(memstats.to_json() if args.memstats_format == 'json' else memstats.to_text(), file=sys.stderr)
+        if args.opstats:
+            print(opstats.to_json() if args.opstats_format == 'json' else opstats.to_text(), file=sys.stderr)
+
+        if args.jit_report:
+            report_jit(cse_machine, args, elapsed)
+
+        # Memo table counters go to stderr so the program output is unchanged
+        for memo in cse_machine_factory.memo_tables:
+            print("memo " + memo.get_report(), file=sys.stderr)
 
+    except QuotaExceeded:
+        raise
     except Exception as e:
         print(e)
 
+def report_jit(cse_machine, args, elapsed):
+    # Everything comes from the run that printed the output; benchmarks/jit.py compares times
+    # with and without compiling
+    if cse_machine.jit is None:
+        print("jit: off (--no-jit)", file=sys.stderr)
+        return
+    if cse_machine.observers or cse_machine.governor is not None or args.checkpoint:
+        print("jit: not used (observers, quotas or checkpoints need every step)", file=sys.stderr)
+        return
+    jit = cse_machine.jit
+    compiled = sum(function.reason is None for function in jit.functions.values())
+    if args.jit_report_format == 'json':
+        print(json.dumps({"functions": jit.to_dict(), "compiled": compiled,
+                          "compile_ms": jit.compile_time * 1000, "execute_ms": elapsed * 1000}),
+              file=sys.stderr)
+        return
+    print(jit.to_text(), file=sys.stderr)
+    print(f"compiled: {compiled} of {len(jit.functions)} hot functions in {jit.compile_time * 1000:.3f} ms, "
+          f"execute: {elapsed * 1000:.3f} ms", file=sys.stderr)
+
+def restore(args):
+    # Continue a machine saved by --checkpoint, with the same output as the original run
+    cse_machine = load_checkpoint(args.restore)
+    # The same options as run(); --no-fuse only applies when a program is compiled
+    cse_machine.quicken = not args.no_quicken
+    if args.no_quicken:
+        unquicken(get_objects([cse_machine.control, cse_machine.stack, cse_machine.environment]))
+    if args.no_jit:
+        cse_machine.jit = None
+    limits = get_limits(args)
+    if limits is not None:
+        cse_machine.set_governor(Governor(limits))
+    checkpointer = get_checkpointer(args)
+    print("Output of the above program is:")
+    try:
+        if checkpointer is not None:
+            checkpointer.execute(cse_machine)
+        else:
+            cse_machine.execute()
+        print_result(cse_machine)
+    except QuotaExceeded as e:
+        print(e.to_json(), file=sys.stderr)
+        sys.exit(2)
+
+def print_result(cse_machine):
+    # Large tuples are streamed to stdout rather than built as one string
+    cse_machine.write_result(sys.stdout)
+    sys.stdout.write("\n")
+
+def get_checkpointer(args):
+    if not args.checkpoint:
+        return None
+    checkpointer = Checkpointer(args.checkpoint, args.checkpoint_every)
+    if hasattr(signal, "SIGUSR2"):
+        signal.signal(signal.SIGUSR2, lambda signum, frame: checkpointer.request())
+    return checkpointer
+
+def get_memoize(args):
+    # Names of the rec functions to memoize for the factory ("auto" selects pure ones), or None
+    names = args.memoize_names.split(",") if args.memoize_names else []
+    if args.memoize:
+        names.append("auto")
+    return names or None
+
+def get_limits(args):
+    # Limits from the --max-* options, or None if none were given
+    limits = Limits(args.max_steps, args.max_control, args.max_stack, args.max_environments,
+                    args.max_tuple_elements, args.max_seconds)
+    if all(value is None for key, value in vars(limits).items() if key != "interval"):
+        return None
+    return limits
+
+def dump_trace(tracer, file_name):
+    with open(file_name, "w") as file:
+        tracer.dump(file)
+    print(f"trace of the last {min(tracer.recorded, tracer.capacity)} recorded steps written to {file_name}",
+          file=sys.stderr)
+
 if __name__ == "__main__":
     main()